@@ -0,0 +1,220 @@
+"""
+Stub Groq server: the chat-completions API with injectable latency and errors
+
+Answers POST /openai/v1/chat/completions like Groq (JSON, or Server-Sent
+Events with "stream": true) after a configurable delay. A fraction of
+requests can be made slow (a latency tail) or fail with 429/5xx and a
+Retry-After header. GET /stats returns what was served.
+
+Point the service (or the CLI) at it with GROQ_API_BASE:
+    poetry run python groq_stub.py --port 8765 --latency 0.3 --slow-rate 0.05 --error-rate 0.1
+    GROQ_API_BASE=http://127.0.0.1:8765 GROQ_API_KEY=stub poetry run python manage.py runserver
+
+llm_transport_test.py and the transport tests in recipe_app/tests.py start it
+in-process.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = '/openai/v1/chat/completions'
+ANSWER = ("Stub answer from {model}. Ingredients: 2 cups rice, 1 onion. "
+          "Instructions: rinse the rice, fry the onion, simmer for 20 minutes.")
+
+
+class StubBehaviour:
+    """
+    Latency and error injection, and counters of what was served
+    """
+
+    def __init__(self, latency=0.2, jitter=0.05, slow_rate=0.0, slow_latency=3.0,
+                 error_rate=0.0, error_status=429, retry_after=0.5, token_delay=0.01, seed=None,
+                 script=()):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.token_delay = token_delay
+        self.random = random.Random(seed)
+        # (delay, error status or None) for the first requests, in order;
+        # later requests draw at random
+        self.script = list(script)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'slow': 0, 'connections': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def draw(self):
+        """
+        (delay before the response, error status or None) for one request
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.script:
+                delay, error = self.script.pop(0)
+                if error is not None:
+                    self.stats['errors'] += 1
+                return delay, error
+            if self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return self.latency / 4, self.error_status
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            if self.random.random() < self.slow_rate:
+                self.stats['slow'] += 1
+                delay = self.slow_latency
+            return delay, None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection reuse by the client shows in /stats
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.behaviour.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.server.behaviour.lock:
+                self._json(200, dict(self.server.behaviour.stats))
+        else:
+            self._json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path != COMPLETIONS_PATH:
+            self._json(404, {'error': {'message': 'Not found'}})
+            return
+
+        behaviour = self.server.behaviour
+        delay, error = behaviour.draw()
+        time.sleep(delay)
+        if error is not None:
+            self._json(error, {
+                'error': {'message': f'Stub error {error}', 'type': 'stub', 'code': 'rate_limit_exceeded'}
+            }, {'Retry-After': str(behaviour.retry_after)})
+            return
+
+        model = body.get('model', 'stub')
+        words = ANSWER.format(model=model).split(' ')[:body.get('max_tokens') or None]
+        usage = {
+            'prompt_tokens': sum(len(str(m.get('content', ''))) // 4 for m in body.get('messages', [])),
+            'completion_tokens': len(words),
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        completion_id = f"chatcmpl-stub-{behaviour.stats['requests']}"
+        if body.get('stream'):
+            self._stream(completion_id, model, words, usage, behaviour.token_delay)
+            return
+        self._json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ' '.join(words)},
+                'logprobs': None,
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+            'system_fingerprint': None,
+            'x_groq': {'id': completion_id},
+        })
+
+    def _stream(self, completion_id, model, words, usage, token_delay):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def event(data):
+            payload = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(payload):X}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta, finish_reason=None, **extra):
+            return json.dumps({
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'logprobs': None, 'finish_reason': finish_reason}],
+                **extra,
+            })
+
+        for i, word in enumerate(words):
+            event(chunk({'role': 'assistant', 'content': word if i == 0 else ' ' + word}))
+            time.sleep(token_delay)
+        event(chunk({}, 'stop', x_groq={'id': completion_id, 'usage': usage}))
+        event('[DONE]')
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose, e.g. when a hedged copy loses
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_stub(host='127.0.0.1', port=0, **behaviour):
+    """
+    Serve the stub in a daemon thread; returns (server, base URL for GROQ_API_BASE)
+    """
+    server = StubServer((host, port), StubHandler)
+    server.behaviour = StubBehaviour(**behaviour)
+    threading.Thread(target=server.serve_forever, name='groq-stub', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before each response')
+    parser.add_argument('--jitter', type=float, default=0.05, help='random extra seconds per response')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='fraction of responses that are slow')
+    parser.add_argument('--slow-latency', type=float, default=3.0, help='seconds before a slow response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=429, help='status of a failed request')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='Retry-After seconds on errors')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='seconds between streamed tokens')
+    parser.add_argument('--seed', type=int, help='random seed, for repeatable runs')
+    args = vars(parser.parse_args())
+    host, port = args.pop('host'), args.pop('port')
+
+    server, url = start_stub(host, port, **args)
+    print(f"🧪 Stub Groq API on {url} (GROQ_API_BASE={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
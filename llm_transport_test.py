@@ -0,0 +1,128 @@
+"""
+LLM transport test: tail latency and failures against the stub Groq server
+
+Starts groq_stub.py in-process with a latency tail and injected 429s, then
+sends the same requests through ChatGroq three ways:
+
+    sdk        Groq SDK defaults (its own client and retries, no deadline)
+    transport  llm_transport.py clients: pooled, jittered retries honouring
+               Retry-After, LLM_DEADLINE_SECONDS per request
+    hedged     transport plus a second copy of requests slower than p95
+
+and reports successes, latency percentiles and how many requests and
+connections reached the server.
+
+Usage:
+    poetry run python llm_transport_test.py --requests 300 --concurrency 16
+    poetry run python llm_transport_test.py --error-rate 0.3 --async
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'agentic_ai_assistant'))
+
+from langchain_groq import ChatGroq
+
+from groq_stub import start_stub
+from llm_transport import create_http_clients, TransportStats
+
+MODEL = 'llama-3.3-70b-versatile'
+
+
+def create_llm(url, scenario, deadline):
+    if scenario == 'sdk':
+        return ChatGroq(groq_api_key='stub', groq_api_base=url, model_name=MODEL, max_tokens=64), None
+    stats = TransportStats()
+    http_client, http_async_client = create_http_clients(
+        stats=stats, deadline=deadline, hedge=scenario == 'hedged'
+    )
+    llm = ChatGroq(
+        groq_api_key='stub', groq_api_base=url, model_name=MODEL, max_tokens=64,
+        http_client=http_client, http_async_client=http_async_client,
+        request_timeout=deadline, max_retries=0
+    )
+    return llm, stats
+
+
+def run_sync(llm, requests, concurrency):
+    def call(i):
+        start = time.perf_counter()
+        try:
+            llm.invoke(f'What can I cook tonight? ({i})')
+            return time.perf_counter() - start, True
+        except Exception:
+            return time.perf_counter() - start, False
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(call, range(requests)))
+
+
+async def run_async(llm, requests, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def call(i):
+        async with limit:
+            start = time.perf_counter()
+            try:
+                await llm.ainvoke(f'What can I cook tonight? ({i})')
+                return time.perf_counter() - start, True
+            except Exception:
+                return time.perf_counter() - start, False
+
+    return await asyncio.gather(*(call(i) for i in range(requests)))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.2, help='stub seconds per response')
+    parser.add_argument('--slow-rate', type=float, default=0.05, help='fraction of slow responses')
+    parser.add_argument('--slow-latency', type=float, default=3.0, help='seconds of a slow response')
+    parser.add_argument('--error-rate', type=float, default=0.1, help='fraction of 429 responses')
+    parser.add_argument('--retry-after', type=float, default=0.3, help='Retry-After seconds on 429')
+    parser.add_argument('--deadline', type=float, default=10.0, help='seconds per request (transport)')
+    parser.add_argument('--scenarios', default='sdk,transport,hedged')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='use ainvoke() on one event loop')
+    args = parser.parse_args()
+
+    print(f"\n🧪 Stub: {args.latency}s per response, {args.slow_rate:.0%} at {args.slow_latency}s, "
+          f"{args.error_rate:.0%} 429 (Retry-After {args.retry_after}s)")
+    print(f"   {args.requests} requests, concurrency {args.concurrency}, {'async' if args.use_async else 'sync'}")
+    print(f"\n{'scenario':<10} {'ok':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'sent':>6} {'conns':>6}")
+    print("-" * 66)
+    for scenario in args.scenarios.split(','):
+        # Same seed: every scenario meets the same slow responses and errors
+        server, url = start_stub(
+            latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+            error_rate=args.error_rate, retry_after=args.retry_after, seed=7
+        )
+        llm, stats = create_llm(url, scenario, args.deadline)
+        if args.use_async:
+            results = asyncio.run(run_async(llm, args.requests, args.concurrency))
+        else:
+            results = run_sync(llm, args.requests, args.concurrency)
+        server.shutdown()
+
+        latencies = [seconds for seconds, ok in results if ok]
+        served = server.behaviour.stats
+        print(f"{scenario:<10} {len(latencies):>6} {percentile(latencies, 0.5):>7.2f}s "
+              f"{percentile(latencies, 0.95):>7.2f}s {percentile(latencies, 0.99):>7.2f}s "
+              f"{max(latencies, default=float('nan')):>7.2f}s {served['requests']:>6} {served['connections']:>6}")
+        if stats is not None:
+            counts = stats.snapshot()
+            print(f"{'':<10} retries {counts['retries']}, hedges {counts['hedges']} "
+                  f"(won {counts['hedge_wins']}), failures {counts['failures']}")
+
+
+if __name__ == "__main__":
+    main()
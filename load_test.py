@@ -0,0 +1,141 @@
+"""
+Load test: concurrency scaling of the sync (WSGI) and async (ASGI) search views
+
+Runs in-process against the real vector store and retrievers, with the Groq
+LLM replaced by a stub that waits a fixed time per call (so Groq is not
+hammered and results are repeatable). The WSGI path runs on a fixed pool of
+worker threads, like `gunicorn --threads N`; the ASGI path runs every request
+on one event loop, like a single uvicorn worker.
+
+Usage:
+    poetry run python load_test.py --latency 2 --concurrency 1,10,50,200 --wsgi-threads 8
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+import django
+from django.conf import settings
+
+# Keep load test searches out of the real search history
+TEST_DB = os.path.join(tempfile.mkdtemp(), 'load_test.sqlite3')
+settings.DATABASES['default']['NAME'] = TEST_DB
+django.setup()
+
+from django.core.management import call_command
+from django.test import AsyncClient, Client
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from recipe_app.ai_service import get_recipe_ai_service
+from rag_chain import create_rag_chain, create_answer_chain
+
+
+class SlowStubLLM(BaseChatModel):
+    """
+    Chat model that answers after a fixed delay: blocking in invoke(),
+    non-blocking in ainvoke()
+    """
+    latency: float = 2.0
+
+    @property
+    def _llm_type(self):
+        return "slow-stub"
+
+    def _result(self):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="Stub answer"))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+def make_body(i, run):
+    # Unique general questions: no catalog fast path, no answer cache hits
+    return {'query': f'What can I cook tonight? (load test {run}-{i})', 'type': 'general'}
+
+
+def run_wsgi(concurrency, threads, run):
+    """
+    Fire `concurrency` requests at /api/search/ served by `threads` workers
+    """
+    start = time.perf_counter()
+
+    def request(i):
+        response = Client().post('/api/search/', make_body(i, run), content_type='application/json')
+        assert response.status_code == 200, response.content
+        # Includes time spent queued for a free worker thread
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(request, range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+async def run_asgi(concurrency, run):
+    """
+    Fire `concurrency` requests at /api/async/search/ on one event loop
+    """
+    client = AsyncClient()
+
+    async def request(i):
+        start = time.perf_counter()
+        response = await client.post('/api/async/search/', make_body(i, run), content_type='application/json')
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(request(i) for i in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name, concurrency, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:<6} {concurrency:>6} {elapsed:>9.2f}s {concurrency / elapsed:>9.1f} "
+          f"{statistics.median(latencies):>8.2f}s {p95:>8.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=2.0, help='seconds per stub LLM call')
+    parser.add_argument('--concurrency', default='1,10,50,200', help='comma-separated concurrency levels')
+    parser.add_argument('--wsgi-threads', type=int, default=8, help='worker threads for the WSGI path')
+    parser.add_argument('--skip-wsgi', action='store_true', help='only run the ASGI path')
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(',')]
+
+    call_command('migrate', verbosity=0)
+
+    print("🔧 Loading AI service with a stub LLM...")
+    service = get_recipe_ai_service()
+    stub = SlowStubLLM(latency=args.latency)
+    service.rag_chain = create_rag_chain(service.vectorstore, stub, service.bm25_index)
+    service.answer_chain = create_answer_chain(stub)
+    service.answer_cache = None
+
+    print(f"\n⏱️  Stub LLM latency {args.latency}s, WSGI threads {args.wsgi_threads}")
+    print(f"\n{'path':<6} {'conc':>6} {'wall':>10} {'req/s':>9} {'p50':>9} {'p95':>9}")
+    print("-" * 54)
+    for run, concurrency in enumerate(levels):
+        if not args.skip_wsgi:
+            elapsed, latencies = run_wsgi(concurrency, args.wsgi_threads, run)
+            report('wsgi', concurrency, elapsed, latencies)
+        elapsed, latencies = asyncio.run(run_asgi(concurrency, run))
+        report('asgi', concurrency, elapsed, latencies)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
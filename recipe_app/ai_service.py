@@ -2,6 +2,10 @@
 Recipe AI Service - Integrates with the existing RAG system
 """
 import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 import sys
 
@@ -11,43 +15,160 @@ SRC_PATH = BASE_DIR / 'src' / 'agentic_ai_assistant'
 if str(SRC_PATH) not in sys.path:
     sys.path.insert(0, str(SRC_PATH))
 
+# The RAG stack (chromadb, torch, LangChain) is imported in _initialize, so
+# importing this module (manage.py check, URL loading) stays cheap
 try:
-    from vector_store import (
-        create_embeddings,
-        load_existing_vector_store,
-        VECTOR_STORE_PATH
-    )
-    from rag_chain import (
-        create_groq_llm,
-        create_rag_chain,
-    )
+    from answer_cache import normalize_query
+    from single_flight import SingleFlight, AsyncSingleFlight
+    from llm_scheduler import LLMOverloaded, INTERACTIVE, BATCH
 except ImportError as e:
     print(f"Import Error: {e}")
     print(f"Python path: {sys.path}")
     print(f"SRC_PATH: {SRC_PATH}")
     raise
 
+# Answer exact/near-exact recipe names straight from the catalog
+CATALOG_FAST_PATH = os.getenv("CATALOG_FAST_PATH", "true").lower() == "true"
+# Reuse answers to repeated or near-identical questions instead of calling Groq
+USE_ANSWER_CACHE = os.getenv("ANSWER_CACHE", "true").lower() == "true"
+# Parallel LLM calls per search_many() batch, and the largest batch accepted
+SEARCH_BATCH_CONCURRENCY = int(os.getenv("SEARCH_BATCH_CONCURRENCY", "8"))
+SEARCH_BATCH_MAX_ITEMS = int(os.getenv("SEARCH_BATCH_MAX_ITEMS", "500"))
+
+RECIPE_NAME_QUESTION = """Give me the complete recipe for {recipe_name}. 
+            
+            Please provide:
+            1. Recipe Name
+            2. Ingredients (list each ingredient with measurements)
+            3. Step-by-step Instructions
+            4. Important Notes or Tips (if any)
+            
+            Format the response clearly with sections."""
+
+INGREDIENTS_QUESTION = """I have the following ingredients: {ingredients}
+            
+            Please suggest 2-3 recipes I can make with these ingredients.
+            
+            For each recipe, provide:
+            1. Recipe Name
+            2. Required Ingredients (highlight which ones I already have)
+            3. Brief Instructions
+            4. Important Notes
+            
+            Format the response clearly with sections for each recipe."""
+
+# Query run through embedding and retrieval once loading is done
+WARMUP_QUERY = "chicken curry with rice"
+
+
+class ServiceStatus:
+    """
+    Thread-safe record of AI service loading, read by the health probes
+    without waiting on the load itself
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.state = 'idle'  # idle -> loading -> ready | failed
+        self.current_step = None
+        self.steps = []
+        self.error = None
+        self.load_started = None
+        self.load_seconds = None
+
+    def begin(self):
+        with self._lock:
+            self.state = 'loading'
+            self.steps = []
+            self.error = None
+            self.load_started = time.time()
+            self.load_seconds = None
+
+    @contextmanager
+    def step(self, name):
+        """Time one loading step"""
+        with self._lock:
+            self.current_step = name
+        start = time.perf_counter()
+        yield
+        with self._lock:
+            self.steps.append({'step': name, 'seconds': round(time.perf_counter() - start, 3)})
+            self.current_step = None
+
+    def finish(self, error=None):
+        with self._lock:
+            self.state = 'failed' if error else 'ready'
+            self.error = str(error) if error else None
+            self.current_step = None
+            self.load_seconds = round(time.time() - self.load_started, 3)
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'current_step': self.current_step,
+                'steps': list(self.steps),
+                'load_seconds': self.load_seconds,
+                'error': self.error,
+                'uptime_seconds': round(time.time() - self.started, 3)
+            }
+
+
+service_status = ServiceStatus()
+
 
 class RecipeAIService:
     """
     Singleton service for Recipe AI
+    Construction is serialized, so concurrent first requests (or a request
+    racing the background warm-up) initialize it only once.
     """
     _instance = None
     _initialized = False
+    _lock = threading.RLock()
 
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+            return cls._instance
 
     def __init__(self):
-        if not self._initialized:
-            self._initialize()
-            RecipeAIService._initialized = True
+        if self._initialized:
+            return
+        with RecipeAIService._lock:
+            if not self._initialized:
+                service_status.begin()
+                try:
+                    self._initialize()
+                except Exception as e:
+                    service_status.finish(error=e)
+                    raise
+                service_status.finish()
+                RecipeAIService._initialized = True
 
     def _initialize(self):
         """Initialize the AI components"""
+        from vector_store import (
+            create_embeddings,
+            load_existing_vector_store,
+            load_bm25_index,
+            load_ingredient_index,
+            load_recipe_catalog,
+            load_answer_cache,
+            VECTOR_STORE_PATH
+        )
+        from rag_chain import create_rag_chain, create_answer_chain
+        from model_router import create_model_router
+        from context_packer import pack_documents
+        
         print("🔧 Initializing Recipe AI Service...")
+        step = service_status.step
         
         # Check if vector store exists
         if not os.path.exists(VECTOR_STORE_PATH):
@@ -57,53 +178,240 @@ class RecipeAIService:
             )
         
         # Load embeddings
-        self.embeddings = create_embeddings()
+        with step('embeddings'):
+            self.embeddings = create_embeddings()
         
         # Load vector store
-        self.vectorstore = load_existing_vector_store(self.embeddings)
+        with step('vector_store'):
+            self.vectorstore = load_existing_vector_store(self.embeddings)
         
-        # Initialize LLM
-        self.llm = create_groq_llm(
-            model_name="llama-3.3-70b-versatile",
-            temperature=0.7
-        )
+        # Initialize LLMs: each call goes to the small or the large model
+        with step('llm'):
+            self.model_router = create_model_router()
+            self.llm = self.model_router.as_runnable()
+        
+        with step('search_indexes'):
+            # Load BM25 lexical index for hybrid retrieval
+            self.bm25_index = load_bm25_index(self.embeddings)
+            
+            # Load ingredient -> recipe index for ingredient search
+            self.ingredient_index = load_ingredient_index(self.embeddings)
+            
+            # Load structured recipe catalog for LLM-free name lookups
+            self.recipe_catalog = load_recipe_catalog(self.embeddings)
+        
+        # Exact + semantic cache of LLM answers
+        with step('answer_cache'):
+            self.answer_cache = load_answer_cache() if USE_ANSWER_CACHE else None
         
         # Create RAG chain
-        self.rag_chain = create_rag_chain(self.vectorstore, self.llm)
+        self.rag_chain = create_rag_chain(self.vectorstore, self.llm, self.bm25_index)
+        
+        # Prompt -> LLM chain for callers that supply their own context
+        self.answer_chain = create_answer_chain(self.llm)
+        
+        # Identical queries in flight at the same time share one LLM call
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+        
+        # Run a query through embedding and retrieval so the first real
+        # request does not pay for lazy model/index setup
+        with step('warmup_query'):
+            self.embeddings.embed_query(WARMUP_QUERY)
+            # Packing the hits also loads the tokenizer used for the context budget
+            pack_documents(self.vectorstore.similarity_search(WARMUP_QUERY, k=1))
+            self.bm25_index.search(WARMUP_QUERY, k=1)
         
         print("✅ Recipe AI Service initialized!")
 
-    def search_by_recipe_name(self, recipe_name: str) -> dict:
+    def llm_stats(self):
         """
-        Search for a recipe by name
-        Returns: dict with recipe details
+        Model router stats plus the Groq transport's retries, hedges and
+        time-to-response latencies, and the scheduler's queue depth and waits
         """
-        try:
-            question = f"""Give me the complete recipe for {recipe_name}. 
-            
-            Please provide:
-            1. Recipe Name
-            2. Ingredients (list each ingredient with measurements)
-            3. Step-by-step Instructions
-            4. Important Notes or Tips (if any)
-            
-            Format the response clearly with sections."""
+        from llm_transport import transport_stats
+        stats = {**self.model_router.stats.snapshot(), 'transport': transport_stats.snapshot()}
+        if self.model_router.scheduler is not None:
+            stats['scheduler'] = self.model_router.scheduler.snapshot()
+        return stats
+
+    def overloaded(self, priority=INTERACTIVE):
+        """
+        Seconds to wait before retrying when the LLM queue is full for this
+        priority, else None
+        """
+        scheduler = self.model_router.scheduler
+        return scheduler.overloaded(priority) if scheduler is not None else None
+
+    def _plan(self, query_type, query, generate=False):
+        """
+        Decide how a query is answered, without calling the LLM yet
+        Returns a dict with the response skeleton and either a ready answer
+        ('fields', catalog fast path) or the 'chain' and 'input' to run
+        """
+        from recipe_index import format_recipe, parse_ingredient_query, is_complete
+        from context_packer import pack_documents
+        
+        plan = {
+            'response': {'success': True, 'query': query, 'query_type': query_type},
+            'fields': None,
+            'extra': {},
+            # What the model router knows before retrieval
+            'route': {'query_type': query_type},
+            # Concurrent requests with the same key are coalesced
+            'key': (query_type, normalize_query(query), bool(generate))
+        }
+        
+        if query_type == 'recipe_name':
+            if CATALOG_FAST_PATH:
+                recipe, similarity = self.recipe_catalog.lookup(query)
+                # A catalog entry missing its ingredients or steps is not an
+                # answer; retrieval may still find the rest of the recipe
+                if recipe is not None and not is_complete(recipe):
+                    recipe, similarity = None, 0.0
+            else:
+                recipe, similarity = None, 0.0
+            question = RECIPE_NAME_QUESTION.format(recipe_name=query)
             
-            response = self.rag_chain.invoke(question)
+            if recipe is None:
+                plan.update(chain=self.rag_chain, input=question, extra={'source': 'rag'})
+            elif generate:
+                # Known recipe: skip retrieval and give the LLM only its text
+                plan.update(
+                    chain=self.answer_chain,
+                    input={'context': recipe['text'], 'question': question},
+                    extra={'source': 'catalog+llm'}
+                )
+                plan['route']['catalog_match'] = True
+            else:
+                plan['fields'] = {'result': format_recipe(recipe), 'source': 'catalog'}
             
-            return {
-                'success': True,
-                'query': recipe_name,
-                'query_type': 'recipe_name',
-                'result': response
+            if recipe is not None:
+                plan['recipe'] = {
+                    'name': recipe['title'],
+                    'ingredients': recipe['ingredient_lines'],
+                    'steps': recipe['steps'],
+                    'page': recipe['page'],
+                    'match_score': round(similarity, 2)
+                }
+        
+        elif query_type == 'ingredients':
+            question = INGREDIENTS_QUESTION.format(ingredients=query)
+            plan['route']['ingredients'] = len(parse_ingredient_query(query))
+            # Rank recipes by ingredient overlap and send only those to the LLM
+            matches, docs = self.ingredient_index.search_documents(query, k=3)
+            if docs:
+                context, report = pack_documents(docs)
+                plan.update(chain=self.answer_chain, input={'context': context, 'question': question})
+                plan['context'] = report
+            else:
+                plan.update(chain=self.rag_chain, input=question)
+            plan['extra'] = {
+                'matched_recipes': [
+                    {
+                        'title': match['recipe']['title'],
+                        'page': match['recipe']['page'],
+                        'matched_ingredients': match['matched'],
+                        'coverage': round(match['coverage'], 2)
+                    }
+                    for match in matches
+                ]
             }
+        
+        else:
+            plan.update(chain=self.rag_chain, input=query)
+        
+        return plan
+
+    def _cache_lookup(self, plan):
+        """
+        Return (cached fields or None, cache status, query embedding)
+        """
+        if self.answer_cache is None:
+            return None, 'off', None
+        response = plan['response']
+        embedding = self.embeddings.embed_query(response['query'])
+        fields, tier = self.answer_cache.get(response['query_type'], response['query'], embedding)
+        return fields, tier or 'miss', embedding
+
+    def _cache_store(self, plan, fields, embedding):
+        if self.answer_cache is not None:
+            response = plan['response']
+            self.answer_cache.put(response['query_type'], response['query'], fields, embedding)
+
+    def _run_config(self, plan, priority=INTERACTIVE):
+        """
+        Chain config for one LLM call; the RAG chain's context packer fills
+        plan['context'] with its token counts and the model router records
+        its choice in plan['route']['model']. priority orders the call in
+        the LLM scheduler's queue.
+        """
+        report = plan.setdefault('context', {})
+        return {'configurable': {'context_report': report, 'route': plan['route'], 'priority': priority}}
+
+    def _answer_fields(self, plan, result):
+        fields = {'result': result, **plan['extra']}
+        if plan.get('context'):
+            fields['context'] = plan['context']
+        if 'model' in plan['route']:
+            fields['model'] = plan['route']['model']
+        return fields
+
+    def _finish(self, plan, fields, cache, coalesced=False):
+        result = {**plan['response'], **fields, 'cache': cache, 'coalesced': coalesced}
+        if 'recipe' in plan:
+            result['recipe'] = plan['recipe']
+        return result
+
+    def _answer(self, plan):
+        """
+        Run a plan to completion, using the answer cache before the LLM
+        """
+        if plan['fields'] is not None:
+            return self._finish(plan, plan['fields'], 'bypass')
+        
+        fields, cache, embedding = self._cache_lookup(plan)
+        coalesced = False
+        if fields is None:
+            def generate_answer():
+                fields = self._answer_fields(plan, plan['chain'].invoke(plan['input'], self._run_config(plan)))
+                self._cache_store(plan, fields, embedding)
+                return fields
+            fields, coalesced = self.flights.do(plan['key'], generate_answer)
+        return self._finish(plan, fields, cache, coalesced)
+
+    def _generate_stream(self, plan, embedding):
+        """
+        Stream ('token', chunk) items from the chain, then ('fields', answer fields)
+        """
+        chunks = []
+        for chunk in plan['chain'].stream(plan['input'], self._run_config(plan)):
+            chunks.append(chunk)
+            yield 'token', chunk
+        fields = self._answer_fields(plan, ''.join(chunks))
+        self._cache_store(plan, fields, embedding)
+        yield 'fields', fields
+
+    async def _agenerate_stream(self, plan, embedding):
+        chunks = []
+        async for chunk in plan['chain'].astream(plan['input'], self._run_config(plan)):
+            chunks.append(chunk)
+            yield 'token', chunk
+        fields = self._answer_fields(plan, ''.join(chunks))
+        await asyncio.to_thread(self._cache_store, plan, fields, embedding)
+        yield 'fields', fields
+
+    def search_by_recipe_name(self, recipe_name: str, generate: bool = False) -> dict:
+        """
+        Search for a recipe by name
+        An exact/near-exact title match is answered from the recipe catalog
+        without the LLM, unless generate=True asks for an LLM answer
+        Returns: dict with recipe details
+        """
+        try:
+            return self._answer(self._plan('recipe_name', recipe_name, generate))
         except Exception as e:
-            return {
-                'success': False,
-                'query': recipe_name,
-                'query_type': 'recipe_name',
-                'error': str(e)
-            }
+            return self._error(recipe_name, 'recipe_name', e)
 
     def search_by_ingredients(self, ingredients: str) -> dict:
         """
@@ -111,62 +419,283 @@ class RecipeAIService:
         Returns: dict with recipe suggestions
         """
         try:
-            question = f"""I have the following ingredients: {ingredients}
-            
-            Please suggest 2-3 recipes I can make with these ingredients.
-            
-            For each recipe, provide:
-            1. Recipe Name
-            2. Required Ingredients (highlight which ones I already have)
-            3. Brief Instructions
-            4. Important Notes
-            
-            Format the response clearly with sections for each recipe."""
-            
-            response = self.rag_chain.invoke(question)
-            
-            return {
-                'success': True,
-                'query': ingredients,
-                'query_type': 'ingredients',
-                'result': response
-            }
+            return self._answer(self._plan('ingredients', ingredients))
         except Exception as e:
-            return {
-                'success': False,
-                'query': ingredients,
-                'query_type': 'ingredients',
-                'error': str(e)
-            }
+            return self._error(ingredients, 'ingredients', e)
 
     def general_query(self, question: str) -> dict:
         """
         Handle general recipe-related queries
         """
         try:
-            response = self.rag_chain.invoke(question)
+            return self._answer(self._plan('general', question))
+        except Exception as e:
+            return self._error(question, 'general', e)
+
+    def stream_search(self, query: str, query_type: str = 'general', generate: bool = False):
+        """
+        Stream an answer as (event, data) pairs:
+        ("token", str) for each LLM chunk, then ("done", result dict) with
+        the same fields as the blocking search, or ("error", result dict).
+        Catalog and cached answers arrive as a single "done" event.
+        """
+        try:
+            plan = self._plan(query_type, query, generate)
+            if plan['fields'] is not None:
+                yield 'done', self._finish(plan, plan['fields'], 'bypass')
+                return
             
-            return {
-                'success': True,
-                'query': question,
-                'query_type': 'general',
-                'result': response
-            }
+            fields, cache, embedding = self._cache_lookup(plan)
+            coalesced = False
+            if fields is None:
+                # Followers replay the tokens produced so far, then follow live
+                items = self.flights.stream(plan['key'], lambda: self._generate_stream(plan, embedding))
+                for (kind, value), coalesced in items:
+                    if kind == 'token':
+                        yield 'token', value
+                    else:
+                        fields = value
+            yield 'done', self._finish(plan, fields, cache, coalesced)
         except Exception as e:
-            return {
-                'success': False,
-                'query': question,
-                'query_type': 'general',
-                'error': str(e)
-            }
+            yield 'error', self._error(query, query_type, e)
+
+    async def _aanswer(self, plan):
+        """
+        Async _answer: awaits the chain so no thread is held during the LLM call
+        """
+        if plan['fields'] is not None:
+            return self._finish(plan, plan['fields'], 'bypass')
+        
+        # Query embedding and SQLite run off the event loop
+        fields, cache, embedding = await asyncio.to_thread(self._cache_lookup, plan)
+        coalesced = False
+        if fields is None:
+            async def generate_answer():
+                fields = self._answer_fields(plan, await plan['chain'].ainvoke(plan['input'], self._run_config(plan)))
+                await asyncio.to_thread(self._cache_store, plan, fields, embedding)
+                return fields
+            fields, coalesced = await self.async_flights.do(plan['key'], generate_answer)
+        return self._finish(plan, fields, cache, coalesced)
+
+    async def asearch(self, query: str, query_type: str = 'general', generate: bool = False) -> dict:
+        """
+        Async search for the ASGI views
+        query_type: 'recipe_name', 'ingredients' or 'general'
+        """
+        try:
+            return await self._aanswer(self._plan(query_type, query, generate))
+        except Exception as e:
+            return self._error(query, query_type, e)
+
+    async def astream_search(self, query: str, query_type: str = 'general', generate: bool = False):
+        """
+        Async stream_search, yielding the same (event, data) pairs
+        """
+        try:
+            plan = self._plan(query_type, query, generate)
+            if plan['fields'] is not None:
+                yield 'done', self._finish(plan, plan['fields'], 'bypass')
+                return
+            
+            fields, cache, embedding = await asyncio.to_thread(self._cache_lookup, plan)
+            coalesced = False
+            if fields is None:
+                items = self.async_flights.stream(plan['key'], lambda: self._agenerate_stream(plan, embedding))
+                async for (kind, value), coalesced in items:
+                    if kind == 'token':
+                        yield 'token', value
+                    else:
+                        fields = value
+            yield 'done', self._finish(plan, fields, cache, coalesced)
+        except Exception as e:
+            yield 'error', self._error(query, query_type, e)
+
+    def _error(self, query, query_type, error):
+        """
+        Failed result; error is a message or the exception raised. A call
+        turned away by the LLM scheduler also gets 'retry_after' (seconds)
+        """
+        result = {
+            'success': False,
+            'query': query,
+            'query_type': query_type,
+            'error': str(error)
+        }
+        if isinstance(error, LLMOverloaded):
+            result['retry_after'] = error.retry_after
+        return result
+
+    def _prepare_batch(self, items):
+        """
+        Plan every batch item and check the answer cache, embedding all the
+        queries in one call
+        Returns (results, pending): results holds finished answers and errors
+        by position, pending maps each distinct plan key to its
+        [(position, plan, embedding, cache status)] still needing the LLM
+        """
+        from embedding_cache import CachedEmbeddings
+        from embedding_server import RemoteEmbeddings
+        
+        results = [None] * len(items)
+        planned = []
+        for i, item in enumerate(items):
+            query = str(item.get('query', '')).strip()
+            query_type = item.get('type', 'general')
+            if not query:
+                results[i] = self._error(query, query_type, 'Query is required')
+                continue
+            try:
+                plan = self._plan(query_type, query, item.get('generate', False))
+            except Exception as e:
+                results[i] = self._error(query, query_type, str(e))
+                continue
+            if plan['fields'] is not None:
+                results[i] = self._finish(plan, plan['fields'], 'bypass')
+            else:
+                planned.append((i, plan))
+        
+        texts = []
+        if self.answer_cache is not None:
+            texts = [plan['response']['query'] for _, plan in planned]
+        # The retriever embeds each question separately; computing them here
+        # in the same call fills the embedding cache it reads from (the
+        # embedding server's own cache when one is used)
+        if isinstance(self.embeddings, (CachedEmbeddings, RemoteEmbeddings)):
+            texts += [plan['input'] for _, plan in planned if plan['chain'] is self.rag_chain]
+        vectors = self.embeddings.embed_documents(texts) if texts else []
+        
+        pending = {}
+        for n, (i, plan) in enumerate(planned):
+            embedding, cache = None, 'off'
+            if self.answer_cache is not None:
+                embedding = vectors[n]
+                response = plan['response']
+                fields, tier = self.answer_cache.get(response['query_type'], response['query'], embedding)
+                if fields is not None:
+                    results[i] = self._finish(plan, fields, tier)
+                    continue
+                cache = 'miss'
+            pending.setdefault(plan['key'], []).append((i, plan, embedding, cache))
+        return results, pending
+
+    def _batch_groups(self, pending):
+        """
+        Split pending keys by the chain that answers them: [(chain, inputs, keys)]
+        """
+        groups = {}
+        for key, waiting in pending.items():
+            plan = waiting[0][1]
+            chain, inputs, keys = groups.setdefault(id(plan['chain']), (plan['chain'], [], []))
+            inputs.append(plan['input'])
+            keys.append(key)
+        return list(groups.values())
+
+    def _batch_configs(self, pending, keys, max_concurrency):
+        return [
+            {'max_concurrency': max_concurrency, **self._run_config(pending[key][0][1], BATCH)}
+            for key in keys
+        ]
+
+    def _complete_batch(self, results, pending, keys, outputs):
+        """
+        Fill in results from chain outputs (answers or exceptions), one per key
+        """
+        for key, output in zip(keys, outputs):
+            waiting = pending[key]
+            if isinstance(output, Exception):
+                for i, plan, _, _ in waiting:
+                    response = plan['response']
+                    results[i] = self._error(response['query'], response['query_type'], output)
+                continue
+            
+            fields = self._answer_fields(waiting[0][1], output)
+            self._cache_store(waiting[0][1], fields, waiting[0][2])
+            # Repeats of a query within the batch share the first one's answer
+            for n, (i, plan, _, cache) in enumerate(waiting):
+                results[i] = self._finish(plan, fields, cache, coalesced=n > 0)
+
+    def search_many(self, items, max_concurrency: int = SEARCH_BATCH_CONCURRENCY) -> list:
+        """
+        Answer many searches at once
+        items: [{"query": str, "type": 'recipe_name' | 'ingredients' | 'general', "generate": bool}]
+        Returns one result dict per item, in order, each with its own
+        success/error. LLM calls run through chain.batch() with up to
+        max_concurrency in flight.
+        """
+        results, pending = self._prepare_batch(items)
+        for chain, inputs, keys in self._batch_groups(pending):
+            outputs = chain.batch(
+                inputs,
+                config=self._batch_configs(pending, keys, max_concurrency),
+                return_exceptions=True
+            )
+            self._complete_batch(results, pending, keys, outputs)
+        return results
+
+    async def asearch_many(self, items, max_concurrency: int = SEARCH_BATCH_CONCURRENCY) -> list:
+        """
+        Async search_many() using chain.abatch()
+        """
+        results, pending = await asyncio.to_thread(self._prepare_batch, items)
+        groups = self._batch_groups(pending)
+        outputs = await asyncio.gather(*(
+            chain.abatch(inputs, config=self._batch_configs(pending, keys, max_concurrency), return_exceptions=True)
+            for chain, inputs, keys in groups
+        ))
+        for (_, _, keys), group_outputs in zip(groups, outputs):
+            await asyncio.to_thread(self._complete_batch, results, pending, keys, group_outputs)
+        return results
 
 
 # Global instance
 recipe_ai_service = None
+_warmup_thread = None
+_warmup_lock = threading.Lock()
 
 def get_recipe_ai_service():
     """Get or create the Recipe AI Service instance"""
     global recipe_ai_service
     if recipe_ai_service is None:
+        # RecipeAIService serializes construction; concurrent callers wait here
         recipe_ai_service = RecipeAIService()
     return recipe_ai_service
+
+
+def _warmup():
+    try:
+        get_recipe_ai_service()
+    except Exception as e:
+        print(f"❌ AI service warm-up failed: {e}")
+
+
+def start_background_warmup():
+    """
+    Load the AI service in a daemon thread; no-op if already loading or loaded
+    """
+    global _warmup_thread
+    # Not RecipeAIService._lock: that is held for the whole load
+    with _warmup_lock:
+        if service_status.state in ('loading', 'ready') or (_warmup_thread and _warmup_thread.is_alive()):
+            return
+        _warmup_thread = threading.Thread(target=_warmup, name='ai-service-warmup', daemon=True)
+        _warmup_thread.start()
+
+
+def _after_fork_in_child():
+    """
+    A forked worker (e.g. gunicorn --preload) gets copies of the locks but
+    not the warm-up thread, so a lock it held stays taken forever. Give the
+    child fresh locks and restart a load the parent had in progress.
+    """
+    global _warmup_lock, _warmup_thread
+    RecipeAIService._lock = threading.RLock()
+    _warmup_lock = threading.Lock()
+    _warmup_thread = None
+    service_status._lock = threading.Lock()
+    if service_status.state == 'loading':
+        service_status.state = 'idle'
+        start_background_warmup()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -1,6 +1,45 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+# Servers whose processes load the project to answer HTTP requests
+SERVERS = frozenset({'gunicorn', 'uvicorn', 'daphne', 'hypercorn', 'uwsgi', 'waitress-serve'})
+
+
+def _serving_requests():
+    """True when this process will serve HTTP requests"""
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program == '__main__.py':
+        # python -m gunicorn / uvicorn / ...
+        program = os.path.basename(os.path.dirname(sys.argv[0]))
+    if program in SERVERS:
+        return True
+    if program != 'manage.py' or len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+        return False  # migrate, shell, tests, celery, scripts, ...
+    # runserver's autoreloader starts the project twice; only the child serves
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+
+
+def _warmup_enabled():
+    """
+    AI_SERVICE_WARMUP: "auto" (default) warms up only under a known server,
+    "true" in any process that loads the project, "false" never
+    """
+    setting = os.getenv('AI_SERVICE_WARMUP', 'auto').lower()
+    if setting == 'auto':
+        return _serving_requests()
+    return setting == 'true'
+
+
 class RecipeAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe_app'
+
+    def ready(self):
+        # Load the embedding model, vector store and indexes in the background
+        # so the first request after a deploy does not wait for them
+        if _warmup_enabled():
+            from .ai_service import start_background_warmup
+            start_background_warmup()
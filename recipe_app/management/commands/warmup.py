@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe_app.ai_service import get_recipe_ai_service, service_status
+
+
+class Command(BaseCommand):
+    help = "Load the AI service and run a warm-up query, reporting the time of each step"
+
+    def handle(self, *args, **options):
+        try:
+            get_recipe_ai_service()
+        except Exception as e:
+            raise CommandError(f"AI service failed to load: {e}")
+
+        status = service_status.snapshot()
+        for step in status['steps']:
+            self.stdout.write(f"  {step['step']:<16} {step['seconds']:>8.3f}s")
+        self.stdout.write(self.style.SUCCESS(f"AI service ready in {status['load_seconds']:.3f}s"))
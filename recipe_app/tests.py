@@ -1,4 +1,1361 @@
-# Empty tests file
-from django.test import TestCase
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import contextlib
+import io
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from groq_stub import COMPLETIONS_PATH, start_stub
+
+SRC_PATH = Path(__file__).resolve().parent.parent / 'src' / 'agentic_ai_assistant'
+if str(SRC_PATH) not in sys.path:
+    sys.path.insert(0, str(SRC_PATH))
+
+from recipe_chunker import iter_recipe_chunks
+from adaptive_retriever import AdaptiveRetriever, choose_k
+from answer_cache import AnswerCache, clear_answer_cache
+from bm25_index import BM25Index, tokenize
+from context_packer import MIN_PASSAGE_TOKENS, pack_documents
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+import embedding_server
+from embedding_server import (
+    OP_EMBED_DOCUMENTS, OP_EMBED_QUERY, SCORE_COSINE, STATUS_ERROR,
+    EmbeddingServer, EmbeddingServerClient, EmbeddingServerError, RemoteEmbeddings, RemoteVectorStore,
+)
+from numpy_index import NumpyVectorIndex, read_generation, write_index
+from quantized_index import QuantizedVectorIndex, evaluate_recall, quantize_int8
+from llm_scheduler import BATCH, INTERACTIVE, LLMOverloaded, LLMScheduler, TokenBucket
+from hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+from llm_transport import AsyncResilientTransport, ResilientTransport, TransportStats
+from model_router import LARGE, SMALL, ModelStats, _LatencyRecorder, classify
+from recipe_index import RecipeCatalog, group_recipes
+from single_flight import AsyncSingleFlight, SingleFlight
+from vector_store import assign_chunk_ids
+
+from .ai_service import RecipeAIService, ServiceStatus
+from .models import SearchHistory
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def sse_events(body):
+    """Parse a Server-Sent Events body into [(event, data), ...]"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class GroupRecipesTests(SimpleTestCase):
+    def test_two_recipes_on_one_page(self):
+        ingredients = [f"- {i} cups ingredient{i}" for i in range(1, 13)]
+        steps = [f"{i}. Do step number {i} carefully" for i in range(1, 6)]
+        page = Document(
+            page_content="\n".join(
+                ["Long Stew", "Ingredients:", *ingredients, "Instructions:", *steps,
+                 "Quick Salad", "Ingredients:", "- 1 lettuce", "- 2 tomatoes",
+                 "Instructions:", "1. Toss everything together"]
+            ),
+            metadata={"source": "book.pdf", "page": 3},
+        )
+        chunks = list(iter_recipe_chunks([page], max_tokens=40, count_tokens=count_words))
+        self.assertGreater(sum(c.metadata["recipe_title"] == "Long Stew" for c in chunks), 1)
+
+        recipes = group_recipes([c.page_content for c in chunks], [c.metadata for c in chunks])
+
+        self.assertEqual([r["title"] for r in recipes], ["Long Stew", "Quick Salad"])
+        stew, salad = recipes
+        self.assertEqual(len(stew["ingredient_lines"]), 12)
+        self.assertEqual(len(stew["steps"]), 5)
+        self.assertEqual(salad["ingredients"], ["lettuce", "tomato"])
+        self.assertEqual(salad["steps"], ["Toss everything together"])
+
+
+class RecipeChunkerTests(SimpleTestCase):
+    def test_book_without_ingredients_headers_streams(self):
+        read = []
+
+        def pages():
+            for number in range(50):
+                read.append(number)
+                yield Document(page_content=f"Essay page {number}\n" + "words " * 30,
+                               metadata={"source": "book.pdf", "page": number})
+
+        chunks = iter_recipe_chunks(pages(), max_tokens=40, count_tokens=count_words, max_buffered_pages=4)
+        first = next(chunks)
+        self.assertEqual(first.metadata["page"], 0)
+        self.assertLessEqual(len(read), 6)
+        rest = list(chunks)
+        self.assertEqual(len(read), 50)
+        self.assertEqual(rest[-1].metadata["page"], 49)
+
+    def test_long_recipe_flushed_in_pieces_regroups(self):
+        steps = [Document(page_content=f"{i}. Stir the pot for step {i}", metadata={"source": "book.pdf", "page": i})
+                 for i in range(1, 20)]
+        start = Document(page_content="Slow Stew\nIngredients:\n- 1 onion\nInstructions:",
+                         metadata={"source": "book.pdf", "page": 0})
+        chunks = list(iter_recipe_chunks([start, *steps], max_tokens=40, count_tokens=count_words,
+                                         max_buffered_pages=4))
+        self.assertEqual([c.metadata["recipe_part"] for c in chunks], list(range(len(chunks))))
+
+        recipes = group_recipes([c.page_content for c in chunks], [c.metadata for c in chunks])
+        self.assertEqual(len(recipes), 1)
+        self.assertEqual(len(recipes[0]["steps"]), 19)
+
+
+class RecipeCatalogTests(SimpleTestCase):
+    def test_complete_recipe_wins_title_over_fragment(self):
+        fragment = {"title": "Long Stew", "ingredient_lines": ["1 onion"], "steps": []}
+        full = {"title": "Long Stew", "ingredient_lines": ["1 onion"], "steps": ["Simmer"]}
+        catalog = RecipeCatalog([fragment, full])
+        self.assertIs(catalog.lookup("Long Stew")[0], full)
+
+
+class StubAIService:
+    """
+    Stands in for RecipeAIService in view tests: returns canned results
+    and streams canned events
+    """
+
+    def __init__(self, result=None, events=(), retry_after=None):
+        self.result = result or {'success': True, 'result': 'Boil the pasta.'}
+        self.events = list(events)
+        self.retry_after = retry_after
+        self.calls = []
+
+    def search(self, query, query_type, generate=False):
+        self.calls.append((query, query_type, generate))
+        return self.result
+
+    async def asearch(self, query, query_type, generate=False):
+        return self.search(query, query_type, generate)
+
+    def stream_search(self, query, query_type, generate=False):
+        self.calls.append((query, query_type, generate))
+        yield from self.events
+
+    async def astream_search(self, query, query_type, generate=False):
+        for event in self.stream_search(query, query_type, generate):
+            yield event
+
+    def overloaded(self):
+        return self.retry_after
+
+    def llm_stats(self):
+        return {'models': {}}
+
+
+def status_in(state):
+    status = ServiceStatus()
+    if state != 'idle':
+        status.begin()
+        if state != 'loading':
+            status.finish(error='no model' if state == 'failed' else None)
+    return status
+
+
+class AsyncSearchViewTests(TestCase):
+    async def test_search_returns_result_and_saves_history(self):
+        service = StubAIService()
+        with mock.patch('recipe_app.views.get_recipe_ai_service', return_value=service):
+            response = await self.async_client.post(
+                '/api/async/search/', {'query': ' pasta ', 'type': 'ingredients', 'generate': True},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result'], 'Boil the pasta.')
+        self.assertEqual(service.calls, [('pasta', 'ingredients', True)])
+        saved = await SearchHistory.objects.aget()
+        self.assertEqual((saved.query_type, saved.query_text, saved.result), ('ingredients', 'pasta', 'Boil the pasta.'))
+
+    async def test_failed_search_is_not_saved(self):
+        service = StubAIService(result={'success': False, 'error': 'boom'})
+        with mock.patch('recipe_app.views.get_recipe_ai_service', return_value=service):
+            response = await self.async_client.post(
+                '/api/async/search/', {'query': 'pasta'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await SearchHistory.objects.acount(), 0)
+
+    async def test_overloaded_search_returns_503_with_retry_after(self):
+        service = StubAIService(result={'success': False, 'retry_after': 7})
+        with mock.patch('recipe_app.views.get_recipe_ai_service', return_value=service):
+            response = await self.async_client.post(
+                '/api/async/search/', {'query': 'pasta'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+
+    async def test_bad_bodies_return_400(self):
+        service = StubAIService()
+        bodies = ['[1, 2]', '"pasta"', '{"query": "   "}', '{}', 'not json']
+        with mock.patch('recipe_app.views.get_recipe_ai_service', return_value=service):
+            for url in ('/api/async/search/', '/api/async/search/stream/'):
+                for body in bodies:
+                    with self.subTest(url=url, body=body):
+                        response = await self.async_client.post(url, body, content_type='application/json')
+                        self.assertEqual(response.status_code, 400)
+                        self.assertFalse(response.json()['success'])
+        self.assertEqual(service.calls, [])
+
+    async def test_non_string_query_is_coerced(self):
+        service = StubAIService()
+        with mock.patch('recipe_app.views.get_recipe_ai_service', return_value=service):
+            response = await self.async_client.post(
+                '/api/async/search/', {'query': 5}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(service.calls, [('5', 'recipe_name', False)])
+
+    async def test_stream_saves_history_when_done(self):
+        service = StubAIService(events=[('token', 'Boil '), ('token', 'it.'),
+                                        ('done', {'success': True, 'result': 'Boil it.'})])
+        with mock.patch('recipe_app.views.get_recipe_ai_service', return_value=service):
+            response = await self.async_client.post(
+                '/api/async/search/stream/', {'query': 'pasta'}, content_type='application/json'
+            )
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(sse_events(body), [('token', {'text': 'Boil '}), ('token', {'text': 'it.'}),
+                                            ('done', {'success': True, 'result': 'Boil it.'})])
+        saved = await SearchHistory.objects.aget()
+        self.assertEqual(saved.result, 'Boil it.')
+
+
+class AsyncHistoryAndHealthViewTests(TestCase):
+    async def test_history_lists_latest_searches_first(self):
+        for i in range(25):
+            await SearchHistory.objects.acreate(query_type='recipe', query_text=f'query {i}', result='')
+        response = await self.async_client.get('/api/async/history/')
+        history = response.json()['history']
+        self.assertEqual(len(history), 20)
+        self.assertEqual(history[0]['query_text'], 'query 24')
+
+    async def test_history_rejects_post(self):
+        response = await self.async_client.post('/api/async/history/')
+        self.assertEqual(response.status_code, 405)
+
+    async def test_live_does_not_wait_for_the_service(self):
+        with mock.patch('recipe_app.views.service_status', status_in('loading')):
+            response = await self.async_client.get('/api/async/health/live/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'alive')
+
+    async def test_ready_reports_each_state(self):
+        cases = [
+            ('idle', 503, 'not ready'),
+            ('loading', 503, 'not ready'),
+            ('failed', 503, 'not ready'),
+            ('ready', 200, 'ready'),
+        ]
+        for state, code, label in cases:
+            with self.subTest(state=state), \
+                    mock.patch('recipe_app.views.service_status', status_in(state)), \
+                    mock.patch('recipe_app.views.start_background_warmup') as warmup, \
+                    mock.patch('recipe_app.views.get_recipe_ai_service', return_value=StubAIService()):
+                response = await self.async_client.get('/api/async/health/ready/')
+                self.assertEqual(response.status_code, code)
+                self.assertEqual(response.json()['status'], label)
+                self.assertEqual(warmup.called, state == 'idle')
+
+    async def test_ready_includes_llm_stats(self):
+        with mock.patch('recipe_app.views.service_status', status_in('ready')), \
+                mock.patch('recipe_app.views.get_recipe_ai_service', return_value=StubAIService()):
+            response = await self.async_client.get('/api/async/health/ready/')
+        self.assertEqual(response.json()['llm'], {'models': {}})
+
+    async def test_health_check_reports_failure(self):
+        with mock.patch('recipe_app.views.service_status', status_in('failed')):
+            response = await self.async_client.get('/api/async/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'no model')
+
+
+class StubChain:
+    """
+    Chain that streams fixed chunks, then optionally fails
+    """
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    def stream(self, input, config=None):
+        yield from self.chunks
+        if self.error:
+            raise self.error
+
+    async def astream(self, input, config=None):
+        for chunk in self.stream(input, config):
+            yield chunk
+
+
+def service_with_chain(chain):
+    """A RecipeAIService that answers general queries with chain, without loading models"""
+    service = object.__new__(RecipeAIService)
+    service.answer_cache = None
+    service.rag_chain = chain
+    service.flights = SingleFlight()
+    service.async_flights = AsyncSingleFlight()
+    service.model_router = mock.Mock(scheduler=None)
+    return service
+
+
+class SearchStreamViewTests(TestCase):
+    def stream(self, body, chain):
+        with mock.patch('recipe_app.views.get_recipe_ai_service', return_value=service_with_chain(chain)):
+            response = self.client.post('/api/search/stream/', body, content_type='application/json')
+            if not response.streaming:
+                return response, None
+            return response, sse_events(b''.join(response.streaming_content).decode())
+
+    def test_tokens_then_done(self):
+        response, events = self.stream({'query': 'soup', 'type': 'general'}, StubChain(['Hot ', 'soup.']))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(events[:2], [('token', {'text': 'Hot '}), ('token', {'text': 'soup.'})])
+        event, result = events[2]
+        self.assertEqual(event, 'done')
+        self.assertEqual((result['success'], result['result'], result['coalesced']), (True, 'Hot soup.', False))
+        self.assertEqual(len(events), 3)
+        self.assertEqual(SearchHistory.objects.get().result, 'Hot soup.')
+
+    def test_tokens_then_error(self):
+        response, events = self.stream({'query': 'soup', 'type': 'general'},
+                                       StubChain(['Hot '], error=RuntimeError('groq went away')))
+        self.assertEqual(events[0], ('token', {'text': 'Hot '}))
+        self.assertEqual(events[1][0], 'error')
+        self.assertEqual(events[1][1]['error'], 'groq went away')
+        self.assertEqual(len(events), 2)
+        self.assertFalse(SearchHistory.objects.exists())
+
+    def test_bad_bodies_return_400(self):
+        for body in ([1, 2], {'query': '  '}, {}):
+            with self.subTest(body=body):
+                response, _ = self.stream(body, StubChain([]))
+                self.assertEqual(response.status_code, 400)
+
+    def test_non_string_query_is_coerced(self):
+        response, events = self.stream({'query': 5, 'type': 'general'}, StubChain(['Five.']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(events[-1][1]['query'], '5')
+
+
+class CancelRecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that counts requests cancelled while in flight
+    """
+
+    def __init__(self):
+        self.transport = httpx.AsyncHTTPTransport()
+        self.cancelled = 0
+
+    async def handle_async_request(self, request):
+        try:
+            return await self.transport.handle_async_request(request)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class LLMTransportTests(SimpleTestCase):
+    body = {'model': 'stub-model', 'messages': [{'role': 'user', 'content': 'soup?'}]}
+
+    def stub(self, **behaviour):
+        server, url = start_stub(latency=0.01, jitter=0, **behaviour)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server.behaviour.stats, url + COMPLETIONS_PATH
+
+    def http_client(self, **policy):
+        stats = TransportStats()
+        client = httpx.Client(transport=ResilientTransport(stats=stats, **policy))
+        self.addCleanup(client.close)
+        return client, stats
+
+    def test_429_is_retried_after_retry_after(self):
+        served, url = self.stub(retry_after=0.3, script=[(0.01, 429)])
+        client, stats = self.http_client(max_retries=3, deadline=10)
+        start = time.monotonic()
+        response = client.post(url, json=self.body)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(served['requests'], 2)
+        self.assertEqual(stats.snapshot()['retries'], 1)
+
+    def test_gives_up_when_retry_after_passes_the_deadline(self):
+        served, url = self.stub(retry_after=5, error_rate=1.0)
+        client, stats = self.http_client(max_retries=3, deadline=1)
+        start = time.monotonic()
+        response = client.post(url, json=self.body)
+        self.assertEqual(response.status_code, 429)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(served['requests'], 1)
+        snapshot = stats.snapshot()
+        self.assertEqual((snapshot['deadline_exceeded'], snapshot['failures'], snapshot['retries']), (1, 1, 0))
+
+    def test_other_4xx_is_not_retried(self):
+        for code in (400, 401, 404, 422):
+            with self.subTest(code=code):
+                served, url = self.stub(script=[(0.01, code)])
+                client, stats = self.http_client(max_retries=3, deadline=10)
+                self.assertEqual(client.post(url, json=self.body).status_code, code)
+                self.assertEqual(served['requests'], 1)
+                self.assertEqual(stats.snapshot()['retries'], 0)
+
+    def test_connections_are_reused(self):
+        served, url = self.stub()
+        client, stats = self.http_client()
+        for _ in range(5):
+            self.assertEqual(client.post(url, json=self.body).status_code, 200)
+        self.assertEqual(served['requests'], 5)
+        self.assertEqual(served['connections'], 1)
+
+    async def test_hedge_wins_and_slow_copy_is_cancelled(self):
+        served, url = self.stub(script=[(3.0, None), (0.01, None)])
+        stats = TransportStats()
+        # Enough fast requests seen to hedge after the minimum delay
+        for _ in range(20):
+            stats.observe(('stub-model', False), 0.01)
+        inner = CancelRecordingTransport()
+        async with httpx.AsyncClient(transport=AsyncResilientTransport(inner, stats=stats, hedge=True,
+                                                                      deadline=10)) as client:
+            start = time.monotonic()
+            response = await client.post(url, json=self.body)
+            elapsed = time.monotonic() - start
+            await asyncio.sleep(0.05)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 2)
+        snapshot = stats.snapshot()
+        self.assertEqual((snapshot['hedges'], snapshot['hedge_wins']), (1, 1))
+        self.assertEqual(served['requests'], 2)
+        self.assertEqual(inner.cancelled, 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class LLMSchedulerTests(SimpleTestCase):
+    def scheduler(self, **limits):
+        clock = FakeClock()
+        limits = {'requests_per_minute': 60, 'tokens_per_minute': 6000, 'processes': 1,
+                  'queue_timeout': 120, 'batch_queue_timeout': 600, **limits}
+        return LLMScheduler(clock=clock, **limits), clock
+
+    def grant(self, scheduler):
+        with scheduler._cond:
+            scheduler._grant_ready()
+
+    def tokens_left(self, scheduler, model='m'):
+        return scheduler.snapshot()['buckets'][model]['tokens']
+
+    def test_bucket_refills_at_its_rate_up_to_capacity(self):
+        bucket = TokenBucket(60, now=0.0)
+        bucket.take(60, now=0.0)
+        self.assertEqual(bucket.wait_time(30, now=0.0), 30.0)
+        self.assertEqual(bucket.wait_time(30, now=15.0), 15.0)
+        bucket.refill(now=600.0)
+        self.assertEqual(bucket.level, 60.0)
+        # A call larger than the bucket waits for a full bucket
+        self.assertEqual(bucket.wait_time(1000, now=600.0), 0.0)
+
+    def test_call_waits_for_refill(self):
+        scheduler, clock = self.scheduler(requests_per_minute=2)
+        self.assertEqual(scheduler.acquire('m', 100), 0.0)
+        self.assertEqual(scheduler.acquire('m', 100), 0.0)
+        waiter = scheduler._enqueue('m', 100, INTERACTIVE, None)
+        self.assertIsNotNone(waiter)
+        clock.advance(29)
+        self.grant(scheduler)
+        self.assertFalse(waiter.granted)
+        clock.advance(1)
+        self.grant(scheduler)
+        self.assertTrue(waiter.granted)
+        self.assertEqual(scheduler._settle(waiter), 30.0)
+
+    def test_interactive_calls_start_before_earlier_batch_calls(self):
+        scheduler, clock = self.scheduler(requests_per_minute=1)
+        scheduler.acquire('m', 100)
+        batch = scheduler._enqueue('m', 100, BATCH, None)
+        interactive = scheduler._enqueue('m', 100, INTERACTIVE, None)
+        clock.advance(60)
+        self.grant(scheduler)
+        self.assertEqual((interactive.granted, batch.granted), (True, False))
+        clock.advance(60)
+        self.grant(scheduler)
+        self.assertTrue(batch.granted)
+
+    def test_full_queue_evicts_batch_then_turns_away(self):
+        scheduler, clock = self.scheduler(requests_per_minute=1, queue_size=1)
+        scheduler.acquire('m', 100)
+        batch = scheduler._enqueue('m', 100, BATCH, None)
+        interactive = scheduler._enqueue('m', 100, INTERACTIVE, None)
+        self.assertIsInstance(batch.error, LLMOverloaded)
+        with self.assertRaises(LLMOverloaded):
+            scheduler._settle(batch)
+        self.assertIsNotNone(scheduler.overloaded(INTERACTIVE))
+        with self.assertRaises(LLMOverloaded) as raised:
+            scheduler._enqueue('m', 100, INTERACTIVE, None)
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(scheduler.snapshot()['rejected'],
+                         {'queue_full': 1, 'over_deadline': 0, 'queue_timeout': 0, 'evicted': 1})
+        self.assertFalse(interactive.granted)
+
+    def test_call_times_out_in_the_queue(self):
+        scheduler, clock = self.scheduler(requests_per_minute=1, queue_timeout=61)
+        scheduler.acquire('m', 100)
+        waiter = scheduler._enqueue('m', 100, INTERACTIVE, None)
+        # Another model's call empties this model's bucket as it refills
+        clock.advance(62)
+        scheduler._model_buckets('m')[0].take(1, clock())
+        with self.assertRaises(LLMOverloaded):
+            scheduler._settle(waiter)
+        self.assertEqual(scheduler._queue, [])
+        self.assertEqual(scheduler.snapshot()['rejected']['queue_timeout'], 1)
+
+    def test_expected_wait_over_timeout_is_rejected_up_front(self):
+        scheduler, clock = self.scheduler(tokens_per_minute=600, queue_timeout=20)
+        scheduler.acquire('m', 600)
+        with self.assertRaises(LLMOverloaded):
+            scheduler._enqueue('m', 600, INTERACTIVE, None)
+        self.assertEqual(scheduler.snapshot()['rejected']['over_deadline'], 1)
+
+    async def test_call_cancelled_after_its_grant_is_refunded(self):
+        scheduler, clock = self.scheduler(requests_per_minute=1)
+        scheduler.acquire('m', 1000)
+        task = asyncio.ensure_future(scheduler.aacquire('m', 1000))
+        await asyncio.sleep(0)
+        self.assertEqual(len(scheduler._queue), 1)
+        clock.advance(60)
+        self.grant(scheduler)
+        self.assertEqual(self.tokens_left(scheduler), 5000)
+        # Cancelled before it resumes: the call never runs
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(self.tokens_left(scheduler), 6000)
+        self.assertEqual(scheduler.snapshot()['buckets']['m']['requests'], 1)
+
+    async def test_call_cancelled_while_queued_leaves_the_queue(self):
+        scheduler, clock = self.scheduler(requests_per_minute=1)
+        scheduler.acquire('m', 100)
+        task = asyncio.ensure_future(scheduler.aacquire('m', 100))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(scheduler._queue, [])
+
+    def test_reconcile_credits_unused_reservation(self):
+        scheduler, clock = self.scheduler()
+        scheduler.acquire('m', 2000)
+        self.assertEqual(self.tokens_left(scheduler), 4000)
+        scheduler.reconcile('m', 2000, 300)
+        self.assertEqual(self.tokens_left(scheduler), 5700)
+        # Using more than reserved charges the difference
+        scheduler.acquire('m', 100)
+        scheduler.reconcile('m', 100, 700)
+        self.assertEqual(self.tokens_left(scheduler), 5000)
+
+    def test_limits_are_split_between_processes(self):
+        scheduler, clock = self.scheduler(requests_per_minute=30, tokens_per_minute=6000, processes=3)
+        scheduler.acquire('m', 100)
+        limits = scheduler.snapshot()['limits']
+        self.assertEqual((limits['requests_per_minute'], limits['tokens_per_minute']), (10, 2000))
+        self.assertEqual(self.tokens_left(scheduler), 1900)
+
+
+class ModelRouterTests(SimpleTestCase):
+    def test_classify(self):
+        cases = [
+            # (route, context, expected)
+            ({'query_type': 'recipe_name', 'catalog_match': True}, {}, (SMALL, 'catalog_match')),
+            ({'query_type': 'ingredients', 'ingredients': 5}, {'passages': 1}, (LARGE, 'many_ingredients')),
+            ({'query_type': 'ingredients', 'ingredients': 2}, {'passages': 0}, (LARGE, 'no_context')),
+            ({'query_type': 'ingredients', 'ingredients': 2}, {'passages': 2}, (SMALL, 'narrow_context')),
+            ({'query_type': 'ingredients', 'ingredients': 2}, {'passages': 3}, (LARGE, 'broad_context')),
+            ({'query_type': 'general'}, {'passages': 1, 'top_similarity': 0.8}, (SMALL, 'narrow_context')),
+            ({'query_type': 'general'}, {'passages': 1, 'top_similarity': 0.2}, (LARGE, 'low_similarity')),
+            ({'query_type': 'general'}, {'passages': 4, 'top_similarity': 0.8}, (LARGE, 'broad_context')),
+            # Adaptive retrieval off: no similarity, and k passages whatever the query
+            ({'query_type': 'recipe_name'}, {'passages': 4}, (SMALL, 'recipe_lookup')),
+            ({'query_type': 'recipe_name'}, {'passages': 1}, (SMALL, 'recipe_lookup')),
+            ({'query_type': 'general'}, {'passages': 1}, (LARGE, 'open_question')),
+            ({'query_type': 'general'}, {}, (LARGE, 'no_context')),
+        ]
+        for route, context, expected in cases:
+            with self.subTest(route=route, context=context):
+                self.assertEqual(classify(route, context), expected)
+
+    def test_latency_recorder(self):
+        with_metadata = AIMessage(content='Soup', usage_metadata={
+            'input_tokens': 20, 'output_tokens': 3, 'total_tokens': 23})
+        cases = [
+            # (generation message, llm_output, expected tokens)
+            (with_metadata, None, 23),
+            (AIMessage(content='Soup'), {'token_usage': {'total_tokens': 17}}, 17),
+            (AIMessage(content='Soup'), None, None),
+        ]
+        for message, llm_output, tokens in cases:
+            with self.subTest(tokens=tokens):
+                stats, decision, used = ModelStats(), {'name': 'm'}, []
+                recorder = _LatencyRecorder(stats, decision, on_usage=used.append)
+                recorder.on_chat_model_start({}, [])
+                recorder.on_llm_new_token('So')
+                recorder.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]],
+                                              llm_output=llm_output))
+                self.assertEqual(decision.get('tokens'), tokens)
+                self.assertEqual(used, [] if tokens is None else [tokens])
+                self.assertIn('seconds', decision)
+                model = stats.snapshot()['models']['m']
+                self.assertEqual((model['calls'], model['errors']), (1, 0))
+                self.assertIn('p50_first_token_seconds', model)
+
+    def test_latency_recorder_counts_errors(self):
+        stats, decision = ModelStats(), {'name': 'm'}
+        recorder = _LatencyRecorder(stats, decision)
+        recorder.on_llm_start({}, ['prompt'])
+        recorder.on_llm_error(RuntimeError('boom'))
+        self.assertEqual(stats.snapshot()['models']['m'], {'calls': 1, 'errors': 1})
+        self.assertNotIn('seconds', decision)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        runs = []
+
+        def work():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return 'answer'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', work)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('k', work))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(sorted(results), [('answer', False)] + [('answer', True)] * 3)
+        # Nothing is kept once the call finishes
+        self.assertEqual(flight.do('k', lambda: 'again'), ('again', False))
+
+    def test_follower_takes_over_a_stream_its_leader_abandoned(self):
+        flight = SingleFlight()
+        pulled = []
+
+        def tokens():
+            for i in range(4):
+                pulled.append(i)
+                yield i
+
+        leader = flight.stream('k', tokens)
+        self.assertEqual(next(leader), (0, False))
+        follower = flight.stream('k', tokens)
+        self.assertEqual(next(follower), (0, True))
+        leader.close()
+        self.assertEqual(list(follower), [(1, True), (2, True), (3, True)])
+        self.assertEqual(pulled, [0, 1, 2, 3])
+
+    def test_last_reader_leaving_stops_the_stream(self):
+        flight = SingleFlight()
+        closed = []
+
+        def tokens():
+            try:
+                yield from range(10)
+            finally:
+                closed.append(True)
+
+        reader = flight.stream('k', tokens)
+        next(reader)
+        reader.close()
+        self.assertEqual(closed, [True])
+        self.assertEqual(list(flight.stream('k', lambda: iter('ab'))), [('a', False), ('b', False)])
+
+    def test_stream_error_reaches_every_reader(self):
+        flight = SingleFlight()
+
+        def failing():
+            yield 'a'
+            raise ValueError('broken')
+
+        leader = flight.stream('k', failing)
+        next(leader)
+        follower = flight.stream('k', failing)
+        self.assertEqual(next(follower), ('a', True))
+        with self.assertRaises(ValueError):
+            next(leader)
+        with self.assertRaises(ValueError):
+            next(follower)
+
+
+class AsyncSingleFlightTests(SimpleTestCase):
+    async def test_concurrent_calls_share_one_run(self):
+        flight = AsyncSingleFlight()
+        release = asyncio.Event()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await release.wait()
+            return 'answer'
+
+        calls = [asyncio.ensure_future(flight.do('k', work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await asyncio.gather(*calls), [('answer', False), ('answer', True), ('answer', True)])
+        self.assertEqual(len(runs), 1)
+
+    async def test_work_outlives_a_cancelled_caller_but_not_the_last_one(self):
+        flight = AsyncSingleFlight()
+        release = asyncio.Event()
+        cancelled = []
+
+        async def work():
+            try:
+                await release.wait()
+                return 'answer'
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        first = asyncio.ensure_future(flight.do('k', work))
+        second = asyncio.ensure_future(flight.do('k', work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        self.assertEqual(cancelled, [])
+        self.assertFalse(second.done())
+        second.cancel()
+        await asyncio.sleep(0.01)
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(flight._tasks, {})
+
+    async def test_stream_is_produced_once_for_all_readers(self):
+        flight = AsyncSingleFlight()
+        runs = []
+
+        async def tokens():
+            runs.append(1)
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield i
+
+        async def read():
+            return [item async for item in flight.stream('k', tokens)]
+
+        first, second = await asyncio.gather(read(), read())
+        self.assertEqual(first, [(0, False), (1, False), (2, False)])
+        self.assertEqual(second, [(0, True), (1, True), (2, True)])
+        self.assertEqual(len(runs), 1)
+
+    async def test_producer_is_cancelled_when_the_last_reader_leaves(self):
+        flight = AsyncSingleFlight()
+        gate = asyncio.Event()
+        stopped = []
+
+        async def tokens():
+            try:
+                yield 'a'
+                await gate.wait()
+                yield 'b'
+            except asyncio.CancelledError:
+                stopped.append(True)
+                raise
+
+        first = flight.stream('k', tokens)
+        second = flight.stream('k', tokens)
+        self.assertEqual(await first.__anext__(), ('a', False))
+        self.assertEqual(await second.__anext__(), ('a', True))
+        await first.aclose()
+        await asyncio.sleep(0.01)
+        self.assertEqual(stopped, [])
+        await second.aclose()
+        await asyncio.sleep(0.01)
+        self.assertEqual(stopped, [True])
+        self.assertEqual(flight._streams, {})
+
+
+class ChunkIdTests(SimpleTestCase):
+    def chunks(self, source, pages):
+        return [Document(page_content=text, metadata={'source': source, 'page': page}) for text, page in pages]
+
+    def test_ids_survive_page_shifts(self):
+        before = self.chunks('/books/a.pdf', [('Soup', 1), ('Stew', 2), ('Soup', 3)])
+        after = self.chunks('/books/a.pdf', [('Preface', 1), ('Soup', 2), ('Stew', 3), ('Soup', 4)])
+        ids = assign_chunk_ids(before)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(assign_chunk_ids(after)[1:], ids)
+
+    def test_ids_differ_between_books(self):
+        self.assertNotEqual(assign_chunk_ids(self.chunks('/books/a.pdf', [('Soup', 1)])),
+                            assign_chunk_ids(self.chunks('/books/b.pdf', [('Soup', 1)])))
+
+    def test_batches_sharing_seen_match_one_pass(self):
+        chunks = self.chunks('/books/a.pdf', [('Soup', 1), ('Soup', 1), ('Soup', 2)])
+        seen = {}
+        batched = assign_chunk_ids(chunks[:2], seen) + assign_chunk_ids(chunks[2:], seen)
+        self.assertEqual(batched, assign_chunk_ids(chunks))
+
+
+class NumpyIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def write(self, rows):
+        vectors = np.random.default_rng(rows).normal(size=(rows, 8))
+        return write_index(self.path, [f'id{i}' for i in range(rows)], vectors,
+                           [f'text {i}' for i in range(rows)], [{} for _ in range(rows)])
+
+    def test_each_write_publishes_a_matching_pair(self):
+        first = self.write(3)
+        reader = NumpyVectorIndex(self.path)
+        second = self.write(5)
+        self.assertEqual(read_generation(self.path), second)
+        # A reader keeps the generation it loaded
+        self.assertEqual((reader.generation, len(reader), reader.vectors.shape[0]), (first, 3, 3))
+        fresh = NumpyVectorIndex(self.path)
+        self.assertEqual((fresh.generation, len(fresh), fresh.vectors.shape[0]), (second, 5, 5))
+
+    def test_old_generations_are_removed(self):
+        first = self.write(2)
+        second = self.write(3)
+        third = self.write(4)
+        names = sorted(os.listdir(self.path))
+        self.assertFalse(any(first in name for name in names))
+        self.assertEqual(sum(second in name for name in names), 2)
+        self.assertEqual(sum(third in name for name in names), 2)
+
+    def test_empty_directory_is_an_empty_index(self):
+        self.assertEqual(len(NumpyVectorIndex(self.path)), 0)
+
+
+def recipe_doc(text, page=1):
+    return Document(page_content=text, metadata={'source': '/books/a.pdf', 'page': page})
+
+
+def page_doc(text, page, **metadata):
+    return Document(page_content=text, metadata={'source': '/books/a.pdf', 'page': page, **metadata})
+
+
+class AdaptiveRetrievalTests(SimpleTestCase):
+    def test_choose_k(self):
+        cases = [
+            # (scores best first, expected k) with min_k=1, max_k=5, min_similarity=0.3, elbow_gap=0.08
+            ([], 0),
+            ([0.9, 0.5, 0.48, 0.46], 1),              # one clear hit
+            ([0.82, 0.8, 0.6, 0.58], 2),              # two, then an elbow
+            ([0.6, 0.57, 0.55, 0.53, 0.51], 5),       # flat run: keep all
+            ([0.6, 0.57, 0.55, 0.53, 0.51, 0.5], 5),  # ... up to max_k
+            ([0.5, 0.45, 0.2, 0.1], 2),               # cut below min_similarity
+            ([0.2, 0.1], 1),                          # nothing similar: min_k still
+            ([0.9, 0.85, 0.3, 0.29], 2),              # the largest gap is the elbow
+        ]
+        for scores, expected in cases:
+            with self.subTest(scores=scores):
+                self.assertEqual(choose_k(scores, min_k=1, max_k=5, min_similarity=0.3, elbow_gap=0.08), expected)
+
+    def test_min_k_is_a_floor(self):
+        self.assertEqual(choose_k([0.9, 0.5, 0.4], min_k=2, max_k=5, min_similarity=0.3, elbow_gap=0.08), 2)
+        self.assertEqual(choose_k([0.9], min_k=3, max_k=5, min_similarity=0.3, elbow_gap=0.08), 1)
+
+    def test_retriever_keeps_the_chosen_chunks_with_their_similarity(self):
+        # The fake store scores its two recipes 0.9 and 0.8: a 0.1 drop
+        retriever = AdaptiveRetriever(vectorstore=FakeVectorStore(), min_k=1, max_k=4)
+        docs = retriever.invoke('tomato soup')
+        self.assertEqual([(doc.page_content, doc.metadata['similarity']) for doc in docs], [('Tomato soup', 0.9)])
+        self.assertEqual(asyncio.run(retriever.ainvoke('tomato soup')), docs)
+
+
+class ContextPackerTests(SimpleTestCase):
+    def pack(self, docs, budget=1500):
+        return pack_documents(docs, budget=budget, count_tokens=count_words)
+
+    def test_overlapping_chunks_of_a_page_are_merged(self):
+        first = 'Tomato soup. Fry the onions in butter until soft and golden'
+        second = 'in butter until soft and golden, then add the tomatoes'
+        context, report = self.pack([page_doc(first, 4), page_doc(second, 4), page_doc(second, 5)])
+        self.assertEqual(context.split('\n\n')[0], first + ', then add the tomatoes')
+        self.assertEqual((report['retrieved'], report['passages']), (3, 2))
+        self.assertGreater(report['saved_tokens'], 0)
+
+    def test_consecutive_recipe_parts_are_joined(self):
+        parts = [page_doc('Beef stew (continued)\nSimmer for two hours.', 9, recipe_title='Beef stew', recipe_part=2),
+                 page_doc('Beef stew\nBrown the beef.', 8, recipe_title='Beef stew', recipe_part=1)]
+        context, report = self.pack(parts)
+        self.assertEqual(context, 'Beef stew\nBrown the beef.\nSimmer for two hours.')
+        self.assertEqual(report['passages'], 1)
+
+    def test_near_duplicates_keep_the_better_ranked_copy(self):
+        text = 'Whisk the eggs with sugar, fold in the flour and bake for twenty minutes at 180 degrees'
+        context, report = self.pack([page_doc(text + ' until golden', 30), page_doc(text, 2)])
+        self.assertEqual(context, text + ' until golden')
+        self.assertEqual(report['passages'], 1)
+
+    def test_passages_fill_the_budget_best_first(self):
+        docs = [page_doc(' '.join(['best'] * 60), 7), page_doc(' '.join(['second'] * 60), 1),
+                page_doc(' '.join(['third'] * 60), 3)]
+        context, report = self.pack(docs, budget=100)
+        # The second passage is cut to the 40 words left; nothing fits after it
+        self.assertEqual(context.split('\n\n'), [' '.join(['second'] * 40), ' '.join(['best'] * 60)])
+        self.assertEqual((report['passages'], report['tokens']), (2, 100))
+
+    def test_too_little_room_skips_instead_of_cutting(self):
+        docs = [page_doc(' '.join(['best'] * 60), 1), page_doc(' '.join(['second'] * 60), 2),
+                page_doc('short one', 3)]
+        context, report = self.pack(docs, budget=60 + MIN_PASSAGE_TOKENS - 1)
+        self.assertEqual(context.split('\n\n'), [' '.join(['best'] * 60), 'short one'])
+        self.assertLessEqual(report['tokens'], 60 + MIN_PASSAGE_TOKENS - 1)
+
+    def test_similarity_is_reported_when_retrieval_scored_it(self):
+        docs = [page_doc('Soup', 1, similarity=0.71), page_doc('Stew', 2, similarity=0.64)]
+        self.assertEqual(self.pack(docs)[1]['top_similarity'], 0.71)
+        self.assertNotIn('top_similarity', self.pack([page_doc('Soup', 1)])[1])
+        self.assertEqual(self.pack([]), ('', {'retrieved': 0, 'passages': 0, 'tokens': 0, 'saved_tokens': 0}))
+
+
+class AnswerCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'answers.sqlite3')
+        self.clock = FakeClock()
+        patcher = mock.patch('answer_cache.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache(self, **kwargs):
+        cache = AnswerCache(self.path, **{'version': 'v1', 'ttl': 60, 'threshold': 0.95, **kwargs})
+        self.addCleanup(cache.db.close)
+        return cache
+
+    def test_exact_hit_ignores_case_spacing_and_punctuation(self):
+        cache = self.cache()
+        cache.put('recipe_name', 'Chicken Biryani', {'result': 'biryani'})
+        self.assertEqual(cache.get('recipe_name', '  chicken   BIRYANI? '), ({'result': 'biryani'}, 'exact'))
+        self.assertEqual(cache.get('general', 'chicken biryani'), (None, None))
+        self.assertEqual(cache.get('recipe_name', 'chicken korma'), (None, None))
+
+    def test_semantic_hit_above_the_threshold_only(self):
+        cache = self.cache()
+        cache.put('general', 'how long to boil an egg', {'result': 'eggs'}, embedding=[1.0, 0.0, 0.0])
+        cases = [
+            # (query type, embedding, expected)
+            ('general', [0.99, 0.1, 0.0], ({'result': 'eggs'}, 'semantic')),
+            ('general', [0.8, 0.6, 0.0], (None, None)),
+            ('recipe_name', [1.0, 0.0, 0.0], (None, None)),
+            ('general', None, (None, None)),
+        ]
+        for query_type, embedding, expected in cases:
+            with self.subTest(query_type=query_type, embedding=embedding):
+                self.assertEqual(cache.get(query_type, 'egg boiling time', embedding), expected)
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = self.cache()
+        cache.put('general', 'boiled egg', {'result': 'eggs'}, embedding=[1.0, 0.0])
+        self.clock.advance(59)
+        self.assertEqual(cache.get('general', 'boiled egg')[1], 'exact')
+        self.clock.advance(2)
+        self.assertEqual(cache.get('general', 'boiled egg'), (None, None))
+        self.assertEqual(cache.get('general', 'egg, boiled', [1.0, 0.0]), (None, None))
+        # Expired rows are purged on the next write
+        cache.put('general', 'poached egg', {'result': 'poached'})
+        self.assertEqual(len(cache), 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.cache(max_entries=2)
+        cache.put('general', 'soup', {'result': 'soup'})
+        self.clock.advance(1)
+        cache.put('general', 'stew', {'result': 'stew'})
+        self.clock.advance(1)
+        cache.get('general', 'soup')
+        self.clock.advance(1)
+        cache.put('general', 'curry', {'result': 'curry'})
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('general', 'stew'), (None, None))
+        self.assertEqual(cache.get('general', 'soup')[1], 'exact')
+
+    def test_a_new_store_version_drops_every_entry(self):
+        self.cache().put('general', 'boiled egg', {'result': 'eggs'})
+        self.assertEqual(self.cache().get('general', 'boiled egg')[1], 'exact')
+        self.assertEqual(self.cache(version='v2').get('general', 'boiled egg'), (None, None))
+
+    def test_clearing_reaches_other_processes(self):
+        writer, reader = self.cache(), self.cache()
+        writer.put('general', 'boiled egg', {'result': 'eggs'}, embedding=[1.0, 0.0])
+        self.assertEqual(reader.get('general', 'egg boiled', [1.0, 0.0])[1], 'semantic')
+        clear_answer_cache(self.path)
+        self.assertEqual(reader.get('general', 'egg boiled', [1.0, 0.0]), (None, None))
+        self.assertIsNone(reader.matrix)
+
+
+class BM25IndexTests(SimpleTestCase):
+    texts = [
+        'Chicken curry with rice and coriander',
+        'Beef stew with carrots and potatoes',
+        'Chicken soup with noodles',
+        'Saffron rice pudding',
+    ]
+
+    def test_tokenize_drops_stopwords_and_punctuation(self):
+        self.assertEqual(tokenize('Give me a recipe for Chicken-Curry, with RICE!'),
+                         ['chicken', 'curry', 'rice'])
+
+    def test_rare_terms_outrank_common_ones(self):
+        index = BM25Index.from_texts(self.texts)
+        ranked = [doc.page_content for doc in index.search('chicken saffron', k=4)]
+        # 'saffron' is in one chunk, 'chicken' in two
+        self.assertEqual(ranked[0], 'Saffron rice pudding')
+        self.assertEqual(set(ranked[1:]), {self.texts[0], self.texts[2]})
+
+    def test_term_frequency_and_length_are_normalized(self):
+        index = BM25Index.from_texts(['rice', 'rice rice rice', 'rice and a very long list of other pantry items'])
+        scores = dict((doc.page_content, score) for doc, score in index.search_with_score('rice', k=3))
+        self.assertGreater(scores['rice rice rice'], scores['rice'])
+        self.assertGreater(scores['rice'], scores['rice and a very long list of other pantry items'])
+
+    def test_no_matching_terms(self):
+        index = BM25Index.from_texts(self.texts)
+        self.assertEqual(index.search('the and of', k=4), [])
+        self.assertEqual(index.search('lasagne', k=4), [])
+        self.assertEqual(BM25Index.from_texts([]).search('rice'), [])
+
+    def test_save_and_load_keep_the_ranking(self):
+        path = os.path.join(tempfile.mkdtemp(), 'bm25.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        index = BM25Index.from_texts(iter(self.texts), [{'page': i} for i in range(4)])
+        index.save(path)
+        loaded = BM25Index.load(path)
+        self.assertEqual(loaded.search_with_score('chicken rice', k=4), index.search_with_score('chicken rice', k=4))
+        self.assertEqual(loaded.search('pudding')[0].metadata, {'page': 3})
+
+
+class HybridRetrieverTests(SimpleTestCase):
+    def test_rrf_rewards_agreement_between_lists(self):
+        a, b, c, d = (recipe_doc(text) for text in 'abcd')
+        fused = reciprocal_rank_fusion([[a, b, c], [c, d, b]], k=4, rrf_k=60)
+        # b: 1/62 + 1/63, c: 1/63 + 1/61 beat a: 1/61 and d: 1/62
+        self.assertEqual([doc.page_content for doc in fused], ['c', 'b', 'a', 'd'])
+
+    def test_rrf_merges_copies_of_a_chunk_and_truncates(self):
+        vector = [recipe_doc('Soup', page=2), recipe_doc('Stew')]
+        lexical = [recipe_doc('Soup', page=2), recipe_doc('Soup', page=5)]
+        fused = reciprocal_rank_fusion([vector, lexical], k=2)
+        self.assertEqual([(doc.page_content, doc.metadata['page']) for doc in fused], [('Soup', 2), ('Stew', 1)])
+        self.assertEqual(reciprocal_rank_fusion([[], []], k=4), [])
+
+    def retriever(self, vector_texts, **kwargs):
+        vectorstore = mock.Mock()
+        vectorstore.similarity_search.return_value = [recipe_doc(text) for text in vector_texts]
+        bm25 = BM25Index.from_texts(['Beef stew with carrots', 'Tomato soup', 'Pad thai with prawns'],
+                                    [{'source': '/books/a.pdf', 'page': 1}] * 3)
+        return HybridRetriever(vectorstore=vectorstore, bm25_index=bm25, **kwargs), vectorstore
+
+    def test_exact_name_found_by_bm25_is_fused_in(self):
+        # The embedding model misses the dish the query names
+        retriever, vectorstore = self.retriever(['Tomato soup', 'Beef stew with carrots'], k=2, fetch_k=5)
+        docs = retriever.invoke('pad thai')
+        self.assertEqual([doc.page_content for doc in docs], ['Tomato soup', 'Pad thai with prawns'])
+        vectorstore.similarity_search.assert_called_once_with('pad thai', k=5)
+
+    def test_async_matches_sync(self):
+        retriever, _ = self.retriever(['Tomato soup', 'Beef stew with carrots'], k=3)
+        self.assertEqual(asyncio.run(retriever.ainvoke('beef stew')), retriever.invoke('beef stew'))
+        self.assertEqual(retriever.invoke('beef stew')[0].page_content, 'Beef stew with carrots')
+
+
+class QuantizedIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        # Clustered like real chunk embeddings: 20 topics, 25 chunks each
+        rng = np.random.default_rng(7)
+        centres = rng.normal(size=(20, 32))
+        self.vectors = np.repeat(centres, 25, axis=0) + 0.4 * rng.normal(size=(500, 32))
+        write_index(self.path, [f'id{i}' for i in range(500)], self.vectors,
+                    [f'text {i}' for i in range(500)], [{'book': i % 2} for i in range(500)])
+        self.queries = self.vectors[::25] + 0.2 * rng.normal(size=(20, 32))
+        # Build the codes now, quietly
+        with contextlib.redirect_stdout(io.StringIO()):
+            QuantizedVectorIndex(self.path, mode='int8')
+
+    def top_ids(self, index, query, k=10, **kwargs):
+        return [doc.id for doc, _ in index.similarity_search_by_vector_with_score(query, k=k, **kwargs)]
+
+    def recall(self, index, k=10, **kwargs):
+        exact = NumpyVectorIndex(self.path)
+        hits = [len(set(self.top_ids(index, q, k, **kwargs)) & set(self.top_ids(exact, q, k, **kwargs)))
+                for q in self.queries]
+        return sum(hits) / (k * len(self.queries))
+
+    def test_int8_codes_are_within_half_a_step(self):
+        codes, scale = quantize_int8(self.vectors.astype(np.float32))
+        self.assertEqual(codes.dtype, np.int8)
+        self.assertTrue(np.all(np.abs(codes * scale - self.vectors) <= scale / 2 + 1e-6))
+
+    def test_int8_recall_matches_exact_search(self):
+        for factor, minimum in ((1, 0.95), (4, 0.99), (50, 1.0)):
+            with self.subTest(rerank_factor=factor):
+                index = QuantizedVectorIndex(self.path, mode='int8', rerank_factor=factor)
+                self.assertGreaterEqual(self.recall(index), minimum)
+
+    def test_int8_scores_are_exact_cosines(self):
+        index = QuantizedVectorIndex(self.path, mode='int8')
+        exact = NumpyVectorIndex(self.path)
+        query = self.queries[0]
+        self.assertEqual(index.similarity_search_by_vector_with_score(query, k=5),
+                         exact.similarity_search_by_vector_with_score(query, k=5))
+        self.assertEqual(index.resident_bytes, 500 * 32 + 32 * 4)
+
+    def test_filtered_search_keeps_only_matching_rows(self):
+        index = QuantizedVectorIndex(self.path, mode='int8')
+        results = index.similarity_search_by_vector_with_score(self.queries[0], k=10, filter={'book': 1})
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(doc.metadata == {'book': 1} for doc, _ in results))
+        self.assertGreaterEqual(self.recall(index, filter={'book': 1}), 0.99)
+
+    def test_evaluate_recall_reports_every_mode(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = evaluate_recall(self.path, k=4, sample=50, rerank_factors=(10,))
+        by_mode = {result['mode']: result['recall'] for result in results}
+        self.assertEqual(set(by_mode), {'int8', 'binary'})
+        self.assertGreaterEqual(by_mode['int8'], 0.95)
+
+
+class CountingEmbeddings:
+    """
+    Deterministic 4-dim embeddings that count the texts they embed
+    """
+
+    def __init__(self):
+        self.embedded = []
+
+    def vector(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0, float(text.count('a'))]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        # Strictly increasing timestamps keep the LRU order unambiguous
+        ticks = iter(range(1, 10_000))
+        patcher = mock.patch('embedding_cache.time.time', side_effect=lambda: float(next(ticks)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache(self, max_entries=3):
+        cache = EmbeddingCache('test-model', True, path=self.path, max_entries=max_entries)
+        self.addCleanup(cache.db.close)
+        return cache
+
+    def vector(self, value):
+        return np.full(4, value, dtype=np.float32)
+
+    def test_hits_skip_the_model(self):
+        model = CountingEmbeddings()
+        embeddings = CachedEmbeddings(model, 'test-model', True, path=self.path, max_entries=10)
+        self.addCleanup(embeddings.cache.db.close)
+        first = embeddings.embed_documents(['soup', 'stew', 'soup'])
+        second = embeddings.embed_documents(['stew', 'salad'])
+        self.assertEqual(model.embedded, ['soup', 'stew', 'salad'])
+        self.assertEqual((embeddings.hits, embeddings.misses), (2, 3))
+        self.assertEqual(first[1], second[0])
+        self.assertEqual(embeddings.embed_query('soup'), model.vector('soup'))
+        self.assertEqual(embeddings.hits, 3)
+
+    def test_least_recently_used_entry_is_evicted_at_capacity(self):
+        cache = self.cache(max_entries=3)
+        cache.put_many({'a': self.vector(1), 'b': self.vector(2), 'c': self.vector(3)})
+        cache.get_many(['a'])
+        cache.put_many({'d': self.vector(4)})
+        found = cache.get_many(['a', 'b', 'c', 'd'])
+        self.assertEqual(sorted(found), ['a', 'c', 'd'])
+        self.assertEqual(found['d'][0], 4)
+        self.assertEqual(len(cache), 3)
+
+    def test_entries_survive_reopening(self):
+        cache = self.cache()
+        cache.put_many({'a': self.vector(1), 'b': self.vector(2)})
+        cache.db.close()
+        reopened = self.cache()
+        found = reopened.get_many(['a', 'b', 'z'])
+        self.assertEqual({key: vector[0] for key, vector in found.items()}, {'a': 1, 'b': 2})
+
+    def test_failed_write_never_serves_an_overwritten_slot(self):
+        cache = self.cache(max_entries=3)
+        cache.put_many({'a': self.vector(1), 'b': self.vector(2), 'c': self.vector(3)})
+        with self.assertRaises(ValueError):
+            # 'd' overwrites the slot of evicted 'a', then the wrong-sized 'x' fails
+            cache.put_many({'d': self.vector(4), 'x': np.ones(5, dtype=np.float32)})
+        found = cache.get_many(['a', 'b', 'c', 'd', 'x'])
+        self.assertEqual({key: vector[0] for key, vector in found.items()}, {'c': 3})
+        # The freed slots are reused, so nothing else is evicted
+        cache.put_many({'e': self.vector(5), 'f': self.vector(6)})
+        found = cache.get_many(['c', 'e', 'f'])
+        self.assertEqual({key: vector[0] for key, vector in found.items()}, {'c': 3, 'e': 5, 'f': 6})
+
+
+class FakeVectorStore:
+    """
+    Two fixed recipes, scored by position; records the filters it was given
+    """
+
+    def __init__(self):
+        self.docs = [Document(page_content='Tomato soup', metadata={'page': 3}, id='a'),
+                     Document(page_content='Beef stew', metadata={'page': 7}, id='b')]
+        self.filters = []
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        self.filters.append(filter)
+        return [(doc, 0.9 - 0.1 * i) for i, doc in enumerate(self.docs[:k])]
+
+    def _similarity_search_with_relevance_scores(self, query, k=4, filter=None):
+        return self.similarity_search_with_score(query, k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score('', k=k, filter=filter)]
+
+
+class EmbeddingServerTests(SimpleTestCase):
+    def start_server(self):
+        path = os.path.join(tempfile.mkdtemp(), 'embed.sock')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        store = FakeVectorStore()
+        server = EmbeddingServer(path, CountingEmbeddings(), store)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return path, store
+
+    def test_texts_round_trip(self):
+        for texts in ([], [''], ['Tomato soup', 'crème brûlée', '🍅' * 3]):
+            with self.subTest(texts=texts):
+                self.assertEqual(embedding_server.unpack_texts(embedding_server.pack_texts(texts)), texts)
+
+    def test_matrix_round_trip(self):
+        # A single vector comes back as one row
+        for vectors, shape in (([1.0, 2.0, 3.0], (1, 3)), ([[1.0, 2.0], [3.0, 4.0]], (2, 2)),
+                               (np.zeros((0, 0)), (0, 0))):
+            with self.subTest(shape=shape):
+                unpacked = embedding_server.unpack_matrix(embedding_server.pack_matrix(vectors))
+                self.assertEqual(unpacked.dtype, np.float32)
+                np.testing.assert_array_equal(unpacked, np.asarray(vectors, dtype=np.float32).reshape(shape))
+
+    def test_search_and_results_round_trip(self):
+        for filter in (None, {'source': '/books/a.pdf'}):
+            with self.subTest(filter=filter):
+                payload = embedding_server.pack_search(5, SCORE_COSINE, filter, b'soup')
+                self.assertEqual(embedding_server.unpack_search(payload), (5, SCORE_COSINE, filter, b'soup'))
+        results = [(Document(page_content='Soup', metadata={'page': 1}, id='a'), 0.5),
+                   (Document(page_content='Stew', metadata={}, id='b'), None)]
+        self.assertEqual(embedding_server.unpack_results(embedding_server.pack_results(results)), results)
+
+    def test_remote_embeddings_and_search(self):
+        path, store = self.start_server()
+        embeddings, remote = RemoteEmbeddings(path), RemoteVectorStore(path)
+        self.addCleanup(embeddings.close)
+        self.addCleanup(remote.client.close)
+
+        local = CountingEmbeddings()
+        self.assertEqual(embeddings.embed_documents(['ab', 'abc']), local.embed_documents(['ab', 'abc']))
+        self.assertEqual(embeddings.embed_query('abcd'), local.embed_query('abcd'))
+        self.assertEqual(embeddings.embed_documents([]), [])
+
+        results = remote.similarity_search_with_cosine('soup', k=1, filter={'page': 3})
+        self.assertEqual([(doc.page_content, doc.id, score) for doc, score in results],
+                         [('Tomato soup', 'a', 0.9)])
+        self.assertEqual(store.filters, [{'page': 3}])
+        self.assertEqual([doc.id for doc in remote.similarity_search_by_vector([1.0, 0.0], k=2)], ['a', 'b'])
+        self.assertEqual(remote.client.info()['vector_store'], 'FakeVectorStore')
+
+    def test_server_errors_reach_the_caller(self):
+        path, _ = self.start_server()
+        remote = EmbeddingServerClient(path)
+        self.addCleanup(remote.close)
+        with self.assertRaisesMessage(EmbeddingServerError, 'ValueError: Unknown op 9'):
+            remote.call(9)
+        # The connection is still usable after an error reply
+        self.assertIn('pid', remote.info())
+
+    def test_dropped_connection_is_retried_once(self):
+        path, _ = self.start_server()
+        remote = EmbeddingServerClient(path)
+        self.addCleanup(remote.close)
+        # A kept-alive connection whose server end has gone away
+        stale, peer = socket.socketpair()
+        peer.close()
+        remote.local.sock, remote.local.pid = stale, os.getpid()
+        self.assertIn('pid', remote.info())
+        self.assertIsNot(remote.local.sock, stale)
+
+    def test_unreachable_server(self):
+        remote = EmbeddingServerClient(os.path.join(tempfile.gettempdir(), 'no-such-embedding-server.sock'))
+        with self.assertRaisesMessage(EmbeddingServerError, 'not reachable'):
+            remote.info()
+
+    def test_oversized_frame_is_answered_with_an_error(self):
+        path, _ = self.start_server()
+        remote = EmbeddingServerClient(path)
+        self.addCleanup(remote.close)
+        with mock.patch.object(embedding_server, 'MAX_FRAME_BYTES', 16):
+            with self.assertRaisesMessage(EmbeddingServerError, 'exceeds the 16-byte limit'):
+                remote.call(OP_EMBED_QUERY, b'x' * 100)
+            # The payload was skipped, so the next request on the same connection works
+            sock = remote.local.sock
+            self.assertEqual(embedding_server.unpack_matrix(remote.call(OP_EMBED_QUERY, b'ab')).shape, (1, 4))
+            self.assertIs(remote.local.sock, sock)
+
+    def test_oversized_frame_on_a_raw_socket(self):
+        path, _ = self.start_server()
+        with mock.patch.object(embedding_server, 'MAX_FRAME_BYTES', 16), \
+                socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(path)
+            sock.sendall(embedding_server.HEADER.pack(OP_EMBED_DOCUMENTS, 32) + b'\0' * 32)
+            status, length = embedding_server.HEADER.unpack(embedding_server._recv_exact(sock, embedding_server.HEADER.size))
+            self.assertEqual(status, STATUS_ERROR)
+            self.assertIn(b'exceeds', embedding_server._recv_exact(sock, length))
@@ -4,6 +4,18 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('api/search/', views.search_recipe, name='search_recipe'),
+    path('api/search/stream/', views.search_recipe_stream, name='search_recipe_stream'),
+    path('api/search/batch/', views.search_recipe_batch, name='search_recipe_batch'),
     path('api/history/', views.search_history, name='search_history'),
     path('api/health/', views.health_check, name='health_check'),
+    path('api/health/live/', views.health_live, name='health_live'),
+    path('api/health/ready/', views.health_ready, name='health_ready'),
+    # Async (ASGI) versions of the API
+    path('api/async/search/', views.async_search_recipe, name='async_search_recipe'),
+    path('api/async/search/stream/', views.async_search_recipe_stream, name='async_search_recipe_stream'),
+    path('api/async/search/batch/', views.async_search_recipe_batch, name='async_search_recipe_batch'),
+    path('api/async/history/', views.async_search_history, name='async_search_history'),
+    path('api/async/health/', views.async_health_check, name='async_health_check'),
+    path('api/async/health/live/', views.async_health_live, name='async_health_live'),
+    path('api/async/health/ready/', views.async_health_ready, name='async_health_ready'),
 ]
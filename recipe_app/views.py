@@ -1,13 +1,20 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 import json
+from asgiref.sync import sync_to_async
 
-from .ai_service import get_recipe_ai_service
+from .ai_service import (
+    get_recipe_ai_service,
+    start_background_warmup,
+    service_status,
+    SEARCH_BATCH_CONCURRENCY,
+    SEARCH_BATCH_MAX_ITEMS,
+)
 from .models import SearchHistory
 
 
@@ -20,12 +27,16 @@ def home(request):
 def search_recipe(request):
     """
     API endpoint to search for recipes
-    Accepts: { "query": "recipe name or ingredients", "type": "recipe" or "ingredients" }
+    Accepts: { "query": "recipe name or ingredients", "type": "recipe" or "ingredients",
+               "generate": false }
+    "generate": true asks the LLM to write the answer even when the recipe
+    name matches the catalog exactly
     """
     try:
         data = request.data
         query = data.get('query', '').strip()
         query_type = data.get('type', 'recipe')  # 'recipe' or 'ingredients'
+        generate = str(data.get('generate', False)).lower() in ('true', '1')
         
         if not query:
             return Response(
@@ -50,7 +61,7 @@ def search_recipe(request):
         
         # Perform search based on type
         if query_type == 'recipe':
-            result = ai_service.search_by_recipe_name(query)
+            result = ai_service.search_by_recipe_name(query, generate=generate)
         elif query_type == 'ingredients':
             result = ai_service.search_by_ingredients(query)
         else:
@@ -67,6 +78,13 @@ def search_recipe(request):
             except Exception as db_error:
                 print(f"Database error (non-critical): {db_error}")
         
+        if 'retry_after' in result:
+            # The LLM queue is full: ask the client to come back later
+            return Response(
+                result,
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(result['retry_after'])}
+            )
         return Response(result, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -79,6 +97,158 @@ def search_recipe(request):
         )
 
 
+def _sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _service_query_type(query_type):
+    """Map the API search type to the AI service query type"""
+    return {'recipe': 'recipe_name', 'ingredients': 'ingredients'}.get(query_type, 'general')
+
+
+@api_view(['POST'])
+def search_recipe_stream(request):
+    """
+    Streaming variant of search_recipe using Server-Sent Events
+    Accepts the same body as /api/search/ and emits:
+      event: token  data: {"text": "..."}     for each generated chunk
+      event: done   data: <search result>     once the answer is complete
+      event: error  data: {"error": "...", "success": false}
+    """
+    query, query_type, generate, error = _parse_search(request.data)
+    if error:
+        return Response({'error': error, 'success': False}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        ai_service = get_recipe_ai_service()
+    except Exception as init_error:
+        print(f"AI Service initialization error: {init_error}")
+        return Response(
+            {
+                'error': f'Failed to initialize AI service: {str(init_error)}',
+                'success': False
+            },
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    service_type = _service_query_type(query_type)
+    retry_after = ai_service.overloaded()
+    if retry_after is not None:
+        return _overloaded_response(query, service_type, retry_after)
+    
+    def events():
+        for event, payload in ai_service.stream_search(query, service_type, generate=generate):
+            if event == 'token':
+                yield _sse('token', {'text': payload})
+                continue
+            
+            # Save the complete answer to history once the stream ends
+            if event == 'done':
+                try:
+                    SearchHistory.objects.create(
+                        query_type=query_type,
+                        query_text=query,
+                        result=payload.get('result', '')
+                    )
+                except Exception as db_error:
+                    print(f"Database error (non-critical): {db_error}")
+            yield _sse(event, payload)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _overloaded_response(query, query_type, retry_after):
+    """503 with Retry-After for a search turned away before it starts"""
+    response = JsonResponse({
+        'success': False,
+        'query': query,
+        'query_type': query_type,
+        'error': 'Too many requests in progress, please retry',
+        'retry_after': retry_after
+    }, status=503)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _parse_batch(data):
+    """
+    Validate a batch search body
+    Returns (items for RecipeAIService.search_many, max_concurrency, error message)
+    """
+    if not isinstance(data, dict):
+        return None, None, 'Request body must be a JSON object'
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return None, None, '"queries" must be a non-empty list'
+    if len(queries) > SEARCH_BATCH_MAX_ITEMS:
+        return None, None, f'At most {SEARCH_BATCH_MAX_ITEMS} queries per batch'
+    
+    items = []
+    for entry in queries:
+        if isinstance(entry, str):
+            entry = {'query': entry}
+        if not isinstance(entry, dict):
+            entry = {}
+        items.append({
+            'query': str(entry.get('query', '')).strip(),
+            'type': _service_query_type(entry.get('type', 'recipe')),
+            'api_type': entry.get('type', 'recipe'),
+            'generate': str(entry.get('generate', False)).lower() in ('true', '1')
+        })
+    
+    try:
+        max_concurrency = max(1, int(data.get('max_concurrency', SEARCH_BATCH_CONCURRENCY)))
+    except (TypeError, ValueError):
+        return None, None, '"max_concurrency" must be an integer'
+    return items, max_concurrency, None
+
+
+def _batch_history(items, results):
+    """SearchHistory rows for the successful items of a batch"""
+    return [
+        SearchHistory(query_type=item['api_type'], query_text=item['query'], result=result.get('result', ''))
+        for item, result in zip(items, results)
+        if result.get('success')
+    ]
+
+
+@api_view(['POST'])
+def search_recipe_batch(request):
+    """
+    API endpoint to run many searches in one request
+    Accepts: { "queries": [{ "query": "...", "type": "recipe" or "ingredients" }, ...],
+               "max_concurrency": 8 }
+    Returns results in the same order, each with its own success/error
+    """
+    items, max_concurrency, error = _parse_batch(request.data)
+    if error:
+        return Response({'error': error, 'success': False}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        ai_service = get_recipe_ai_service()
+        results = ai_service.search_many(items, max_concurrency=max_concurrency)
+    except Exception as e:
+        print(f"Unexpected error in search_recipe_batch: {e}")
+        import traceback
+        traceback.print_exc()
+        return Response(
+            {'error': str(e), 'success': False},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    try:
+        SearchHistory.objects.bulk_create(_batch_history(items, results))
+    except Exception as db_error:
+        print(f"Database error (non-critical): {db_error}")
+    
+    return Response({'success': True, 'count': len(results), 'results': results}, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 def search_history(request):
     """
@@ -103,19 +273,264 @@ def search_history(request):
         )
 
 
+def _readiness():
+    """
+    Readiness payload and HTTP status; never waits for the AI service to load
+    """
+    # Start loading if nothing has yet (e.g. warm-up disabled at startup)
+    if service_status.state == 'idle':
+        start_background_warmup()
+    snapshot = service_status.snapshot()
+    if service_status.ready:
+        # Per-model latencies, routing decisions, retries and hedges
+        snapshot['llm'] = get_recipe_ai_service().llm_stats()
+        return {'status': 'ready', **snapshot}, 200
+    return {'status': 'not ready', **snapshot}, 503
+
+
 @api_view(['GET'])
 def health_check(request):
     """
     Health check endpoint
+    Reports whether the AI service is loaded, without blocking on the load
     """
-    try:
-        ai_service = get_recipe_ai_service()
+    payload, code = _readiness()
+    if code == 200:
         return Response({
             'status': 'healthy',
             'ai_service': 'initialized'
         }, status=status.HTTP_200_OK)
+    return Response({
+        'status': 'unhealthy',
+        'ai_service': payload['state'],
+        'error': payload['error']
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@api_view(['GET'])
+def health_live(request):
+    """
+    Liveness probe: the process is up and serving requests
+    """
+    return Response({
+        'status': 'alive',
+        'uptime_seconds': service_status.snapshot()['uptime_seconds']
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def health_ready(request):
+    """
+    Readiness probe: 200 once the AI service is loaded and warmed up,
+    503 with load progress and step timings until then
+    """
+    payload, code = _readiness()
+    return Response(payload, status=code)
+
+
+# ==================== Async views (ASGI) ====================
+# Same API as the views above, under /api/async/. Served by an ASGI server
+# (e.g. uvicorn recipe_project.asgi:application) a request waiting on Groq
+# holds no thread, so one process can keep hundreds of LLM calls in flight.
+
+def _parse_search(data):
+    """
+    Validate a search body
+    Returns (query, query_type, generate, error message)
+    """
+    if not isinstance(data, dict):
+        return None, None, None, 'Request body must be a JSON object'
+    query = str(data.get('query', '')).strip()
+    query_type = data.get('type', 'recipe')  # 'recipe' or 'ingredients'
+    generate = str(data.get('generate', False)).lower() in ('true', '1')
+    if not query:
+        return None, None, None, 'Query is required'
+    return query, query_type, generate, None
+
+
+def _parse_search_body(request):
+    """Return (query, query_type, generate, error message) from a JSON search request"""
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        data = {}
+    return _parse_search(data)
+
+
+async def _aget_ai_service():
+    """Get the AI service, initializing it off the event loop on first use"""
+    return await sync_to_async(get_recipe_ai_service)()
+
+
+async def _asave_history(query_type, query, result):
+    try:
+        await SearchHistory.objects.acreate(
+            query_type=query_type,
+            query_text=query,
+            result=result
+        )
+    except Exception as db_error:
+        print(f"Database error (non-critical): {db_error}")
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def async_search_recipe(request):
+    """
+    Async version of search_recipe
+    """
+    query, query_type, generate, error = _parse_search_body(request)
+    if error:
+        return JsonResponse({'error': error, 'success': False}, status=400)
+    
+    try:
+        ai_service = await _aget_ai_service()
+    except Exception as init_error:
+        print(f"AI Service initialization error: {init_error}")
+        return JsonResponse(
+            {
+                'error': f'Failed to initialize AI service: {str(init_error)}',
+                'success': False
+            },
+            status=500
+        )
+    
+    result = await ai_service.asearch(query, _service_query_type(query_type), generate=generate)
+    
+    if result.get('success'):
+        await _asave_history(query_type, query, result.get('result', ''))
+    
+    if 'retry_after' in result:
+        response = JsonResponse(result, status=503)
+        response['Retry-After'] = str(result['retry_after'])
+        return response
+    return JsonResponse(result)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def async_search_recipe_stream(request):
+    """
+    Async version of search_recipe_stream (Server-Sent Events)
+    """
+    query, query_type, generate, error = _parse_search_body(request)
+    if error:
+        return JsonResponse({'error': error, 'success': False}, status=400)
+    
+    try:
+        ai_service = await _aget_ai_service()
+    except Exception as init_error:
+        print(f"AI Service initialization error: {init_error}")
+        return JsonResponse(
+            {
+                'error': f'Failed to initialize AI service: {str(init_error)}',
+                'success': False
+            },
+            status=500
+        )
+    
+    retry_after = ai_service.overloaded()
+    if retry_after is not None:
+        return _overloaded_response(query, _service_query_type(query_type), retry_after)
+    
+    async def events():
+        stream = ai_service.astream_search(query, _service_query_type(query_type), generate=generate)
+        async for event, payload in stream:
+            if event == 'token':
+                yield _sse('token', {'text': payload})
+                continue
+            if event == 'done':
+                await _asave_history(query_type, query, payload.get('result', ''))
+            yield _sse(event, payload)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def async_search_recipe_batch(request):
+    """
+    Async version of search_recipe_batch
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        data = {}
+    items, max_concurrency, error = _parse_batch(data)
+    if error:
+        return JsonResponse({'error': error, 'success': False}, status=400)
+    
+    try:
+        ai_service = await _aget_ai_service()
+        results = await ai_service.asearch_many(items, max_concurrency=max_concurrency)
     except Exception as e:
-        return Response({
-            'status': 'unhealthy',
-            'error': str(e)
-        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        print(f"Unexpected error in async_search_recipe_batch: {e}")
+        return JsonResponse({'error': str(e), 'success': False}, status=500)
+    
+    try:
+        await SearchHistory.objects.abulk_create(_batch_history(items, results))
+    except Exception as db_error:
+        print(f"Database error (non-critical): {db_error}")
+    
+    return JsonResponse({'success': True, 'count': len(results), 'results': results})
+
+
+@require_http_methods(['GET'])
+async def async_search_history(request):
+    """
+    Async version of search_history
+    """
+    try:
+        data = [
+            {
+                'id': item.id,
+                'query_type': item.query_type,
+                'query_text': item.query_text,
+                'created_at': item.created_at.isoformat()
+            }
+            async for item in SearchHistory.objects.all()[:20]  # Last 20 searches
+        ]
+        return JsonResponse({'history': data})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(['GET'])
+async def async_health_check(request):
+    """
+    Async version of health_check
+    """
+    payload, code = _readiness()
+    if code == 200:
+        return JsonResponse({
+            'status': 'healthy',
+            'ai_service': 'initialized'
+        })
+    return JsonResponse({
+        'status': 'unhealthy',
+        'ai_service': payload['state'],
+        'error': payload['error']
+    }, status=503)
+
+
+@require_http_methods(['GET'])
+async def async_health_live(request):
+    """
+    Async version of health_live
+    """
+    return JsonResponse({
+        'status': 'alive',
+        'uptime_seconds': service_status.snapshot()['uptime_seconds']
+    })
+
+
+@require_http_methods(['GET'])
+async def async_health_ready(request):
+    """
+    Async version of health_ready
+    """
+    payload, code = _readiness()
+    return JsonResponse(payload, status=code)
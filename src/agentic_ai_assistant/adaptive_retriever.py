@@ -0,0 +1,90 @@
+import os
+import asyncio
+from langchain_core.retrievers import BaseRetriever
+
+# Configuration
+# Pick how many chunks to retrieve per query from the similarity scores
+ADAPTIVE_RETRIEVAL = os.getenv("ADAPTIVE_RETRIEVAL", "true").lower() == "true"
+RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "1"))
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "8"))
+# Candidates with a lower cosine similarity to the query are never kept
+RETRIEVAL_MIN_SIMILARITY = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.25"))
+# A drop in similarity between neighbours at least this large is an elbow
+RETRIEVAL_ELBOW_GAP = float(os.getenv("RETRIEVAL_ELBOW_GAP", "0.08"))
+
+
+def cosine_search(vectorstore, query, k, filter=None):
+    """
+    [(document, cosine similarity)] for the top k, whatever the store's own
+    score is (embeddings are normalized, see vector_store.NORMALIZE_EMBEDDINGS)
+    """
+    search = getattr(vectorstore, "similarity_search_with_cosine", None)
+    if search is not None:
+        # Embedding server: converted on its side
+        return search(query, k=k, filter=filter)
+    results = vectorstore.similarity_search_with_score(query, k=k, filter=filter)
+    collection = getattr(vectorstore, "_collection", None)
+    if collection is None:
+        # NumpyVectorIndex / QuantizedVectorIndex score by cosine already
+        return results
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    if space == "l2":
+        # Chroma's squared L2 distance between unit vectors is 2 - 2 cos
+        return [(doc, 1.0 - distance / 2.0) for doc, distance in results]
+    # "cosine" and "ip" distances are 1 - cos
+    return [(doc, 1.0 - distance) for doc, distance in results]
+
+
+def scored_search(vectorstore, query, k):
+    """
+    Top k documents with their cosine similarity in metadata["similarity"]
+    """
+    docs = []
+    for doc, similarity in cosine_search(vectorstore, query, k):
+        doc.metadata = {**doc.metadata, "similarity": round(float(similarity), 4)}
+        docs.append(doc)
+    return docs
+
+
+def choose_k(scores, min_k=RETRIEVAL_MIN_K, max_k=RETRIEVAL_MAX_K,
+             min_similarity=RETRIEVAL_MIN_SIMILARITY, elbow_gap=RETRIEVAL_ELBOW_GAP):
+    """
+    How many of the candidates (similarity scores, best first) to keep.
+
+    Candidates are cut at the first score below min_similarity, then at the
+    largest drop between neighbours if it is at least elbow_gap: a precise
+    query has one or two clear hits, a vague one a flat run of scores.
+    """
+    scores = list(scores)[:max_k]
+    k = len(scores)
+    for i, score in enumerate(scores):
+        if score < min_similarity:
+            k = i
+            break
+    if k > 1:
+        gaps = [scores[i] - scores[i + 1] for i in range(k - 1)]
+        elbow = max(range(len(gaps)), key=gaps.__getitem__)
+        if gaps[elbow] >= elbow_gap:
+            k = elbow + 1
+    return max(k, min(min_k, len(scores)))
+
+
+class AdaptiveRetriever(BaseRetriever):
+    """
+    Vector retriever returning between min_k and max_k chunks, as many as
+    choose_k() finds worth keeping for the query
+    """
+
+    vectorstore: object
+    min_k: int = RETRIEVAL_MIN_K
+    max_k: int = RETRIEVAL_MAX_K
+
+    def _select(self, docs):
+        k = choose_k([doc.metadata["similarity"] for doc in docs], self.min_k, self.max_k)
+        return docs[:k]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self._select(scored_search(self.vectorstore, query, self.max_k))
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        return self._select(await asyncio.to_thread(scored_search, self.vectorstore, query, self.max_k))
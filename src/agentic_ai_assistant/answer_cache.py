@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+
+# Configuration
+ANSWER_CACHE_PATH = "vectorstore/answer_cache.sqlite3"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+# Seconds an answer stays valid (0 = until evicted or the store is rebuilt)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+# Minimum cosine similarity for reusing the answer of a different wording
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+
+def normalize_query(text):
+    """
+    "  Chicken   Biryani? " -> "chicken biryani"
+    """
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def query_key(query_type, text):
+    return hashlib.sha256(f"{query_type}|{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Two-tier cache of RAG answers in SQLite.
+
+    Tier one is an exact lookup on (query type, normalized query). Tier two
+    compares the query embedding against every cached query of the same type
+    and reuses the closest answer above a cosine threshold; those embeddings
+    are mirrored in memory as one matrix. Entries expire after a TTL and the
+    least recently used are evicted beyond max_entries.
+
+    The cache is tied to a vector store version: opening it with a different
+    version, or calling clear() (done whenever the search indexes are
+    rebuilt), drops every entry, including in other processes using the file.
+    """
+
+    def __init__(self, path=ANSWER_CACHE_PATH, version="", max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 ttl=ANSWER_CACHE_TTL, threshold=SEMANTIC_CACHE_THRESHOLD):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, query_type TEXT NOT NULL, query TEXT NOT NULL, "
+            "response TEXT NOT NULL, embedding BLOB, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+
+        if self._meta("version") != str(version):
+            self.clear()
+            self._set_meta("version", str(version))
+        self.generation = None
+        self._sync()
+
+    def _meta(self, name):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+        self.db.commit()
+
+    def _sync(self):
+        """
+        Reload the in-memory embedding matrix if the table changed
+        """
+        generation = self._meta("generation")
+        if generation == self.generation:
+            return
+        rows = self.db.execute(
+            "SELECT key, query_type, embedding FROM answers WHERE embedding IS NOT NULL"
+        ).fetchall()
+        self.keys = [key for key, _, _ in rows]
+        self.types = np.array([query_type for _, query_type, _ in rows], dtype=object)
+        self.matrix = (
+            np.stack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows])
+            if rows else None
+        )
+        self.generation = generation
+
+    def _bump_generation(self):
+        self._set_meta("generation", str(time.time_ns()))
+
+    def _fetch(self, key, now):
+        row = self.db.execute("SELECT response, created FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            return None
+        self.db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+        self.db.commit()
+        return json.loads(row[0])
+
+    def get(self, query_type, query, embedding=None):
+        """
+        Return (response, "exact" | "semantic") or (None, None) on a miss
+        """
+        now = time.time()
+        with self.lock:
+            self._sync()
+            response = self._fetch(query_key(query_type, query), now)
+            if response is not None:
+                return response, "exact"
+
+            if embedding is None or self.matrix is None:
+                return None, None
+            query_vector = np.asarray(embedding, dtype=np.float32)
+            query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+            scores = np.where(self.types == query_type, self.matrix @ query_vector, -np.inf)
+            # Best first, skipping expired entries
+            for row in np.argsort(-scores):
+                if scores[row] < self.threshold:
+                    break
+                response = self._fetch(self.keys[row], now)
+                if response is not None:
+                    return response, "semantic"
+            return None, None
+
+    def put(self, query_type, query, response, embedding=None):
+        """
+        Store a JSON-serializable response, evicting expired and least recently used entries
+        """
+        now = time.time()
+        blob = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            blob = (vector / max(np.linalg.norm(vector), 1e-12)).tobytes()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO answers (key, query_type, query, response, embedding, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (query_key(query_type, query), query_type, query, json.dumps(response), blob, now, now)
+            )
+            if self.ttl:
+                self.db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            self.db.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.db.commit()
+            self._bump_generation()
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM answers")
+            self.db.commit()
+            self._bump_generation()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+def clear_answer_cache(path=ANSWER_CACHE_PATH):
+    """
+    Drop all cached answers (after the vector store is rebuilt)
+    """
+    if not os.path.exists(path):
+        return
+    db = sqlite3.connect(path)
+    try:
+        db.execute("DELETE FROM answers")
+        db.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('generation', ?)", (str(time.time_ns()),)
+        )
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import math
+import numpy as np
+from langchain_core.documents import Document
+
+# Configuration
+BM25_INDEX_PATH = "vectorstore/recipe_bm25.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it of on or the to with "
+    "me my give what can make recipe recipes".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercase word tokens without stopwords
+    """
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Builder:
+    """
+    Accumulates chunks one at a time into BM25 postings, so an index can
+    be built while paging through a store
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.metadatas = []
+        self.postings = {}
+        self.doc_lengths = []
+
+    def add(self, text, metadata=None):
+        row = len(self.texts)
+        self.texts.append(text)
+        self.metadatas.append(metadata or {})
+        tokens = tokenize(text)
+        self.doc_lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            rows, tfs = self.postings.setdefault(token, ([], []))
+            rows.append(row)
+            tfs.append(count)
+
+    def build(self):
+        return BM25Index(self.texts, self.metadatas, self.postings, self.doc_lengths)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk text, with an inverted index of
+    term -> (document rows, term frequencies) held as NumPy arrays
+    """
+
+    def __init__(self, texts, metadatas, postings, doc_lengths):
+        self.texts = texts
+        self.metadatas = metadatas
+        self.postings = {
+            term: (np.asarray(rows, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (rows, tfs) in postings.items()
+        }
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    def __len__(self):
+        return len(self.texts)
+
+    @classmethod
+    def from_texts(cls, texts, metadatas=None):
+        texts = list(texts)
+        builder = BM25Builder()
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        for text, metadata in zip(texts, metadatas):
+            builder.add(text, metadata)
+        return builder.build()
+
+    def save(self, path=BM25_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "texts": self.texts,
+                "metadatas": self.metadatas,
+                "doc_lengths": self.doc_lengths.astype(int).tolist(),
+                "postings": {
+                    term: [rows.tolist(), tfs.astype(int).tolist()]
+                    for term, (rows, tfs) in self.postings.items()
+                },
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=BM25_INDEX_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["texts"], data["metadatas"], data["postings"], data["doc_lengths"])
+
+    def search_with_score(self, query, k=4):
+        """
+        Top-k (Document, BM25 score) for a query
+        """
+        if not self.texts:
+            return []
+        n = len(self.texts)
+        scores = np.zeros(n, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / max(self.avg_length, 1e-9))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, tfs = self.postings[term]
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm[rows])
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        best = matched[np.argsort(-scores[matched])[:k]]
+        return [
+            (Document(page_content=self.texts[i], metadata=self.metadatas[i]), float(scores[i]))
+            for i in best
+        ]
+
+    def search(self, query, k=4):
+        return [doc for doc, _ in self.search_with_score(query, k=k)]
@@ -0,0 +1,169 @@
+import os
+import re
+from recipe_chunker import get_token_counter
+
+# Configuration
+# Most prompt tokens spent on retrieved context per LLM call
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Word-trigram Jaccard similarity above which a passage counts as a repeat
+DUPLICATE_SIMILARITY = float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", "0.8"))
+# Shortest shared prefix/suffix treated as chunk overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+# A passage is cut to fit the remaining budget only if this much room is left
+MIN_PASSAGE_TOKENS = 32
+
+CONTINUED_HEADER = re.compile(r"^.*\(continued\)\s*\n")
+
+
+class _Passage:
+    """
+    One or more merged chunks from the same page or recipe
+    """
+
+    def __init__(self, doc, rank):
+        metadata = doc.metadata or {}
+        self.text = doc.page_content.strip()
+        self.rank = rank
+        self.source = metadata.get("source")
+        self.page = metadata.get("page", 0)
+        self.title = metadata.get("recipe_title")
+        # Parts of a recipe are only known to be consecutive under one title
+        self.part = metadata.get("recipe_part") if self.title else None
+        self.last_part = self.part
+
+    @property
+    def group(self):
+        # Recipe chunks can span pages; plain chunks are merged within a page
+        return (self.source, self.title) if self.part is not None else (self.source, self.page)
+
+    def absorb(self, other):
+        """
+        Merge other into this passage if they overlap or continue each other
+        """
+        if other.group != self.group:
+            return False
+        merged = _merge_text(self.text, other.text)
+        if merged is None:
+            merged = _merge_text(other.text, self.text)
+        if merged is None and self.part is not None and other.part is not None:
+            if other.part == self.last_part + 1:
+                merged = self.text + "\n" + CONTINUED_HEADER.sub("", other.text, count=1)
+            elif self.part == other.last_part + 1:
+                merged = other.text + "\n" + CONTINUED_HEADER.sub("", self.text, count=1)
+        if merged is None:
+            return False
+
+        self.text = merged
+        self.rank = min(self.rank, other.rank)
+        self.page = min(self.page, other.page)
+        if self.part is not None:
+            self.part = min(self.part, other.part)
+            self.last_part = max(self.last_part, other.last_part)
+        return True
+
+
+def _merge_text(first, second):
+    """
+    first + second without the text they share, or None if they do not overlap
+    """
+    if second in first:
+        return first
+    longest = min(len(first), len(second))
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+
+def _shingles(text, size=3):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def _similarity(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _truncate(text, budget, count_tokens):
+    """
+    Longest run of whole lines (then whole words) from the start of text
+    within budget tokens
+    """
+    kept = []
+    for line in text.split("\n"):
+        if count_tokens("\n".join(kept + [line])) <= budget:
+            kept.append(line)
+            continue
+        words = []
+        for word in line.split(" "):
+            if count_tokens("\n".join(kept + [" ".join(words + [word])])) > budget:
+                break
+            words.append(word)
+        kept.append(" ".join(words))
+        break
+    return "\n".join(kept).strip()
+
+
+def pack_documents(docs, budget=CONTEXT_TOKEN_BUDGET, count_tokens=None):
+    """
+    Build the prompt context from retrieved chunks (best first).
+
+    Overlapping or consecutive chunks of the same page/recipe are merged,
+    near-duplicate passages dropped, and passages taken best first until
+    budget tokens are used; the result is ordered by page.
+    Returns (context, report) where report counts the tokens saved compared
+    with joining the chunks verbatim.
+    """
+    count_tokens = count_tokens or get_token_counter()
+
+    passages = []
+    for rank, doc in enumerate(docs):
+        passage = _Passage(doc, rank)
+        # Merging can chain (A+C, then B joins both), so retry until stable
+        while True:
+            for existing in passages:
+                if existing.absorb(passage):
+                    passages.remove(existing)
+                    passage = existing
+                    break
+            else:
+                break
+        passages.append(passage)
+    passages.sort(key=lambda p: p.rank)
+
+    unique = []
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        if all(_similarity(shingles, kept_shingles) < DUPLICATE_SIMILARITY for _, kept_shingles in unique):
+            unique.append((passage, shingles))
+
+    selected = []
+    used = 0
+    for passage, _ in unique:
+        tokens = count_tokens(passage.text)
+        remaining = budget - used
+        if tokens > remaining:
+            if remaining < MIN_PASSAGE_TOKENS:
+                continue
+            passage.text = _truncate(passage.text, remaining, count_tokens)
+            if not passage.text:
+                continue
+            tokens = count_tokens(passage.text)
+        selected.append(passage)
+        used += tokens
+    selected.sort(key=lambda p: (str(p.source), p.page, p.part or 0))
+
+    context = "\n\n".join(passage.text for passage in selected)
+    raw_tokens = count_tokens("\n\n".join(doc.page_content for doc in docs)) if docs else 0
+    packed_tokens = count_tokens(context) if context else 0
+    similarity = [doc.metadata["similarity"] for doc in docs if "similarity" in (doc.metadata or {})]
+    report = {
+        "retrieved": len(docs),
+        "passages": len(selected),
+        "tokens": packed_tokens,
+        "saved_tokens": max(0, raw_tokens - packed_tokens),
+    }
+    if similarity:
+        # Set by adaptive retrieval, which chose how many chunks to retrieve
+        report["top_similarity"] = max(similarity)
+    return context, report
@@ -0,0 +1,241 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+EMBEDDING_CACHE_PATH = "vectorstore/embedding_cache"
+# 50k x 384-dim float32 vectors is ~77 MB on disk
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+
+
+@contextmanager
+def _file_lock(path, shared=False):
+    """
+    Hold an advisory lock on path across processes (shared for readers)
+    """
+    with open(path, "a+b") as handle:
+        try:
+            import fcntl
+        except ImportError:
+            # Windows has no shared locks: readers take the lock exclusively
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            return
+        fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def text_key(text):
+    """
+    Content address of a text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache for one (model name, normalize flag) pair.
+
+    Vectors live in a memory-mapped float32 matrix with a fixed number of
+    slots; a SQLite index maps text hash -> slot and tracks last use so the
+    least recently used entries are evicted once every slot is taken.
+
+    Several processes (web workers, the CLI, ingestion) may share one cache:
+    the matrix is created and written under an exclusive file lock and read
+    under a shared one, and slots are allocated in a write transaction. Each
+    capacity gets its own files, so a process started with a different
+    EMBEDDING_CACHE_MAX_ENTRIES never truncates a matrix another one maps.
+    """
+
+    def __init__(self, model_name, normalize, path=EMBEDDING_CACHE_PATH,
+                 max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        namespace = hashlib.sha256(f"{model_name}|normalize={normalize}".encode("utf-8")).hexdigest()[:12]
+        readable = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name)
+        self.dir = os.path.join(path, f"{readable}-{namespace}")
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.max_entries = max_entries
+        self.vectors_path = os.path.join(self.dir, f"vectors-{max_entries}.npy")
+        self.lock_path = os.path.join(self.dir, f"vectors-{max_entries}.lock")
+        self.vectors = None
+        self.lock = threading.Lock()
+
+        # Autocommit: transactions are opened explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(
+            os.path.join(self.dir, f"index-{max_entries}.sqlite3"),
+            check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+    def _open_vectors(self, dim=None):
+        """
+        Map the matrix if it exists, or create it when dim is given (under
+        the file lock, so a half-written matrix is never mapped)
+        """
+        if self.vectors is not None:
+            return
+        if os.path.exists(self.vectors_path):
+            self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+        elif dim is not None:
+            self.vectors = np.lib.format.open_memmap(
+                self.vectors_path, mode="w+", dtype=np.float32, shape=(self.max_entries, dim)
+            )
+
+    def get_many(self, keys):
+        """
+        Return {key: vector} for the keys that are cached
+        """
+        if not keys:
+            return {}
+        found = {}
+        with self.lock, _file_lock(self.lock_path, shared=True):
+            self._open_vectors()
+            if self.vectors is None:
+                return {}
+            unique = list(set(keys))
+            # SQLite limits the number of bound parameters per statement
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                rows = self.db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, slot in rows:
+                    found[key] = np.array(self.vectors[slot])
+            if found:
+                now = time.time()
+                self.db.execute("BEGIN IMMEDIATE")
+                self.db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self.db.execute("COMMIT")
+        return found
+
+    def put_many(self, items):
+        """
+        Store {key: vector}, evicting least recently used entries when full
+        """
+        if not items:
+            return
+        with self.lock, _file_lock(self.lock_path):
+            items = list(items.items())[-self.max_entries:]
+            self._open_vectors(len(items[0][1]))
+
+            # Three steps, so a failure part-way never leaves a row pointing
+            # at a slot whose vector was overwritten: commit the evictions
+            # that free the slots, write the vectors, then commit the rows
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                slots = self._free_slots(len(items))
+                evict = len(items) - len(slots)
+                if evict > 0:
+                    rows = self.db.execute(
+                        "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (evict,)
+                    ).fetchall()
+                    self.db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows])
+                    slots.extend(slot for _, slot in rows)
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+            for (key, vector), slot in zip(items, slots):
+                self.vectors[slot] = vector
+            self.vectors.flush()
+
+            now = time.time()
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, slot, now) for (key, _), slot in zip(items, slots)]
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def _free_slots(self, wanted):
+        """
+        Up to `wanted` slots no row points at: slots left behind by an
+        interrupted put_many or a replaced key first, then never-used ones
+        """
+        count, last = self.db.execute("SELECT COUNT(*), MAX(slot) FROM entries").fetchone()
+        next_slot = 0 if last is None else last + 1
+        slots = []
+        if count < next_slot:
+            used = {slot for slot, in self.db.execute("SELECT slot FROM entries")}
+            slots = [slot for slot in range(next_slot) if slot not in used][:wanted]
+        slots.extend(range(next_slot, min(self.max_entries, next_slot + wanted - len(slots))))
+        return slots
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that looks every text up in an EmbeddingCache first.
+    Document and query embeddings share the cache, so a query seen before,
+    or a chunk embedded in an earlier build, never hits the model again.
+    """
+
+    def __init__(self, embeddings, model_name, normalize, path=EMBEDDING_CACHE_PATH,
+                 max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.cache = EmbeddingCache(model_name, normalize, path=path, max_entries=max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, texts, embed_fn):
+        keys = [text_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+            self.cache.put_many(computed)
+            cached.update(computed)
+
+        return [cached[key].tolist() for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def close(self):
+        """
+        Release the wrapped model's resources (e.g. a worker pool)
+        """
+        close = getattr(self.embeddings, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,382 @@
+import os
+import sys
+import json
+import stat
+import time
+import signal
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Configuration
+DEFAULT_SOCKET_PATH = "vectorstore/embedding_server.sock"
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "30"))
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+# Wire format: every request and response is a 5-byte header (op or status,
+# payload length) followed by the payload. Texts are length-prefixed UTF-8,
+# vectors raw little-endian float32, search results JSON.
+HEADER = struct.Struct(">BI")
+COUNT = struct.Struct(">I")
+SHAPE = struct.Struct(">II")
+SEARCH = struct.Struct(">IBI")  # k, score mode, filter JSON length
+
+OP_INFO = 0
+OP_EMBED_DOCUMENTS = 1
+OP_EMBED_QUERY = 2
+OP_SEARCH = 3
+OP_SEARCH_BY_VECTOR = 4
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# Score returned with each search result
+SCORE_RAW = 0        # the store's own score (e.g. Chroma distance)
+SCORE_RELEVANCE = 1  # normalized to [0, 1], higher is better
+SCORE_COSINE = 2     # cosine similarity (see adaptive_retriever.cosine_search)
+
+
+class EmbeddingServerError(RuntimeError):
+    pass
+
+
+def pack_texts(texts):
+    parts = [COUNT.pack(len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(COUNT.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def unpack_texts(payload):
+    (count,), offset = COUNT.unpack_from(payload), COUNT.size
+    texts = []
+    for _ in range(count):
+        (length,) = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        texts.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+    return texts
+
+
+def pack_matrix(vectors):
+    matrix = np.asarray(vectors, dtype="<f4")
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return SHAPE.pack(*matrix.shape) + matrix.tobytes()
+
+
+def unpack_matrix(payload):
+    rows, dim = SHAPE.unpack_from(payload)
+    return np.frombuffer(payload, dtype="<f4", count=rows * dim, offset=SHAPE.size).reshape(rows, dim)
+
+
+def pack_search(k, mode, filter, query=b""):
+    filter_data = json.dumps(filter).encode("utf-8") if filter else b""
+    return SEARCH.pack(k, mode, len(filter_data)) + filter_data + query
+
+
+def unpack_search(payload):
+    k, mode, filter_length = SEARCH.unpack_from(payload)
+    start = SEARCH.size
+    filter = json.loads(payload[start:start + filter_length]) if filter_length else None
+    return k, mode, filter, payload[start + filter_length:]
+
+
+def pack_results(results):
+    return json.dumps([
+        [doc.page_content, doc.metadata, score, doc.id] for doc, score in results
+    ]).encode("utf-8")
+
+
+def unpack_results(payload):
+    return [
+        (Document(page_content=text, metadata=metadata, id=doc_id), score)
+        for text, metadata, score, doc_id in json.loads(payload)
+    ]
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("Embedding server closed the connection")
+        received += count
+    return bytes(buffer)
+
+
+# --- Server -----------------------------------------------------------------
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Serves requests on one worker connection until the worker disconnects
+    """
+
+    def handle(self):
+        while True:
+            header = self.rfile.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            op, length = HEADER.unpack(header)
+            if length > MAX_FRAME_BYTES:
+                # Skip the payload, so the connection stays in step, and say why
+                if not self._discard(length):
+                    return
+                status, body = STATUS_ERROR, (
+                    f"Request of {length} bytes exceeds the {MAX_FRAME_BYTES}-byte limit"
+                ).encode("utf-8")
+                self.wfile.write(HEADER.pack(status, len(body)) + body)
+                continue
+            payload = self.rfile.read(length)
+            try:
+                status, body = STATUS_OK, self.server.dispatch(op, payload)
+            except Exception as e:
+                status, body = STATUS_ERROR, f"{type(e).__name__}: {e}".encode("utf-8")
+            self.wfile.write(HEADER.pack(status, len(body)) + body)
+
+    def _discard(self, length):
+        """
+        Read and drop length bytes; False if the worker disconnected first
+        """
+        while length:
+            chunk = self.rfile.read(min(length, 1024 * 1024))
+            if not chunk:
+                return False
+            length -= len(chunk)
+        return True
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Holds the one copy of the embedding model and vector store that every
+    web worker on the host queries over a Unix domain socket
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, embeddings, vectorstore):
+        self.embeddings = embeddings
+        self.vectorstore = vectorstore
+        self.started = time.time()
+        super().__init__(path, _RequestHandler)
+
+    def server_bind(self):
+        # Only the owner and its group may query the index. The umask applies
+        # at bind, so the socket never exists with wider permissions
+        old_umask = os.umask(0o117)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+
+    def dispatch(self, op, payload):
+        if op == OP_EMBED_DOCUMENTS:
+            texts = unpack_texts(payload)
+            return pack_matrix(self.embeddings.embed_documents(texts) if texts else np.zeros((0, 0)))
+        if op == OP_EMBED_QUERY:
+            return pack_matrix(self.embeddings.embed_query(payload.decode("utf-8")))
+        if op == OP_SEARCH:
+            k, mode, filter, query = unpack_search(payload)
+            query = query.decode("utf-8")
+            if mode == SCORE_COSINE:
+                from adaptive_retriever import cosine_search
+                results = cosine_search(self.vectorstore, query, k, filter)
+            elif mode == SCORE_RELEVANCE:
+                # Thresholds and range warnings are applied by the client
+                results = self.vectorstore._similarity_search_with_relevance_scores(query, k=k, filter=filter)
+            else:
+                results = self.vectorstore.similarity_search_with_score(query, k=k, filter=filter)
+            return pack_results(results)
+        if op == OP_SEARCH_BY_VECTOR:
+            k, _, filter, vector = unpack_search(payload)
+            docs = self.vectorstore.similarity_search_by_vector(unpack_matrix(vector)[0].tolist(), k=k, filter=filter)
+            return pack_results([(doc, None) for doc in docs])
+        if op == OP_INFO:
+            return json.dumps({
+                "pid": os.getpid(),
+                "vector_store": type(self.vectorstore).__name__,
+                "uptime": round(time.time() - self.started, 1),
+            }).encode("utf-8")
+        raise ValueError(f"Unknown op {op}")
+
+
+def serve(path=DEFAULT_SOCKET_PATH):
+    """
+    Load the embedding model and vector store once and serve them on path
+    """
+    from vector_store import (
+        create_embeddings,
+        load_existing_vector_store,
+        load_bm25_index,
+        load_recipe_catalog,
+    )
+
+    embeddings = create_embeddings(server="")
+    vectorstore = load_existing_vector_store(embeddings, server="")
+    # Rebuild stale derived indexes here once, rather than in every worker
+    load_bm25_index(embeddings)
+    load_recipe_catalog(embeddings)
+    vectorstore.similarity_search("chicken curry with rice", k=1)
+
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise FileExistsError(f"{path} exists and is not a socket")
+        os.unlink(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    server = EmbeddingServer(path, embeddings, vectorstore)
+    # Stop cleanly (removing the socket) under process managers too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"🛰️  Embedding server listening on {path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Embedding server stopped")
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+# --- Client -----------------------------------------------------------------
+
+class EmbeddingServerClient:
+    """
+    Request/response calls to an embedding server. Each thread keeps its own
+    connection, reopened after a fork or a server restart.
+    """
+
+    def __init__(self, path, timeout=EMBEDDING_SERVER_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise EmbeddingServerError(
+                f"Embedding server not reachable at {self.path} ({e}). "
+                "Start it with: python src/agentic_ai_assistant/embedding_server.py"
+            ) from e
+        self.local.sock, self.local.pid = sock, os.getpid()
+        return sock
+
+    def _socket(self):
+        sock = getattr(self.local, "sock", None)
+        if sock is None or self.local.pid != os.getpid():
+            return self._connect()
+        return sock
+
+    def close(self):
+        sock = getattr(self.local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self.local.sock = None
+
+    def call(self, op, payload=b""):
+        # A kept-alive connection may have been dropped by a server restart;
+        # every op is read-only, so it is safe to send once more
+        for attempt in (1, 2):
+            sock = self._socket()
+            try:
+                sock.sendall(HEADER.pack(op, len(payload)) + payload)
+                status, length = HEADER.unpack(_recv_exact(sock, HEADER.size))
+                body = _recv_exact(sock, length)
+                break
+            except (ConnectionError, BrokenPipeError) as e:
+                self.close()
+                if attempt == 2:
+                    raise EmbeddingServerError(f"Embedding server connection lost: {e}") from e
+            except OSError:
+                # e.g. a timeout part way through a response: the stream is out of sync
+                self.close()
+                raise
+        if status != STATUS_OK:
+            raise EmbeddingServerError(body.decode("utf-8"))
+        return body
+
+    def info(self):
+        return json.loads(self.call(OP_INFO))
+
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Embeddings computed by the embedding server (and cached there)
+    """
+
+    def __init__(self, path, timeout=EMBEDDING_SERVER_TIMEOUT):
+        self.client = EmbeddingServerClient(path, timeout)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return unpack_matrix(self.client.call(OP_EMBED_DOCUMENTS, pack_texts(list(texts)))).tolist()
+
+    def embed_query(self, text):
+        return unpack_matrix(self.client.call(OP_EMBED_QUERY, text.encode("utf-8")))[0].tolist()
+
+    def close(self):
+        self.client.close()
+
+
+class RemoteVectorStore(VectorStore):
+    """
+    Read-only view of the vector store loaded by the embedding server.
+    Queries are embedded and searched server-side in a single round trip.
+    """
+
+    def __init__(self, path, embedding_function=None, timeout=EMBEDDING_SERVER_TIMEOUT):
+        self.client = EmbeddingServerClient(path, timeout)
+        self.embedding_function = embedding_function
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def _search(self, query, k, mode, filter):
+        return unpack_results(self.client.call(OP_SEARCH, pack_search(k, mode, filter, query.encode("utf-8"))))
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self._search(query, k, SCORE_RAW, filter)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self._search(query, k, SCORE_RAW, filter)]
+
+    def similarity_search_with_cosine(self, query, k=4, filter=None):
+        return self._search(query, k, SCORE_COSINE, filter)
+
+    def _similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        return self._search(query, k, SCORE_RELEVANCE, kwargs.get("filter"))
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        payload = pack_search(k, SCORE_RAW, filter, pack_matrix(embedding))
+        return [doc for doc, _ in unpack_results(self.client.call(OP_SEARCH_BY_VECTOR, payload))]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("The embedding server is read-only; ingest PDFs with main.py")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared embedding and retrieval server")
+    parser.add_argument(
+        "--socket",
+        default=os.getenv("EMBEDDING_SERVER_SOCKET") or DEFAULT_SOCKET_PATH,
+        help=f"Unix socket path (default: $EMBEDDING_SERVER_SOCKET or {DEFAULT_SOCKET_PATH})"
+    )
+    args = parser.parse_args()
+    sys.exit(serve(args.socket))
@@ -0,0 +1,77 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from langchain_core.retrievers import BaseRetriever
+from adaptive_retriever import scored_search, choose_k, RETRIEVAL_MIN_K, RETRIEVAL_MAX_K
+
+# Configuration
+# Standard reciprocal-rank-fusion constant; damps the weight of top ranks
+RRF_K = 60
+
+# Shared by all retrievers; each query uses one thread per search
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-search")
+
+
+def _doc_key(doc):
+    """
+    Identity of a chunk across the vector and BM25 results
+    """
+    return (doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+
+
+def reciprocal_rank_fusion(result_lists, k, rrf_k=RRF_K):
+    """
+    Fuse ranked document lists: score(d) = sum over lists of 1 / (rrf_k + rank)
+    """
+    scores = {}
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, 1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Runs vector and BM25 search concurrently and fuses the rankings with
+    reciprocal-rank fusion, so exact recipe names and ingredient words are
+    found even when the embedding model ranks them low.
+    With adaptive=True the number of fused results is chosen per query from
+    the vector similarity scores (see adaptive_retriever.choose_k) instead of k.
+    """
+
+    vectorstore: Any
+    bm25_index: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = RRF_K
+    adaptive: bool = False
+    min_k: int = RETRIEVAL_MIN_K
+    max_k: int = RETRIEVAL_MAX_K
+
+    def _vector_search(self, query):
+        if self.adaptive:
+            return scored_search(self.vectorstore, query, max(self.fetch_k, self.max_k))
+        return self.vectorstore.similarity_search(query, k=self.fetch_k)
+
+    def _fuse(self, vector_results, lexical_results):
+        k = self.k
+        if self.adaptive:
+            scores = [doc.metadata["similarity"] for doc in vector_results]
+            k = choose_k(scores, self.min_k, self.max_k) or self.min_k
+        return reciprocal_rank_fusion([vector_results, lexical_results], k, self.rrf_k)
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        vector_future = _executor.submit(self._vector_search, query)
+        lexical_future = _executor.submit(self.bm25_index.search, query, k=self.fetch_k)
+        return self._fuse(vector_future.result(), lexical_future.result())
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        vector_results, lexical_results = await asyncio.gather(
+            asyncio.to_thread(self._vector_search, query),
+            asyncio.to_thread(self.bm25_index.search, query, self.fetch_k),
+        )
+        return self._fuse(vector_results, lexical_results)
@@ -0,0 +1,252 @@
+import os
+import time
+import queue
+import threading
+from dotenv import load_dotenv
+from pdf_processor import iter_pdf_pages, iter_chunks
+from vector_store import (
+    VECTOR_STORE_PATH,
+    add_page_hashes,
+    assign_chunk_ids,
+    build_search_indexes,
+    delete_stale_books,
+    list_pdfs,
+)
+
+load_dotenv()
+
+# Configuration
+# Chunks per batch; large enough to spread over every embedding worker
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "512"))
+MAX_PENDING_BATCHES = 4
+
+_DONE = object()
+
+
+class StageStats:
+    """
+    Item count and busy time for one pipeline stage
+    """
+
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.busy = 0.0
+
+    def report(self):
+        rate = self.items / self.busy if self.busy else 0.0
+        return f"   {self.name:<8} {self.items:>6} {self.unit:<7} {self.busy:7.2f}s busy  {rate:8.1f} {self.unit}/sec"
+
+
+def _put(q, item, stop):
+    """
+    Blocking put that gives up once another stage has failed
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    """
+    Blocking get that gives up once another stage has failed
+    """
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def _hashed_pages(pdf_path, parallel, stats):
+    """
+    Lazily yield hashed pages, counting them for the parse stage
+    """
+    for page in iter_pdf_pages(pdf_path, parallel=parallel):
+        stats["parse"].items += 1
+        yield add_page_hashes([page])[0]
+
+
+def _parse_stage(pdf_path, parallel, chunk_strategy, batch_size, out_q, stop, stats, produced):
+    """
+    Pages -> chunks -> fixed-size batches of (ids, chunks); every id is
+    also added to produced
+    """
+    seen = {}
+    batch = []
+    chunks = iter_chunks(_hashed_pages(pdf_path, parallel, stats), chunk_strategy)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        stats["parse"].busy += time.perf_counter() - start
+        if chunk is None:
+            break
+
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            ids = assign_chunk_ids(batch, seen)
+            produced.update(ids)
+            if not _put(out_q, (ids, batch), stop):
+                return
+            batch = []
+    if batch:
+        ids = assign_chunk_ids(batch, seen)
+        produced.update(ids)
+        _put(out_q, (ids, batch), stop)
+
+
+def _embed_stage(embeddings, collection, skip_existing, in_q, out_q, stop, stats):
+    """
+    Batches of chunks -> batches of (ids, chunks, vectors)
+    """
+    while True:
+        item = _get(in_q, stop)
+        if item is _DONE:
+            return
+        ids, chunks = item
+        start = time.perf_counter()
+        if skip_existing:
+            existing = set(collection.get(ids=ids, include=[])["ids"])
+            pending = [(i, c) for i, c in zip(ids, chunks) if i not in existing]
+            ids = [i for i, _ in pending]
+            chunks = [c for _, c in pending]
+        vectors = embeddings.embed_documents([c.page_content for c in chunks]) if chunks else []
+        stats["embed"].busy += time.perf_counter() - start
+        stats["embed"].items += len(chunks)
+        if not _put(out_q, (ids, chunks, vectors), stop):
+            return
+
+
+def _run_stage(target, args, out_q, stop, errors):
+    """
+    Run a stage in its thread, always signalling the next stage on exit
+    """
+    try:
+        target(*args)
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        if out_q is not None:
+            _put(out_q, _DONE, stop)
+
+
+def _stream_pdf(pdf_path, embeddings, collection, batch_size, max_pending_batches,
+                skip_existing, chunk_strategy, parallel, stats):
+    """
+    Run the pipeline for one PDF; returns the ids of all its chunks
+    """
+    chunk_q = queue.Queue(maxsize=max_pending_batches)
+    vector_q = queue.Queue(maxsize=max_pending_batches)
+    stop = threading.Event()
+    errors = []
+    produced = set()
+
+    threads = [
+        threading.Thread(
+            target=_run_stage,
+            args=(_parse_stage, (pdf_path, parallel, chunk_strategy, batch_size, chunk_q, stop, stats, produced),
+                  chunk_q, stop, errors),
+            name="ingest-parse", daemon=True
+        ),
+        threading.Thread(
+            target=_run_stage,
+            args=(_embed_stage, (embeddings, collection, skip_existing, chunk_q, vector_q, stop, stats), vector_q, stop, errors),
+            name="ingest-embed", daemon=True
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Upsert stage runs on the calling thread
+    try:
+        while True:
+            item = _get(vector_q, stop)
+            if item is _DONE:
+                break
+            ids, chunks, vectors = item
+            if not ids:
+                continue
+            start = time.perf_counter()
+            collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                metadatas=[c.metadata for c in chunks],
+                documents=[c.page_content for c in chunks],
+            )
+            stats["upsert"].busy += time.perf_counter() - start
+            stats["upsert"].items += len(ids)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return produced
+
+
+def stream_vector_store(path, embeddings, batch_size=INGEST_BATCH_SIZE,
+                        max_pending_batches=MAX_PENDING_BATCHES, skip_existing=True,
+                        chunk_strategy=None, parallel=True):
+    """
+    Stream a PDF, or a folder of PDFs, into the vector store with bounded memory.
+
+    Pages are parsed, split, embedded and upserted in fixed-size batches.
+    Each stage runs in its own thread, connected by queues holding at most
+    `max_pending_batches` batches, so parsing overlaps with embedding and
+    memory stays flat regardless of book size. With `parallel`, large books
+    have their pages extracted ahead in a process pool. Chunks already stored are
+    not re-embedded; once a book is through, its chunks that no longer
+    exist (edited pages) are deleted, as are books removed from a folder.
+    """
+    from langchain_community.vectorstores import Chroma
+
+    print(f"\n🌊 Streaming PDFs into vector store: {path}")
+    print(f"   batch size {batch_size}, at most {max_pending_batches} batches in flight")
+
+    vectorstore = Chroma(
+        persist_directory=VECTOR_STORE_PATH,
+        embedding_function=embeddings
+    )
+    collection = vectorstore._collection
+
+    stats = {
+        "parse": StageStats("parse", "pages"),
+        "embed": StageStats("embed", "chunks"),
+        "upsert": StageStats("upsert", "chunks"),
+    }
+    pdf_paths = list_pdfs(path)
+    deleted = 0
+
+    start_time = time.perf_counter()
+    for pdf_path in pdf_paths:
+        # Chunks store the absolute path, however the book was named
+        source = os.path.abspath(pdf_path)
+        produced = _stream_pdf(source, embeddings, collection, batch_size, max_pending_batches,
+                               skip_existing, chunk_strategy, parallel, stats)
+        existing_ids = set(collection.get(where={"source": source}, include=[])["ids"])
+        stale_ids = list(existing_ids - produced)
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+        deleted += len(stale_ids)
+        print(f"   {os.path.basename(pdf_path)}: {len(produced)} chunks, -{len(stale_ids)} stale")
+    deleted += delete_stale_books(vectorstore, path, pdf_paths)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ Streamed {stats['parse'].items} pages in {elapsed:.2f}s "
+          f"({stats['upsert'].items} chunks embedded, {deleted} deleted)")
+    for stage in stats.values():
+        print(stage.report())
+
+    build_search_indexes(vectorstore)
+
+    return vectorstore
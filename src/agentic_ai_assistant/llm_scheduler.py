@@ -0,0 +1,382 @@
+import os
+import math
+import time
+import bisect
+import asyncio
+import itertools
+import threading
+from collections import deque
+
+# Configuration
+# Hold LLM calls in a queue so they stay within Groq's rate limits
+LLM_SCHEDULER = os.getenv("LLM_SCHEDULER", "true").lower() == "true"
+# Groq's limits per model (free tier: 30 requests and 6000 tokens a minute)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "6000"))
+# Calls waiting at once, and the longest a call may wait for its turn.
+# A large-model call costs ~2.7k tokens, so at 6000 tokens a minute batch
+# calls soon wait minutes: they get their own, much longer limit
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "64"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "20"))
+LLM_BATCH_QUEUE_TIMEOUT = float(os.getenv("LLM_BATCH_QUEUE_TIMEOUT", "600"))
+# Buckets live in each process, so server processes sharing one Groq key
+# each get this share of the limits (gunicorn's WEB_CONCURRENCY by default)
+LLM_WORKER_PROCESSES = max(1, int(os.getenv("LLM_WORKER_PROCESSES", os.getenv("WEB_CONCURRENCY", "1"))))
+# Queue waits kept per priority for the percentiles in snapshot()
+WAIT_WINDOW = 500
+
+# Lower runs first: web requests ahead of batch jobs
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+
+class LLMOverloaded(RuntimeError):
+    """
+    An LLM call was turned away; retry_after is a whole number of seconds
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """
+    Holds up to a minute's worth of capacity, refilled continuously
+    """
+
+    def __init__(self, per_minute, now):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until amount is available (a call larger than the bucket
+        waits for a full bucket)
+        """
+        self.refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount, now):
+        self.refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount, now):
+        """
+        Return capacity taken earlier (negative amount: take more)
+        """
+        self.refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    def __init__(self, seq, model, tokens, priority, enqueued, deadline, loop):
+        self.seq = seq
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.enqueued = enqueued
+        self.deadline = deadline
+        self.granted = False
+        self.error = None
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        except RuntimeError:
+            # The caller's event loop is gone
+            pass
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM calls.
+
+    Each model has a requests-per-minute and a tokens-per-minute token bucket
+    (a call costs its prompt tokens plus max_tokens). A call the buckets can
+    pay for runs at once; otherwise it waits in one bounded queue ordered
+    by priority, then arrival. A dispatcher thread starts waiting calls as
+    their model's buckets refill. Calls are turned away with LLMOverloaded
+    when the queue is full, when the expected wait is longer than their
+    priority's queue timeout (queue_timeout, or batch_queue_timeout for
+    BATCH), or when they have waited that long. Once a call finishes,
+    reconcile() swaps its max_tokens reservation for the tokens it used.
+
+    The buckets are per process: with `processes` server processes sharing
+    one API key, each enforces 1/processes of the limits. clock (seconds,
+    monotonic) can be replaced in tests.
+    """
+
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE, tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 queue_size=LLM_QUEUE_SIZE, queue_timeout=LLM_QUEUE_TIMEOUT,
+                 batch_queue_timeout=LLM_BATCH_QUEUE_TIMEOUT, processes=LLM_WORKER_PROCESSES,
+                 clock=time.monotonic):
+        self.processes = processes
+        self.requests_per_minute = requests_per_minute / processes
+        self.tokens_per_minute = tokens_per_minute / processes
+        self.clock = clock
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.batch_queue_timeout = batch_queue_timeout
+        self._cond = threading.Condition()
+        self._queue = []  # _Waiter, sorted by (priority, seq)
+        self._buckets = {}
+        self._seq = itertools.count()
+        self._dispatcher = None
+        self.admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.rejected = {"queue_full": 0, "over_deadline": 0, "queue_timeout": 0, "evicted": 0}
+        self.waits = {name: deque(maxlen=WAIT_WINDOW) for name in PRIORITY_NAMES.values()}
+        self.max_depth = 0
+
+    def _model_buckets(self, model):
+        if model not in self._buckets:
+            now = self.clock()
+            self._buckets[model] = (TokenBucket(self.requests_per_minute, now),
+                                    TokenBucket(self.tokens_per_minute, now))
+        return self._buckets[model]
+
+    def _wait_time(self, model, tokens, now):
+        requests, token_bucket = self._model_buckets(model)
+        return max(requests.wait_time(1, now), token_bucket.wait_time(tokens, now))
+
+    def _expected_wait(self, model, tokens, priority, now):
+        """
+        Seconds until a new call would start: the buckets must first pay for
+        every call of the same model queued ahead of it
+        """
+        requests, token_bucket = self._model_buckets(model)
+        ahead = [w for w in self._queue if w.model == model and w.priority <= priority]
+        need_requests = len(ahead) + 1
+        need_tokens = sum(min(w.tokens, token_bucket.capacity) for w in ahead) + min(tokens, token_bucket.capacity)
+        requests.refill(now)
+        token_bucket.refill(now)
+        return max(
+            (need_requests - requests.level) / requests.rate,
+            (need_tokens - token_bucket.level) / token_bucket.rate,
+            0.0,
+        )
+
+    def _timeout(self, priority):
+        return self.queue_timeout if priority == INTERACTIVE else self.batch_queue_timeout
+
+    def _admit(self, priority, wait):
+        name = PRIORITY_NAMES.get(priority, "batch")
+        self.admitted[name] += 1
+        self.waits[name].append(wait)
+
+    def _reject(self, reason, retry_after):
+        self.rejected[reason] += 1
+        return LLMOverloaded(f"LLM {reason.replace('_', ' ')}, retry in {math.ceil(retry_after)}s", retry_after)
+
+    def _enqueue(self, model, tokens, priority, loop):
+        """
+        Start the call now (returns None), queue it (returns its _Waiter),
+        or raise LLMOverloaded
+        """
+        with self._cond:
+            now = self.clock()
+            queued_ahead = any(w.model == model and w.priority <= priority for w in self._queue)
+            if not queued_ahead and self._wait_time(model, tokens, now) == 0:
+                requests, token_bucket = self._model_buckets(model)
+                requests.take(1, now)
+                token_bucket.take(tokens, now)
+                self._admit(priority, 0.0)
+                return None
+
+            expected = self._expected_wait(model, tokens, priority, now)
+            if expected > self._timeout(priority):
+                raise self._reject("over_deadline", expected)
+            if len(self._queue) >= self.queue_size:
+                # A full queue makes room for a call that outranks its last one
+                last = self._queue[-1]
+                if last.priority <= priority:
+                    raise self._reject("queue_full", expected)
+                self._queue.pop()
+                last.error = self._reject("evicted", self._expected_wait(last.model, last.tokens, last.priority, now))
+                last.wake()
+
+            waiter = _Waiter(next(self._seq), model, tokens, priority, now, now + self._timeout(priority), loop)
+            bisect.insort(self._queue, waiter)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._start_dispatcher()
+            self._cond.notify()
+            return waiter
+
+    def _settle(self, waiter):
+        """
+        After a wait: return the seconds waited, or raise if turned away
+        """
+        with self._cond:
+            if waiter.granted:
+                return self.clock() - waiter.enqueued
+            if waiter.error is None:
+                # Timed out before its turn
+                self._queue.remove(waiter)
+                now = self.clock()
+                waiter.error = self._reject(
+                    "queue_timeout", self._expected_wait(waiter.model, waiter.tokens, waiter.priority, now)
+                )
+            raise waiter.error
+
+    def acquire(self, model, tokens, priority=INTERACTIVE):
+        """
+        Block until a call of tokens to model may start; returns seconds queued
+        """
+        waiter = self._enqueue(model, tokens, priority, None)
+        if waiter is None:
+            return 0.0
+        waiter.event.wait(max(0.0, waiter.deadline - self.clock()))
+        return self._settle(waiter)
+
+    async def aacquire(self, model, tokens, priority=INTERACTIVE):
+        """
+        acquire() for the event loop: waiting holds no thread
+        """
+        waiter = self._enqueue(model, tokens, priority, asyncio.get_running_loop())
+        if waiter is None:
+            return 0.0
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), max(0.0, waiter.deadline - self.clock()))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            with self._cond:
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                elif waiter.granted:
+                    # Granted just before the cancel: the call never runs
+                    self._refund(waiter)
+            raise
+        return self._settle(waiter)
+
+    def _refund(self, waiter):
+        """
+        Give a granted call's cost back to its model's buckets
+        """
+        requests, token_bucket = self._model_buckets(waiter.model)
+        now = self.clock()
+        requests.give(1, now)
+        token_bucket.give(min(waiter.tokens, token_bucket.capacity), now)
+        self._cond.notify()
+
+    def reconcile(self, model, reserved, used):
+        """
+        After a call that reserved `reserved` tokens: credit back what it
+        did not use, or charge what it used beyond the estimate
+        """
+        with self._cond:
+            requests, token_bucket = self._model_buckets(model)
+            token_bucket.give(min(reserved, token_bucket.capacity) - used, self.clock())
+            self._cond.notify()
+
+    def overloaded(self, priority=INTERACTIVE):
+        """
+        Seconds to wait before retrying if a new call of this priority would
+        be turned away for a full queue, else None
+        """
+        with self._cond:
+            if len(self._queue) < self.queue_size or self._queue[-1].priority > priority:
+                return None
+            last = self._queue[-1]
+            return max(1, math.ceil(self._expected_wait(last.model, last.tokens, priority, self.clock())))
+
+    def _start_dispatcher(self):
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch, name="llm-scheduler", daemon=True)
+            self._dispatcher.start()
+
+    def _grant_ready(self):
+        """
+        Start every queued call whose model's buckets can pay for it, in
+        queue order; returns seconds until the next one can start, or None
+        """
+        now = self.clock()
+        blocked = set()
+        next_wake = None
+        for waiter in list(self._queue):
+            if waiter.model in blocked:
+                continue
+            wait = self._wait_time(waiter.model, waiter.tokens, now)
+            if wait > 0:
+                # Later calls for this model stay behind this one
+                blocked.add(waiter.model)
+                next_wake = wait if next_wake is None else min(next_wake, wait)
+                continue
+            requests, token_bucket = self._model_buckets(waiter.model)
+            requests.take(1, now)
+            token_bucket.take(waiter.tokens, now)
+            self._queue.remove(waiter)
+            waiter.granted = True
+            self._admit(waiter.priority, now - waiter.enqueued)
+            waiter.wake()
+        return next_wake
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                self._cond.wait(self._grant_ready())
+
+    def snapshot(self):
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for waiter in self._queue:
+                depth[PRIORITY_NAMES.get(waiter.priority, "batch")] += 1
+            now = self.clock()
+            buckets = {}
+            for model, (requests, token_bucket) in self._buckets.items():
+                requests.refill(now)
+                token_bucket.refill(now)
+                buckets[model] = {"requests": int(requests.level), "tokens": int(token_bucket.level)}
+            waits = {}
+            for name, values in self.waits.items():
+                if values:
+                    waits[name] = {
+                        "p50_seconds": round(_percentile(values, 0.5), 3),
+                        "p95_seconds": round(_percentile(values, 0.95), 3),
+                        "max_seconds": round(max(values), 3),
+                    }
+            return {
+                "queue_depth": depth,
+                "max_queue_depth": self.max_depth,
+                "queue_size": self.queue_size,
+                "admitted": dict(self.admitted),
+                "rejected": dict(self.rejected),
+                "wait": waits,
+                "buckets": buckets,
+                "limits": {
+                    "processes": self.processes,
+                    "requests_per_minute": round(self.requests_per_minute, 2),
+                    "tokens_per_minute": round(self.tokens_per_minute, 2),
+                    "queue_timeout": self.queue_timeout,
+                    "batch_queue_timeout": self.batch_queue_timeout,
+                },
+            }
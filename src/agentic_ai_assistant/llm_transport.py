@@ -0,0 +1,430 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import email.utils
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import httpx
+
+# Configuration
+# Retries of a Groq request after 429/5xx or a connection error
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Full-jitter exponential backoff: a random wait up to base * 2^attempt, capped
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+# Time allowed for one LLM request, retries and backoff included
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+# Connection pool shared by every Groq model
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+# Hedging: when a request has not answered within the LLM_HEDGE_PERCENTILE
+# latency of earlier ones, send a second copy and keep whichever answers first
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.25"))
+# Threads waiting on hedged requests from the sync client
+LLM_HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "32"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Latencies kept per (model, stream) for the hedge delay
+LATENCY_WINDOW = 200
+
+
+def retry_after(response):
+    """
+    Seconds the server asked us to wait (retry-after-ms or Retry-After), or None
+    """
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_tz(value)
+        return max(0.0, email.utils.mktime_tz(parsed) - time.time()) if parsed else None
+
+
+def _latency_key(request):
+    """
+    Hedge delays are kept per model and per streaming flag, whose latencies differ
+    """
+    try:
+        body = json.loads(request.content)
+        return body.get("model"), bool(body.get("stream"))
+    except (ValueError, AttributeError):
+        return request.url.path, False
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class TransportStats:
+    """
+    Thread-safe counters and time-to-response latencies of Groq requests
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            "requests": 0, "attempts": 0, "retries": 0, "hedges": 0,
+            "hedge_wins": 0, "failures": 0, "deadline_exceeded": 0,
+        }
+        self.latencies = {}
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def observe(self, key, seconds):
+        with self._lock:
+            self.latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def hedge_delay(self, key, percentile=LLM_HEDGE_PERCENTILE,
+                    min_samples=LLM_HEDGE_MIN_SAMPLES, min_delay=LLM_HEDGE_MIN_DELAY):
+        """
+        Seconds to wait before hedging, or None until enough requests were seen
+        """
+        with self._lock:
+            latencies = list(self.latencies.get(key, ()))
+        if len(latencies) < min_samples:
+            return None
+        return max(min_delay, _percentile(latencies, percentile))
+
+    def snapshot(self):
+        with self._lock:
+            latencies = {
+                f"{model}{' (stream)' if stream else ''}": {
+                    "p50_seconds": round(_percentile(values, 0.5), 3),
+                    "p95_seconds": round(_percentile(values, 0.95), 3),
+                }
+                for (model, stream), values in self.latencies.items() if values
+            }
+            return {**self.counts, "latency": latencies}
+
+
+class _RetryPolicy:
+    """
+    Retry, deadline and hedging rules shared by the sync and async transports
+    """
+
+    def __init__(self, max_retries=LLM_MAX_RETRIES, deadline=LLM_DEADLINE_SECONDS,
+                 hedge=LLM_HEDGE, stats=None):
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.hedge = hedge
+        self.stats = stats or TransportStats()
+
+    def backoff(self, attempt, response):
+        """
+        Wait before retry number attempt + 1: at least what Retry-After asks
+        for, otherwise full jitter
+        """
+        cap = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+        wait = random.uniform(0, cap)
+        asked = retry_after(response) if response is not None else None
+        return max(wait, asked) if asked is not None else wait
+
+    def give_up(self, attempt, wait, deadline):
+        if attempt >= self.max_retries:
+            return True
+        if time.monotonic() + wait >= deadline:
+            self.stats.count("deadline_exceeded")
+            return True
+        return False
+
+    def attempt_request(self, request, timeout):
+        """
+        Copy of request whose timeouts end at the deadline (the read timeout
+        applies to each chunk of a streamed body)
+        """
+        return httpx.Request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            content=request.content,
+            extensions={
+                **request.extensions,
+                "timeout": {
+                    "connect": min(LLM_CONNECT_TIMEOUT, timeout),
+                    "read": timeout,
+                    "write": timeout,
+                    "pool": timeout,
+                },
+            },
+        )
+
+    def usable(self, outcome):
+        return not isinstance(outcome, Exception) and outcome.status_code not in RETRY_STATUSES
+
+    def pick(self, outcomes, waiting):
+        """
+        Winner among finished hedged copies [(copy, response or error)]: the
+        first usable one, else (when no copy is still waiting) the last.
+        Returns (winner or None, responses to close)
+        """
+        winner = next((item for item in outcomes if self.usable(item[1])), None)
+        if winner is None and not waiting:
+            winner = outcomes[-1]
+        discard = [
+            item[1] for item in outcomes
+            if item is not winner and not isinstance(item[1], Exception)
+        ]
+        return winner, discard
+
+
+class ResilientTransport(httpx.BaseTransport, _RetryPolicy):
+    """
+    httpx transport for the Groq client: pooled connections, retries of
+    429/5xx with jittered exponential backoff honouring Retry-After, one
+    deadline per request, and optional hedged requests
+    """
+
+    def __init__(self, transport=None, executor=None, **policy):
+        _RetryPolicy.__init__(self, **policy)
+        self.transport = transport or httpx.HTTPTransport(limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+        ))
+        self.executor = executor
+        if self.hedge and executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=LLM_HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+
+    def _send(self, request, key, timeout):
+        self.stats.count("attempts")
+        start = time.perf_counter()
+        response = self.transport.handle_request(self.attempt_request(request, timeout))
+        if response.status_code < 400:
+            self.stats.observe(key, time.perf_counter() - start)
+        return response
+
+    def _hedged(self, request, key, deadline):
+        timeout = deadline - time.monotonic()
+        delay = self.stats.hedge_delay(key) if self.hedge else None
+        if delay is None or delay >= timeout:
+            return self._send(request, key, timeout)
+
+        first = self.executor.submit(self._send, request, key, timeout)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        self.stats.count("hedges")
+        second = self.executor.submit(self._send, request, key, deadline - time.monotonic())
+
+        pending = {first, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner, discard = self.pick([(future, _outcome(future)) for future in done], pending)
+            for response in discard:
+                _release(response)
+            if winner is None:
+                continue
+            # A copy still in flight is closed when it finishes
+            for loser in pending:
+                loser.add_done_callback(_close_response)
+            future, outcome = winner
+            if isinstance(outcome, Exception):
+                raise outcome
+            if future is second:
+                self.stats.count("hedge_wins")
+            return outcome
+
+    def handle_request(self, request):
+        request.read()
+        self.stats.count("requests")
+        key = _latency_key(request)
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            response, error = None, None
+            try:
+                response = self._hedged(request, key, deadline)
+            except httpx.TransportError as e:
+                error = e
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+
+            wait_seconds = self.backoff(attempt, response)
+            if self.give_up(attempt, wait_seconds, deadline):
+                self.stats.count("failures")
+                if error is not None:
+                    raise error
+                # The Groq client turns the status into RateLimitError etc.
+                return response
+            if response is not None:
+                _release(response)
+            self.stats.count("retries")
+            time.sleep(wait_seconds)
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+def _outcome(copy):
+    """
+    Response or transport error of a finished hedged copy (future or task)
+    """
+    try:
+        return copy.result()
+    except httpx.TransportError as e:
+        return e
+
+
+def _release(response):
+    """
+    Close a response we are not returning; an error body is read first so
+    its connection goes back to the pool
+    """
+    if response.status_code in RETRY_STATUSES:
+        try:
+            response.read()
+        except httpx.HTTPError:
+            pass
+    response.close()
+
+
+async def _arelease(response):
+    if response.status_code in RETRY_STATUSES:
+        try:
+            await response.aread()
+        except httpx.HTTPError:
+            pass
+    await response.aclose()
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport, _RetryPolicy):
+    """
+    ResilientTransport for the async Groq client; the losing copy of a
+    hedged request is cancelled
+    """
+
+    def __init__(self, transport=None, **policy):
+        _RetryPolicy.__init__(self, **policy)
+        self.transport = transport or httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+        ))
+
+    async def _send(self, request, key, timeout):
+        self.stats.count("attempts")
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(self.attempt_request(request, timeout))
+        if response.status_code < 400:
+            self.stats.observe(key, time.perf_counter() - start)
+        return response
+
+    async def _hedged(self, request, key, deadline):
+        timeout = deadline - time.monotonic()
+        delay = self.stats.hedge_delay(key) if self.hedge else None
+        if delay is None or delay >= timeout:
+            return await self._send(request, key, timeout)
+
+        first = asyncio.ensure_future(self._send(request, key, timeout))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done:
+                return first.result()
+            self.stats.count("hedges")
+            second = asyncio.ensure_future(self._send(request, key, deadline - time.monotonic()))
+            tasks.append(second)
+
+            pending = {first, second}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner, discard = self.pick([(task, _outcome(task)) for task in done], pending)
+                for response in discard:
+                    await _arelease(response)
+                if winner is None:
+                    continue
+                task, outcome = winner
+                if isinstance(outcome, Exception):
+                    raise outcome
+                if task is second:
+                    self.stats.count("hedge_wins")
+                return outcome
+        finally:
+            # The copy still in flight (or both, if we were cancelled)
+            for task in tasks:
+                task.cancel()
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        self.stats.count("requests")
+        key = _latency_key(request)
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            response, error = None, None
+            try:
+                response = await self._hedged(request, key, deadline)
+            except httpx.TransportError as e:
+                error = e
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+
+            wait_seconds = self.backoff(attempt, response)
+            if self.give_up(attempt, wait_seconds, deadline):
+                self.stats.count("failures")
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                await _arelease(response)
+            self.stats.count("retries")
+            await asyncio.sleep(wait_seconds)
+            attempt += 1
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+transport_stats = TransportStats()
+_clients = None
+_clients_lock = threading.Lock()
+
+
+def create_http_clients(stats=None, **policy):
+    """
+    (httpx.Client, httpx.AsyncClient) with resilient transports; policy
+    overrides max_retries, deadline and hedge
+    """
+    stats = stats or transport_stats
+    timeout = httpx.Timeout(policy.get("deadline", LLM_DEADLINE_SECONDS), connect=LLM_CONNECT_TIMEOUT)
+    return (
+        httpx.Client(transport=ResilientTransport(stats=stats, **policy), timeout=timeout),
+        httpx.AsyncClient(transport=AsyncResilientTransport(stats=stats, **policy), timeout=timeout),
+    )
+
+
+def shared_http_clients():
+    """
+    The clients every Groq model uses, so all LLM calls share one pool
+    """
+    global _clients
+    with _clients_lock:
+        if _clients is None:
+            _clients = create_http_clients()
+        return _clients
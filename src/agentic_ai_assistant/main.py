@@ -2,15 +2,18 @@ import os
 from dotenv import load_dotenv
 from vector_store import (
     create_embeddings,
-    create_vector_store,
+    create_ingestion_embeddings,
     load_existing_vector_store,
+    load_bm25_index,
     VECTOR_STORE_PATH
 )
+from ingestion import stream_vector_store
 from rag_chain import (
-    create_groq_llm,
     create_rag_chain,
     query_rag_chain
 )
+from model_router import create_model_router
+from recipe_index import parse_ingredient_query
 
 load_dotenv()
 
@@ -35,29 +38,42 @@ class RecipeAIAssistant:
             print("\n📂 Loading existing vector store...")
             self.vectorstore = load_existing_vector_store(self.embeddings)
         elif pdf_path:
-            print(f"\n📄 Creating new vector store from: {pdf_path}")
-            self.vectorstore = create_vector_store(pdf_path, self.embeddings)
+            # Chunks are embedded across all cores, queries use the local model
+            ingest_embeddings = create_ingestion_embeddings()
+            try:
+                # Only new or changed chunks are embedded, in bounded memory
+                stream_vector_store(pdf_path, ingest_embeddings)
+            finally:
+                ingest_embeddings.close()
+            self.vectorstore = load_existing_vector_store(self.embeddings)
         else:
             raise ValueError("No vector store found and no PDF path provided!")
         
-        # Step 3: Initialize GROQ LLM
-        self.llm = create_groq_llm(
-            model_name="llama-3.3-70b-versatile",
-            temperature=0.7
-        )
+        # Step 3: Initialize GROQ LLMs (small model for lookups, large for the rest)
+        self.model_router = create_model_router()
+        self.llm = self.model_router.as_runnable()
         
-        # Step 4: Create RAG chain
-        self.rag_chain = create_rag_chain(self.vectorstore, self.llm)
+        # Step 4: Create RAG chain (hybrid BM25 + vector retrieval)
+        self.bm25_index = load_bm25_index(self.embeddings)
+        self.rag_chain = create_rag_chain(self.vectorstore, self.llm, self.bm25_index)
         
         print("\n✅ Recipe AI Assistant is ready!")
         print("=" * 60)
     
     
-    def ask(self, question):
+    def ask(self, question, route=None):
         """
         Ask a question to the Recipe AI
+        route: what is known about the question for the model router,
+        e.g. {"query_type": "ingredients", "ingredients": 3}
         """
-        return query_rag_chain(self.rag_chain, question)
+        route = route or {}
+        config = {'configurable': {'context_report': {}, 'route': route}}
+        response = query_rag_chain(self.rag_chain, question, config)
+        if 'model' in route:
+            model = route['model']
+            print(f"\n🧭 {model['name']} ({model['reason']}, {model.get('seconds', 0):.2f}s)")
+        return response
     
     
     def find_recipe_by_name(self, recipe_name):
@@ -65,7 +81,7 @@ class RecipeAIAssistant:
         Find a specific recipe by name
         """
         question = f"Give me the complete recipe for {recipe_name} including ingredients and step-by-step instructions."
-        return self.ask(question)
+        return self.ask(question, {'query_type': 'recipe_name'})
     
     
     def find_recipes_by_ingredients(self, ingredients):
@@ -76,7 +92,7 @@ class RecipeAIAssistant:
             ingredients = ", ".join(ingredients)
         
         question = f"I have the following ingredients: {ingredients}. What recipes can I make with these? Please suggest 2-3 recipes with complete details."
-        return self.ask(question)
+        return self.ask(question, {'query_type': 'ingredients', 'ingredients': len(parse_ingredient_query(ingredients))})
     
     
     def interactive_mode(self):
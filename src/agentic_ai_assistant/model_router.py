@@ -0,0 +1,257 @@
+import os
+import time
+import threading
+from collections import deque
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+from llm_scheduler import LLMScheduler, LLM_SCHEDULER, INTERACTIVE
+
+# Configuration
+# Send simple lookups to a small fast model and the rest to the large one
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "true").lower() == "true"
+SMALL_MODEL = os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant")
+LARGE_MODEL = os.getenv("GROQ_LARGE_MODEL", "llama-3.3-70b-versatile")
+SMALL_MAX_TOKENS = int(os.getenv("GROQ_SMALL_MAX_TOKENS", "768"))
+LARGE_MAX_TOKENS = int(os.getenv("GROQ_LARGE_MAX_TOKENS", "1024"))
+# A question stays on the small model only if its context is at most this
+# many passages and (for retrieved context) the best chunk is this similar
+ROUTER_MAX_PASSAGES = int(os.getenv("ROUTER_MAX_PASSAGES", "2"))
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.5"))
+# Ingredient searches listing more ingredients than this are multi-recipe
+ROUTER_MAX_INGREDIENTS = int(os.getenv("ROUTER_MAX_INGREDIENTS", "3"))
+# Latencies kept per model for the percentiles in ModelStats.snapshot()
+LATENCY_WINDOW = 500
+
+SMALL = "small"
+LARGE = "large"
+
+
+def classify(route, context):
+    """
+    (tier, reason) for one LLM call.
+
+    route holds what is known about the request before retrieval
+    (query_type, catalog_match, ingredients), context the packed context
+    report (passages, top_similarity). A known catalog recipe or a narrow,
+    confident retrieval is a lookup; many ingredients, many passages or a
+    weak best match mean an open-ended or multi-recipe answer. Without
+    adaptive retrieval there is no similarity and every search returns k
+    chunks, so the query type decides: recipe names are lookups, free-form
+    questions are open-ended.
+    """
+    if route.get("catalog_match"):
+        return SMALL, "catalog_match"
+    if route.get("ingredients", 0) > ROUTER_MAX_INGREDIENTS:
+        return LARGE, "many_ingredients"
+    passages = context.get("passages")
+    if not passages:
+        return LARGE, "no_context"
+    similarity = context.get("top_similarity")
+    # Ingredient matches come from the ingredient index and carry no similarity
+    if similarity is None and route.get("query_type") != "ingredients":
+        if route.get("query_type") == "recipe_name":
+            return SMALL, "recipe_lookup"
+        return LARGE, "open_question"
+    if passages > ROUTER_MAX_PASSAGES:
+        return LARGE, "broad_context"
+    if similarity is not None and similarity < ROUTER_MIN_SIMILARITY:
+        return LARGE, "low_similarity"
+    return SMALL, "narrow_context"
+
+
+def _total_tokens(response):
+    """
+    Tokens an LLM call used according to the API (prompt plus completion),
+    or None when the response does not say
+    """
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage and usage.get("total_tokens"):
+                return usage["total_tokens"]
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ModelStats:
+    """
+    Thread-safe per-model call counts and latencies, and routing decisions
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.models = {}
+        self.reasons = {}
+
+    def route(self, reason):
+        with self._lock:
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def record(self, model, seconds, first_token_seconds=None, error=False):
+        with self._lock:
+            stats = self.models.setdefault(model, {
+                "calls": 0,
+                "errors": 0,
+                "latencies": deque(maxlen=LATENCY_WINDOW),
+                "first_token": deque(maxlen=LATENCY_WINDOW),
+            })
+            stats["calls"] += 1
+            if error:
+                stats["errors"] += 1
+                return
+            stats["latencies"].append(seconds)
+            if first_token_seconds is not None:
+                stats["first_token"].append(first_token_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            models = {}
+            for model, stats in self.models.items():
+                latencies = list(stats["latencies"])
+                first_token = list(stats["first_token"])
+                models[model] = {"calls": stats["calls"], "errors": stats["errors"]}
+                if latencies:
+                    models[model].update(
+                        p50_seconds=round(_percentile(latencies, 0.5), 3),
+                        p95_seconds=round(_percentile(latencies, 0.95), 3),
+                    )
+                if first_token:
+                    models[model]["p50_first_token_seconds"] = round(_percentile(first_token, 0.5), 3)
+            return {"models": models, "routes": dict(self.reasons)}
+
+
+class _LatencyRecorder(BaseCallbackHandler):
+    """
+    Times one LLM call and writes the result to the stats and the route
+    dict; on_usage, if given, is called with the tokens the call used
+    """
+
+    # Called in the caller's thread/event loop, not an executor
+    run_inline = True
+
+    def __init__(self, stats, decision, on_usage=None):
+        self.stats = stats
+        self.decision = decision
+        self.on_usage = on_usage
+        self.start = None
+        self.first_token = None
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.start = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.start = time.perf_counter()
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.first_token is None and self.start is not None:
+            self.first_token = time.perf_counter() - self.start
+
+    def on_llm_end(self, response, **kwargs):
+        seconds = time.perf_counter() - self.start
+        self.decision["seconds"] = round(seconds, 3)
+        self.stats.record(self.decision["name"], seconds, self.first_token)
+        used = _total_tokens(response)
+        if used is not None:
+            self.decision["tokens"] = used
+            if self.on_usage is not None:
+                self.on_usage(used)
+
+    def on_llm_error(self, error, **kwargs):
+        self.stats.record(self.decision["name"], 0.0, error=True)
+
+
+class ModelRouter:
+    """
+    Picks the small or large model per call.
+
+    as_runnable() stands in for the LLM in a chain. It reads
+    config["configurable"]["route"] and ["context_report"] (filled by the
+    context packer earlier in the same run) and writes the decision back to
+    route["model"], e.g.
+    {"name": "llama-3.1-8b-instant", "tier": "small", "reason": "catalog_match",
+     "queue_seconds": 0.0, "seconds": 0.41, "tokens": 912}
+    With a scheduler, the call first waits for its turn (at
+    config["configurable"]["priority"]) and may raise LLMOverloaded; once
+    it finishes, its reservation is reconciled with the tokens it used.
+    """
+
+    def __init__(self, llms, enabled=MODEL_ROUTING, scheduler=None):
+        # {"small": (model name, llm), "large": (model name, llm)}
+        self.llms = llms
+        self.enabled = enabled
+        self.scheduler = scheduler
+        self.stats = ModelStats()
+
+    def choose(self, route, context):
+        if not self.enabled:
+            return LARGE, "routing_disabled"
+        return classify(route, context)
+
+    def _decide(self, config):
+        configurable = config.get("configurable", {})
+        route = configurable.get("route")
+        if route is None:
+            route = {}
+        tier, reason = self.choose(route, configurable.get("context_report") or {})
+        name, llm = self.llms[tier]
+        decision = {"name": name, "tier": tier, "reason": reason}
+        route["model"] = decision
+        self.stats.route(reason)
+        return decision, llm, configurable.get("priority", INTERACTIVE)
+
+    def _estimate_tokens(self, prompt, llm):
+        """
+        Tokens a call may use against the rate limit: prompt plus max_tokens
+        """
+        from recipe_chunker import get_token_counter
+        return get_token_counter()(prompt.to_string()) + (getattr(llm, "max_tokens", None) or 0)
+
+    def _timed(self, llm, decision, reserved=None):
+        # The returned LLM is run on the prompt (and streamed) by RunnableLambda
+        on_usage = None
+        if reserved is not None:
+            def on_usage(used):
+                self.scheduler.reconcile(decision["name"], reserved, used)
+        return llm.with_config(callbacks=[_LatencyRecorder(self.stats, decision, on_usage)])
+
+    def _select(self, prompt, config):
+        decision, llm, priority = self._decide(config)
+        reserved = None
+        if self.scheduler is not None:
+            reserved = self._estimate_tokens(prompt, llm)
+            waited = self.scheduler.acquire(decision["name"], reserved, priority)
+            decision["queue_seconds"] = round(waited, 3)
+        return self._timed(llm, decision, reserved)
+
+    async def _aselect(self, prompt, config):
+        decision, llm, priority = self._decide(config)
+        reserved = None
+        if self.scheduler is not None:
+            reserved = self._estimate_tokens(prompt, llm)
+            waited = await self.scheduler.aacquire(decision["name"], reserved, priority)
+            decision["queue_seconds"] = round(waited, 3)
+        return self._timed(llm, decision, reserved)
+
+    def as_runnable(self):
+        return RunnableLambda(self._select, afunc=self._aselect, name="model_router")
+
+
+def create_model_router(enabled=MODEL_ROUTING, temperature=0.7, scheduled=LLM_SCHEDULER):
+    """
+    Create the router with its Groq models (only the large one when
+    disabled), behind an LLMScheduler when scheduled
+    """
+    from rag_chain import create_groq_llm
+
+    large = (LARGE_MODEL, create_groq_llm(LARGE_MODEL, temperature, max_tokens=LARGE_MAX_TOKENS))
+    small = large
+    if enabled:
+        small = (SMALL_MODEL, create_groq_llm(SMALL_MODEL, temperature, max_tokens=SMALL_MAX_TOKENS))
+        print(f"🧭 Routing lookups to {SMALL_MODEL}, open-ended questions to {LARGE_MODEL}")
+    return ModelRouter({SMALL: small, LARGE: large}, enabled=enabled,
+                       scheduler=LLMScheduler() if scheduled else None)
@@ -0,0 +1,246 @@
+import os
+import json
+import uuid
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+# Configuration
+NUMPY_INDEX_PATH = "vectorstore/recipe_index"
+# Names the current generation; the data files carry the generation id
+MANIFEST_FILE = "index.json"
+VECTORS_FILE = "embeddings-{generation}.npy"
+DOCUMENTS_FILE = "documents-{generation}.json"
+# Superseded generations kept on disk, for readers that read the manifest
+# just before it was replaced
+KEEP_OLD_GENERATIONS = 1
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first, via argpartition
+    """
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def read_generation(path):
+    """
+    Current generation id of an index directory, or None if it has none
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)["generation"]
+    except FileNotFoundError:
+        return None
+
+
+def _generation_of(name):
+    """
+    Generation id in a data file name like embeddings-<generation>.npy, or None
+    """
+    stem, _, _ = name.partition(".")
+    parts = stem.rsplit("-", 1)
+    return parts[1] if len(parts) == 2 else None
+
+
+def _remove_old_generations(path, current):
+    """
+    Delete data files of all but the newest KEEP_OLD_GENERATIONS superseded generations
+    """
+    newest = {}
+    for name in os.listdir(path):
+        generation = _generation_of(name)
+        if generation is None or generation == current:
+            continue
+        mtime = os.path.getmtime(os.path.join(path, name))
+        newest[generation] = max(mtime, newest.get(generation, mtime))
+    stale = sorted(newest, key=newest.get, reverse=True)[KEEP_OLD_GENERATIONS:]
+    for name in os.listdir(path):
+        if _generation_of(name) in stale:
+            try:
+                os.remove(os.path.join(path, name))
+            except FileNotFoundError:
+                pass
+
+
+def write_index(path, ids, vectors, texts, metadatas):
+    """
+    Write a new generation of an index directory: a float32 .npy matrix
+    plus one JSON file holding ids, texts and metadata in row order
+    """
+    os.makedirs(path, exist_ok=True)
+    vectors = _normalize(vectors) if len(ids) else np.zeros((0, 0), dtype=np.float32)
+
+    # Both files get a fresh name; replacing the manifest is the one atomic
+    # step that publishes them, so readers never pair mismatched files
+    generation = uuid.uuid4().hex
+    with open(os.path.join(path, VECTORS_FILE.format(generation=generation)), "wb") as f:
+        np.save(f, vectors)
+    with open(os.path.join(path, DOCUMENTS_FILE.format(generation=generation)), "w", encoding="utf-8") as f:
+        json.dump(
+            {"ids": list(ids), "texts": list(texts), "metadatas": [m or {} for m in metadatas]},
+            f, ensure_ascii=False, separators=(",", ":")
+        )
+    manifest_tmp = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(manifest_tmp, "w", encoding="utf-8") as f:
+        json.dump({"generation": generation, "rows": len(ids)}, f)
+    os.replace(manifest_tmp, os.path.join(path, MANIFEST_FILE))
+    _remove_old_generations(path, generation)
+    return generation
+
+
+class NumpyVectorIndex(VectorStore):
+    """
+    Exact in-process vector index for small corpora.
+
+    Normalized embeddings are memory-mapped from an .npy file, so loading is
+    near-instant and worker processes share the same pages. A query is one
+    matrix-vector product plus argpartition for the top k.
+    """
+
+    def __init__(self, path=NUMPY_INDEX_PATH, embedding_function=None):
+        self.path = path
+        self.embedding_function = embedding_function
+        self._load()
+
+    def _load(self):
+        # A writer may publish two generations between reading the manifest
+        # and opening its files, removing the one just read: read it again
+        for attempt in range(3):
+            self.generation = read_generation(self.path)
+            if self.generation is None:
+                self.vectors = np.zeros((0, 0), dtype=np.float32)
+                data = {"ids": [], "texts": [], "metadatas": []}
+                break
+            try:
+                self.vectors = np.load(
+                    os.path.join(self.path, VECTORS_FILE.format(generation=self.generation)), mmap_mode="r"
+                )
+                with open(os.path.join(self.path, DOCUMENTS_FILE.format(generation=self.generation)),
+                          encoding="utf-8") as f:
+                    data = json.load(f)
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+        self.ids = data["ids"]
+        self.texts = data["texts"]
+        self.metadatas = data["metadatas"]
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Writes -------------------------------------------------------------
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        new_vectors = _normalize(self.embedding_function.embed_documents(texts))
+
+        # Replace rows with the same id, append the rest
+        replaced = set(ids)
+        keep = [i for i, existing in enumerate(self.ids) if existing not in replaced]
+        vectors = np.concatenate([np.asarray(self.vectors[keep]), new_vectors]) if keep else new_vectors
+        write_index(
+            self.path,
+            [self.ids[i] for i in keep] + ids,
+            vectors,
+            [self.texts[i] for i in keep] + texts,
+            [self.metadatas[i] for i in keep] + metadatas,
+        )
+        self._load()
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return None
+        removed = set(ids)
+        keep = [i for i, existing in enumerate(self.ids) if existing not in removed]
+        write_index(
+            self.path,
+            [self.ids[i] for i in keep],
+            np.asarray(self.vectors[keep]) if keep else [],
+            [self.texts[i] for i in keep],
+            [self.metadatas[i] for i in keep],
+        )
+        self._load()
+        return True
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path=NUMPY_INDEX_PATH, **kwargs):
+        texts = list(texts)
+        write_index(
+            path,
+            list(ids) if ids else [str(uuid.uuid4()) for _ in texts],
+            embedding.embed_documents(texts),
+            texts,
+            list(metadatas) if metadatas else [{} for _ in texts],
+        )
+        return cls(path=path, embedding_function=embedding)
+
+    # --- Search -------------------------------------------------------------
+
+    def _filter_mask(self, filter):
+        if not filter:
+            return None
+        return np.array([
+            all(metadata.get(key) == value for key, value in filter.items())
+            for metadata in self.metadatas
+        ], dtype=bool)
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        """
+        Exact top-k by cosine similarity (higher is better)
+        """
+        if not self.ids:
+            return []
+        query = _normalize(embedding)
+        scores = self.vectors @ query
+
+        mask = self._filter_mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+
+        return [
+            (Document(page_content=self.texts[i], metadata=self.metadatas[i], id=self.ids[i]), float(scores[i]))
+            for i in top_k(scores, k)
+        ]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] -> relevance in [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+
+def export_chroma_to_numpy(vectorstore, path=NUMPY_INDEX_PATH):
+    """
+    Copy every vector, text and metadata out of a Chroma collection
+    into a NumpyVectorIndex without re-embedding anything
+    """
+    data = vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+    write_index(path, data["ids"], data["embeddings"], data["documents"], data["metadatas"])
+    print(f"✅ Exported {len(data['ids'])} vectors to NumPy index at: {path}")
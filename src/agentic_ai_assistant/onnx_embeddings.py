@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx")
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model-int8.onnx"
+MIN_PARITY_COSINE = 0.99
+
+BENCHMARK_QUERIES = [
+    "Give me a recipe for Chicken Biryani",
+    "I have chicken, tomatoes, and rice. What can I make?",
+    "Show me a quick pasta recipe",
+    "What recipes use eggs and milk?",
+    "Give me a vegetarian dinner recipe",
+]
+
+
+def export_onnx_model(model_name, output_dir=ONNX_MODEL_DIR, quantize=True):
+    """
+    Export a sentence-transformers model to ONNX, optionally with a
+    dynamically int8-quantized copy. Needs torch, but only at export time.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from sentence_transformers import SentenceTransformer
+
+    print(f"📦 Exporting {model_name} to ONNX: {output_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    max_seq_length = SentenceTransformer(model_name, device="cpu").max_seq_length or 256
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class HiddenStateModel(torch.nn.Module):
+        """Positional inputs -> last_hidden_state, independent of forward()'s signature"""
+
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStateModel(),
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            dynamo=False,
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    with open(os.path.join(output_dir, "embedding_config.json"), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": max_seq_length,
+            "pad_token": tokenizer.pad_token,
+            "pad_token_id": tokenizer.pad_token_id,
+        }, f, indent=2)
+    print(f"✅ ONNX model written to: {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        int8_path = os.path.join(output_dir, ONNX_INT8_MODEL_FILE)
+        quantize_dynamic(model_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"✅ int8 model written to: {int8_path}")
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Mean-pooled sentence embeddings from an exported ONNX model.
+    Runs on onnxruntime + tokenizers only, without importing torch.
+    """
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=False, normalize=True,
+                 batch_size=32, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, "embedding_config.json")) as f:
+            config = json.load(f)
+        self.model_name = config["model_name"]
+        self.quantized = quantized
+        self.normalize = normalize
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=config["pad_token_id"], pad_token=config["pad_token"])
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        model_file = ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts):
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            # Same preprocessing as HuggingFaceEmbeddings
+            batch = [text.replace("\n", " ") for text in texts[i:i + self.batch_size]]
+            encoded = self.tokenizer.encode_batch(batch)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encoded], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encoded], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled.astype(np.float32))
+        return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+def check_parity(embeddings, reference, texts=BENCHMARK_QUERIES, min_cosine=MIN_PARITY_COSINE):
+    """
+    Compare two embedding backends; returns the lowest cosine similarity.
+    Raises ValueError if any text falls below min_cosine.
+    """
+    a = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    lowest = float((a * b).sum(axis=1).min())
+    print(f"🔍 Parity: lowest cosine {lowest:.5f} over {len(texts)} texts")
+    if lowest < min_cosine:
+        raise ValueError(f"Embedding parity check failed: cosine {lowest:.5f} < {min_cosine}")
+    return lowest
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _bench_backend(backend, queries, rounds, results):
+    """
+    Benchmark one backend in a fresh process so load time and RSS are its own
+    """
+    start = time.perf_counter()
+    from vector_store import create_embeddings
+    embeddings = create_embeddings(backend=backend, use_cache=False)
+    load_time = time.perf_counter() - start
+
+    embeddings.embed_query(queries[0])
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            embeddings.embed_query(query)
+    elapsed = time.perf_counter() - start
+
+    results.put({
+        "backend": backend,
+        "load_s": load_time,
+        "rss_mb": _peak_rss_mb(),
+        "qps": rounds * len(queries) / elapsed,
+    })
+
+
+def benchmark_backends(backends=("torch", "onnx", "onnx-int8"), queries=BENCHMARK_QUERIES, rounds=20):
+    """
+    Compare load time, peak RSS and single-query throughput per backend
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    rows = []
+    for backend in backends:
+        process = context.Process(target=_bench_backend, args=(backend, list(queries), rounds, results))
+        process.start()
+        process.join()
+        if process.exitcode == 0:
+            rows.append(results.get())
+        else:
+            print(f"⚠️  Benchmark for {backend} failed (exit code {process.exitcode})")
+
+    print(f"\n{'backend':<10} {'load (s)':>9} {'RSS (MB)':>9} {'queries/s':>10}")
+    print("-" * 41)
+    for row in rows:
+        print(f"{row['backend']:<10} {row['load_s']:>9.2f} {row['rss_mb']:>9.0f} {row['qps']:>10.1f}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONNX embedding backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="export the embedding model to ONNX")
+    export_cmd.add_argument("--no-int8", action="store_true", help="skip the int8 quantized copy")
+    sub.add_parser("parity", help="compare ONNX vectors with the PyTorch model")
+    sub.add_parser("bench", help="compare load time, RSS and queries/sec")
+    args = parser.parse_args()
+
+    from vector_store import EMBEDDING_MODEL, create_embeddings
+    if args.command == "export":
+        export_onnx_model(EMBEDDING_MODEL, quantize=not args.no_int8)
+    elif args.command == "parity":
+        reference = create_embeddings(backend="torch", use_cache=False)
+        for backend in ("onnx", "onnx-int8"):
+            print(f"\n{backend}:")
+            check_parity(create_embeddings(backend=backend, use_cache=False), reference)
+    else:
+        benchmark_backends()
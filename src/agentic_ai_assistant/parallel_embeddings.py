@@ -0,0 +1,104 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+EMBEDDING_BATCH_SIZE = 64
+# Shards handed to each worker per call; a few keep the pool evenly loaded
+SHARDS_PER_WORKER = 4
+
+# Per-process model, loaded once by the pool initializer
+_worker_model = None
+_worker_normalize = True
+
+
+def _init_worker(model_name, normalize, threads_per_worker):
+    """
+    Worker: load the model once with a fixed intra-op thread count
+    """
+    global _worker_model, _worker_normalize
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Without this every worker spawns one thread per core and they fight
+    torch.set_num_threads(threads_per_worker)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+    _worker_normalize = normalize
+
+
+def _encode_shard(texts, batch_size):
+    """
+    Worker: embed one shard of texts
+    """
+    # Same preprocessing as HuggingFaceEmbeddings, so vectors match it
+    texts = [text.replace("\n", " ") for text in texts]
+    vectors = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=_worker_normalize,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return vectors.astype(np.float32)
+
+
+class ParallelEmbeddings(Embeddings):
+    """
+    Sentence-transformers embeddings sharded across a pool of worker
+    processes, one model copy per worker. Meant for ingestion, where
+    thousands of chunks are embedded at once.
+    """
+
+    def __init__(self, model_name, normalize=True, workers=None,
+                 threads_per_worker=1, batch_size=EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.normalize = normalize
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            print(f"🧵 Starting {self.workers} embedding workers "
+                  f"({self.threads_per_worker} thread(s) each, batch size {self.batch_size})")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.normalize, self.threads_per_worker),
+            )
+        return self._pool
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+
+        # Round shards up to whole batches
+        shard_count = self.workers * SHARDS_PER_WORKER
+        shard_size = max(self.batch_size, -(-len(texts) // shard_count))
+        shard_size = -(-shard_size // self.batch_size) * self.batch_size
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+
+        pool = self._get_pool()
+        # map() keeps shard order, so vectors line up with the input texts
+        results = pool.map(_encode_shard, shards, [self.batch_size] * len(shards))
+        return np.concatenate(list(results)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def close(self):
+        """
+        Shut down the worker pool
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import numpy as np
+from langchain_core.documents import Document
+from numpy_index import NumpyVectorIndex, NUMPY_INDEX_PATH, top_k, _normalize
+
+# Configuration
+# Candidates re-ranked with full-precision vectors per requested result
+RERANK_FACTOR = int(os.getenv("QUANTIZED_RERANK_FACTOR", "10"))
+# Rows scanned per block in the int8 coarse scan, bounds the temporary float copy
+SCAN_BLOCK_ROWS = 8192
+
+# Codes are built once per index generation (see numpy_index.write_index)
+CODES_FILES = {"int8": "codes-int8-{generation}.npz", "binary": "codes-binary-{generation}.npz"}
+
+# Popcount per byte value, for numpy versions without np.bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(bits):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits)
+    return _POPCOUNT[bits]
+
+
+def quantize_int8(vectors):
+    """
+    Symmetric per-dimension int8 quantization; returns (codes, scale)
+    """
+    scale = np.abs(vectors).max(axis=0) / 127.0
+    scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def quantize_binary(vectors):
+    """
+    1 bit per dimension (the sign), packed 8 dimensions per byte
+    """
+    return np.packbits(vectors > 0, axis=1)
+
+
+class QuantizedVectorIndex(NumpyVectorIndex):
+    """
+    Compressed variant of NumpyVectorIndex.
+
+    Only int8 (4x smaller) or 1-bit binary (32x smaller) codes are held in
+    memory. A coarse scan over the codes picks a shortlist that is re-ranked
+    exactly against the float32 vectors, which stay memory-mapped on disk
+    and are only paged in for shortlisted rows.
+    """
+
+    def __init__(self, path=NUMPY_INDEX_PATH, embedding_function=None, mode="int8",
+                 rerank_factor=RERANK_FACTOR):
+        if mode not in CODES_FILES:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.mode = mode
+        self.rerank_factor = rerank_factor
+        super().__init__(path=path, embedding_function=embedding_function)
+
+    def _load(self):
+        super()._load()
+        if not self.ids:
+            self.codes, self.scale = None, None
+            return
+        codes_path = os.path.join(self.path, CODES_FILES[self.mode].format(generation=self.generation))
+        if not os.path.exists(codes_path):
+            self._build_codes(codes_path)
+
+        data = np.load(codes_path)
+        self.codes = data["codes"]
+        self.scale = data["scale"] if "scale" in data else None
+
+    def _build_codes(self, codes_path):
+        print(f"🗜️  Building {self.mode} codes for {len(self.ids)} vectors")
+        codes_tmp = f"{codes_path}.{os.getpid()}.tmp.npz"
+        if self.mode == "int8":
+            codes, scale = quantize_int8(np.asarray(self.vectors))
+            np.savez(codes_tmp, codes=codes, scale=scale)
+        else:
+            np.savez(codes_tmp, codes=quantize_binary(np.asarray(self.vectors)))
+        os.replace(codes_tmp, codes_path)
+
+    @property
+    def resident_bytes(self):
+        """
+        Bytes held in memory by the coarse index
+        """
+        if self.codes is None:
+            return 0
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def coarse_scores(self, query):
+        """
+        Approximate similarity of every row to a normalized query
+        """
+        if self.mode == "binary":
+            query_bits = quantize_binary(query[None, :])[0]
+            hamming = _popcount(np.bitwise_xor(self.codes, query_bits)).sum(axis=1, dtype=np.int32)
+            return -hamming.astype(np.float32)
+
+        scaled_query = query * self.scale
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + SCAN_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        return scores
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        """
+        Coarse scan over the codes, then exact cosine re-rank of a shortlist
+        """
+        if not self.ids:
+            return []
+        query = _normalize(embedding)
+        scores = self.coarse_scores(query)
+
+        mask = self._filter_mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        if k <= 0:
+            return []
+
+        shortlist = top_k(scores, k * self.rerank_factor)
+        if mask is not None:
+            shortlist = shortlist[mask[shortlist]]
+
+        # Sorted row order makes the reads from the memory map sequential
+        rows = np.sort(shortlist)
+        exact = np.asarray(self.vectors[rows]) @ query
+        return [
+            (Document(page_content=self.texts[rows[i]], metadata=self.metadatas[rows[i]], id=self.ids[rows[i]]),
+             float(exact[i]))
+            for i in top_k(exact, k)
+        ]
+
+
+def evaluate_recall(path=NUMPY_INDEX_PATH, k=4, sample=200, rerank_factors=(1, 4, 10, 32), seed=0):
+    """
+    Recall@k of each quantized mode against exact search on our own corpus.
+    Stored chunk vectors are used as queries, excluding each query's own row.
+    """
+    exact = NumpyVectorIndex(path)
+    if not len(exact):
+        print("⚠️  Index is empty, nothing to evaluate")
+        return []
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(exact), size=min(sample, len(exact)), replace=False)
+    queries = np.asarray(exact.vectors[rows])
+
+    def neighbours(index, query, row):
+        hits = index.similarity_search_by_vector_with_score(query, k=k + 1)
+        return [doc.id for doc, _ in hits if doc.id != exact.ids[row]][:k]
+
+    truth = [neighbours(exact, q, row) for q, row in zip(queries, rows)]
+    float_bytes = exact.vectors.nbytes
+
+    results = []
+    print(f"\n{'mode':<8} {'rerank':>6} {'recall@' + str(k):>9} {'ms/query':>9} {'resident':>10} {'vs float':>9}")
+    print("-" * 56)
+    for mode in CODES_FILES:
+        for factor in rerank_factors:
+            index = QuantizedVectorIndex(path, mode=mode, rerank_factor=factor)
+            start = time.perf_counter()
+            found = [neighbours(index, q, row) for q, row in zip(queries, rows)]
+            elapsed = (time.perf_counter() - start) / len(rows) * 1000
+            recall = np.mean([len(set(f) & set(t)) / max(len(t), 1) for f, t in zip(found, truth)])
+            ratio = float_bytes / max(index.resident_bytes, 1)
+            results.append({"mode": mode, "rerank_factor": factor, "recall": float(recall), "ms_per_query": elapsed})
+            print(f"{mode:<8} {factor:>6} {recall:>9.3f} {elapsed:>9.3f} "
+                  f"{index.resident_bytes / 1024:>8.0f}KB {ratio:>8.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    evaluate_recall(path=sys.argv[1] if len(sys.argv) > 1 else NUMPY_INDEX_PATH)
@@ -1,27 +1,41 @@
 import os
-from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from dotenv import load_dotenv
+from context_packer import pack_documents
 
 load_dotenv()
 
 # Get GROQ API key
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# "hybrid" (BM25 + vector, fused with RRF) or "vector"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
 
-def create_groq_llm(model_name="llama-3.3-70b-versatile", temperature=0.7):
+
+def create_groq_llm(model_name="llama-3.3-70b-versatile", temperature=0.7, max_tokens=1024):
     """
     Create GROQ LLM instance
+    Requests go through the shared pooled, retrying (and optionally hedged)
+    HTTP clients of llm_transport.py, which also enforce the deadline
     """
+    from langchain_groq import ChatGroq
+    from llm_transport import shared_http_clients, LLM_DEADLINE_SECONDS
+    
     print(f"🤖 Initializing GROQ LLM: {model_name}")
     
+    http_client, http_async_client = shared_http_clients()
     llm = ChatGroq(
         groq_api_key=GROQ_API_KEY,
         model_name=model_name,
         temperature=temperature,
-        max_tokens=1024
+        max_tokens=max_tokens,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        request_timeout=LLM_DEADLINE_SECONDS,
+        # Retries happen in the transport, which honours the deadline
+        max_retries=0
     )
     print("✅ GROQ LLM initialized!")
     return llm
@@ -54,41 +68,76 @@ Answer:"""
     return prompt
 
 
-def create_rag_chain(vectorstore, llm):
+def create_retriever(vectorstore, bm25_index=None, k=4, mode=RETRIEVAL_MODE, adaptive=None):
     """
-    Create RAG chain combining retriever and LLM
+    Create the retriever: hybrid BM25 + vector when a BM25 index is available.
+    adaptive (default: ADAPTIVE_RETRIEVAL) picks the number of chunks per
+    query from the similarity scores instead of always returning k.
     """
-    print("\n🔗 Creating RAG chain...")
+    if adaptive is None:
+        from adaptive_retriever import ADAPTIVE_RETRIEVAL
+        adaptive = ADAPTIVE_RETRIEVAL
     
-    # Create retriever from vectorstore
-    retriever = vectorstore.as_retriever(
+    if mode == "hybrid" and bm25_index is not None:
+        from hybrid_retriever import HybridRetriever
+        print("🔀 Using hybrid BM25 + vector retrieval" + (" (adaptive depth)" if adaptive else ""))
+        return HybridRetriever(vectorstore=vectorstore, bm25_index=bm25_index, k=k, adaptive=adaptive)
+    
+    if adaptive:
+        from adaptive_retriever import AdaptiveRetriever
+        print("📏 Using adaptive-depth vector retrieval")
+        return AdaptiveRetriever(vectorstore=vectorstore)
+    
+    return vectorstore.as_retriever(
         search_type="similarity",
-        search_kwargs={"k": 4}  # Return top 4 most relevant chunks
+        search_kwargs={"k": k}  # Return top k most relevant chunks
     )
+
+
+def pack_context(docs, config):
+    """
+    Pack retrieved documents into the prompt context (see context_packer.py).
+    A dict passed as config["configurable"]["context_report"] receives the
+    token counts, e.g. {"retrieved": 4, "passages": 3, "tokens": 610, "saved_tokens": 190}
+    """
+    context, report = pack_documents(docs)
+    sink = config.get("configurable", {}).get("context_report")
+    if sink is not None:
+        sink.update(report)
+    return context
+
+
+def create_answer_chain(llm):
+    """
+    Create the prompt -> LLM chain for a question with ready-made context
+    Input: {"context": str, "question": str}
+    """
+    return create_recipe_prompt() | llm | StrOutputParser()
+
+
+def create_rag_chain(vectorstore, llm, bm25_index=None):
+    """
+    Create RAG chain combining retriever and LLM
+    """
+    print("\n🔗 Creating RAG chain...")
     
-    # Create custom prompt
-    prompt = create_recipe_prompt()
-    
-    # Helper function to format documents
-    def format_docs(docs):
-        return "\n\n".join([doc.page_content for doc in docs])
+    # Create retriever from vectorstore
+    retriever = create_retriever(vectorstore, bm25_index)
     
     # Create the RAG chain
     rag_chain = (
         {
-            "context": retriever | format_docs,
+            "context": retriever | RunnableLambda(pack_context),
             "question": RunnablePassthrough()
         }
-        | prompt
-        | llm
-        | StrOutputParser()
+        | create_answer_chain(llm)
     )
     
     print("✅ RAG chain created!")
     return rag_chain
 
 
-def query_rag_chain(rag_chain, question):
+def query_rag_chain(rag_chain, question, config=None):
     """
     Query the RAG chain with a question
     """
@@ -97,7 +146,7 @@ def query_rag_chain(rag_chain, question):
     print(f"{'='*60}\n")
     
     try:
-        response = rag_chain.invoke(question)
+        response = rag_chain.invoke(question, config)
         print(f"🤖 Answer:\n{response}")
         return response
     except Exception as e:
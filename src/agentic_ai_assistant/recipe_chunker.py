@@ -0,0 +1,228 @@
+import re
+from functools import lru_cache
+from langchain_core.documents import Document
+
+# Configuration
+TOKENIZER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# all-MiniLM-L6-v2 truncates its input at 256 word pieces
+MAX_CHUNK_TOKENS = 256
+
+INGREDIENTS_HEADER = re.compile(
+    r"^\s*(ingredients?|you will need|what you need)\s*:?\s*$", re.IGNORECASE
+)
+SECTION_HEADER = re.compile(
+    r"^\s*(ingredients?|you will need|what you need|instructions?|directions?|"
+    r"method|preparation|steps|notes?|tips?)\s*:?\s*$",
+    re.IGNORECASE
+)
+META_LINE = re.compile(
+    r"^\s*(serves|servings?|yields?|makes|prep|cook|total|time|portions?)\b",
+    re.IGNORECASE
+)
+LIST_ITEM = re.compile(r"^\s*(\d+[.)]|[-•*])\s+")
+
+# How far above an Ingredients header the recipe title may sit
+TITLE_LOOKBACK = 4
+# Pages held while waiting for the next Ingredients header; past this the
+# buffer is flushed as token-sized chunks (books without such headers)
+MAX_BUFFERED_PAGES = 8
+
+
+@lru_cache(maxsize=1)
+def get_token_counter(model_name=TOKENIZER_MODEL):
+    """
+    Return a function counting tokens with the embedding model's tokenizer.
+    Falls back to a ~4 characters/token estimate when it is unavailable.
+    """
+    try:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_pretrained(model_name)
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+
+        def count_tokens(text):
+            return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    except Exception as e:
+        print(f"⚠️  Tokenizer unavailable ({e}), estimating tokens from length")
+
+        def count_tokens(text):
+            return max(1, len(text) // 4)
+    return count_tokens
+
+
+def _is_title(line):
+    """
+    A recipe title is a short line that is not a step, list item or header
+    """
+    text = line.strip()
+    return (
+        0 < len(text) <= 80
+        and not text.endswith((".", ",", ";"))
+        and not LIST_ITEM.match(text)
+        and not SECTION_HEADER.match(text)
+    )
+
+
+def _find_recipe_start(lines, header_index, lower_bound):
+    """
+    Walk back from an Ingredients header over serving/time lines to the title.
+    Returns (start index of the recipe, title or None).
+    """
+    for i in range(header_index - 1, max(lower_bound, header_index - TITLE_LOOKBACK) - 1, -1):
+        text = lines[i][0]
+        if not text.strip() or META_LINE.match(text):
+            continue
+        if _is_title(text):
+            return i, text.strip()
+        break
+    return header_index, None
+
+
+def _split_sections(lines):
+    """
+    Split recipe lines into sections at Ingredients/Instructions/... headers
+    """
+    sections = []
+    current = []
+    for line in lines:
+        if SECTION_HEADER.match(line[0]) and current:
+            sections.append(current)
+            current = []
+        current.append(line)
+    if current:
+        sections.append(current)
+    return sections
+
+
+def _make_chunk(lines, title, part):
+    """
+    Build a Document from (text, metadata) lines
+    """
+    text = "\n".join(text for text, _ in lines).strip()
+    if part > 0 and title:
+        text = f"{title} (continued)\n{text}"
+
+    metadata = dict(lines[0][1])
+    metadata["page_end"] = lines[-1][1].get("page", metadata.get("page"))
+    if title:
+        metadata["recipe_title"] = title
+    metadata["recipe_part"] = part
+    return Document(page_content=text, metadata=metadata)
+
+
+def _pack_recipe(lines, title, max_tokens, count_tokens, first_part=0):
+    """
+    Pack one recipe into as few chunks of at most max_tokens as possible.
+    Splits at section headers first, then at lines, then inside lines.
+    Parts are numbered from first_part (a recipe flushed in pieces).
+    """
+    text = "\n".join(t for t, _ in lines).strip()
+    if not text:
+        return []
+    prefix_tokens = count_tokens(f"{title} (continued)") + 1 if title else 0
+    if count_tokens(text) + (prefix_tokens if first_part else 0) <= max_tokens:
+        return [_make_chunk(lines, title, first_part)]
+
+    # Leave room for the "<title> (continued)" prefix on later parts
+    budget = max_tokens - prefix_tokens
+
+    # Break everything down into pieces that each fit the budget
+    pieces = []
+    for section in _split_sections(lines):
+        section_text = "\n".join(t for t, _ in section)
+        if count_tokens(section_text) <= budget:
+            pieces.append(section)
+            continue
+        for line in section:
+            if count_tokens(line[0]) <= budget:
+                pieces.append([line])
+                continue
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=budget,
+                chunk_overlap=0,
+                length_function=count_tokens,
+            )
+            pieces.extend([(part, line[1])] for part in splitter.split_text(line[0]))
+
+    # Greedily merge adjacent pieces back together up to the budget
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = count_tokens("\n".join(t for t, _ in piece))
+        if current and current_tokens + piece_tokens + 1 > budget:
+            chunks.append(_make_chunk(current, title, first_part + len(chunks)))
+            current, current_tokens = [], 0
+        current.extend(piece)
+        current_tokens += piece_tokens + (1 if current_tokens else 0)
+    if current:
+        chunks.append(_make_chunk(current, title, first_part + len(chunks)))
+    return chunks
+
+
+def iter_recipe_chunks(pages, max_tokens=MAX_CHUNK_TOKENS, count_tokens=None,
+                       max_buffered_pages=MAX_BUFFERED_PAGES):
+    """
+    Split pages into recipe-aligned chunks sized by tokenizer token count.
+
+    A recipe starts at the title above an Ingredients header and runs until
+    the next recipe's title, across page breaks. Each recipe is kept in as
+    few chunks as possible. Only the current recipe is buffered, and at most
+    max_buffered_pages of it: a book without Ingredients headers is then
+    flushed as plain token-sized chunks, so this works on a lazy page
+    iterator in bounded memory.
+    """
+    count_tokens = count_tokens or get_token_counter()
+
+    # Lines of the current recipe as (text, page metadata)
+    lines = []
+    title = None
+    # Index of the current recipe's own Ingredients header, if seen
+    own_header = None
+    # Parts of the current recipe already flushed, and pages now buffered
+    flushed_parts = 0
+    buffered_pages = 0
+
+    for page in pages:
+        if buffered_pages >= max_buffered_pages and len(lines) > TITLE_LOOKBACK:
+            # Keep the last few lines: they may hold the title of a recipe
+            # whose Ingredients header is on this page
+            keep = len(lines) - TITLE_LOOKBACK
+            chunks = _pack_recipe(lines[:keep], title, max_tokens, count_tokens, flushed_parts)
+            yield from chunks
+            flushed_parts += len(chunks)
+            lines = lines[keep:]
+            own_header = None
+            buffered_pages = 0
+        buffered_pages += 1
+
+        for text in page.page_content.split("\n"):
+            lines.append((text, page.metadata))
+            if not INGREDIENTS_HEADER.match(text):
+                continue
+
+            header_index = len(lines) - 1
+            lower_bound = own_header + 1 if own_header is not None else 0
+            start, new_title = _find_recipe_start(lines, header_index, lower_bound)
+
+            # Everything before the new title belongs to the previous recipe
+            yield from _pack_recipe(lines[:start], title, max_tokens, count_tokens, flushed_parts)
+
+            lines = lines[start:]
+            title = new_title
+            own_header = header_index - start
+            flushed_parts = 0
+            buffered_pages = 1
+
+    yield from _pack_recipe(lines, title, max_tokens, count_tokens, flushed_parts)
+
+
+def split_into_recipe_chunks(documents, max_tokens=MAX_CHUNK_TOKENS):
+    """
+    Split documents into recipe-aligned, token-budgeted chunks
+    """
+    chunks = list(iter_recipe_chunks(documents, max_tokens=max_tokens))
+    titled = len({c.metadata["recipe_title"] for c in chunks if "recipe_title" in c.metadata})
+    print(f"📦 Created {len(chunks)} recipe chunks ({titled} recipes detected)")
+    return chunks
@@ -0,0 +1,328 @@
+import os
+import re
+import json
+import difflib
+import numpy as np
+from langchain_core.documents import Document
+from recipe_chunker import INGREDIENTS_HEADER, SECTION_HEADER, LIST_ITEM
+
+# Configuration
+# Recipes (name, ingredients, steps, page) plus the ingredient inverted index
+RECIPE_CATALOG_PATH = "vectorstore/recipe_catalog.json"
+# Minimum difflib ratio for a near-exact recipe title match
+TITLE_MATCH_CUTOFF = float(os.getenv("TITLE_MATCH_CUTOFF", "0.9"))
+
+UNITS = frozenset(
+    "g gram grams kg kilogram kilograms mg ml l litre litres liter liters oz ounce ounces "
+    "lb lbs pound pounds cup cups tbsp tablespoon tablespoons tsp teaspoon teaspoons "
+    "pinch pinches dash clove cloves can cans tin tins packet packets bunch bunches "
+    "slice slices piece pieces handful sprig sprigs stick sticks jar jars quart pint".split()
+)
+DESCRIPTORS = frozenset(
+    "chopped diced minced sliced grated crushed fresh freshly large small medium finely "
+    "roughly thinly ground whole boneless skinless peeled optional to taste of about "
+    "a an and or for cooked uncooked raw softened melted beaten room temperature "
+    "heaped level few some extra".split()
+)
+QUANTITY = re.compile(r"^[\d½¼¾⅓⅔⅛./\-–x]+$")
+WORD = re.compile(r"[a-z]+")
+SPLIT_QUERY = re.compile(r",|;|\n|\band\b|&")
+STEPS_HEADER = re.compile(
+    r"^\s*(instructions?|directions?|method|preparation|steps)\s*:?\s*$", re.IGNORECASE
+)
+TITLE_FILLER = re.compile(
+    r"^(give me |show me |find )?(the |a )?((complete |full )?recipe (for|of) |how to (make|cook) )?"
+    r"|( recipe)?$"
+)
+
+
+def _singular(word):
+    if word.endswith("oes") and len(word) > 4:
+        return word[:-2]
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(text):
+    """
+    "- 2 large tomatoes, chopped" -> "tomato"; returns None if nothing is left
+    """
+    text = LIST_ITEM.sub("", text.lower())
+    text = re.sub(r"\([^)]*\)", " ", text).split(",")[0]
+    words = [
+        _singular(word)
+        for token in text.split()
+        if not QUANTITY.match(token)
+        for word in WORD.findall(token)
+        if word not in UNITS and word not in DESCRIPTORS
+    ]
+    return " ".join(words) or None
+
+
+def parse_ingredient_query(text):
+    """
+    "chicken, tomatoes and rice" -> ["chicken", "tomato", "rice"]
+    """
+    seen = []
+    for part in SPLIT_QUERY.split(text):
+        name = normalize_ingredient(part)
+        if name and name not in seen:
+            seen.append(name)
+    return seen
+
+
+def normalize_title(text):
+    """
+    "Give me the recipe for Chicken  Biryani!" -> "chicken biryani"
+    """
+    text = " ".join(WORD.findall(text.lower()))
+    return TITLE_FILLER.sub("", text).strip()
+
+
+def _section_lines(text, header):
+    """
+    Lines between a matching header and the next section header
+    """
+    lines = []
+    inside = False
+    for line in text.split("\n"):
+        if header.match(line):
+            inside = True
+        elif SECTION_HEADER.match(line):
+            inside = False
+        elif inside and line.strip():
+            lines.append(line.strip())
+    return lines
+
+
+def extract_ingredient_lines(text):
+    """
+    Lines between an Ingredients header and the next section header
+    """
+    return [LIST_ITEM.sub("", line) for line in _section_lines(text, INGREDIENTS_HEADER)]
+
+
+def extract_steps(text):
+    """
+    Numbered/bulleted steps under Instructions/Method/...; lines that do
+    not start a new item are joined onto the previous step
+    """
+    steps = []
+    for line in _section_lines(text, STEPS_HEADER):
+        if LIST_ITEM.match(line) or not steps:
+            steps.append(LIST_ITEM.sub("", line))
+        else:
+            steps[-1] = f"{steps[-1]} {line}"
+    return steps
+
+
+def group_recipes(texts, metadatas):
+    """
+    Reassemble recipes from recipe-chunker chunks (grouped by source and
+    title, parts in order). Returns a list of recipe dicts in book order.
+    """
+    # Chunks come back from the store unordered, and two recipes can share
+    # a page, so parts are ordered within their own recipe's title
+    chunks = sorted(
+        (
+            (m.get("source", ""), m["recipe_title"], m.get("page", 0), m.get("recipe_part", 0), text, m)
+            for text, m in zip(texts, metadatas)
+            if m and m.get("recipe_title")
+        ),
+        key=lambda c: c[:4]
+    )
+
+    recipes = []
+    for source, title, page, part, text, metadata in chunks:
+        current = recipes[-1] if recipes else None
+        if (current is None or part == 0 or current["source"] != source
+                or current["title"] != title):
+            current = {
+                "title": title,
+                "source": source,
+                "page": page,
+                "page_end": metadata.get("page_end", page),
+                "parts": [],
+            }
+            recipes.append(current)
+        # Drop the "<title> (continued)" line added to later parts
+        if part > 0 and text.startswith(f"{title} (continued)\n"):
+            text = text[len(title) + len(" (continued)\n"):]
+        current["parts"].append(text)
+        current["page_end"] = max(current["page_end"], metadata.get("page_end", page))
+
+    recipes.sort(key=lambda r: (r["source"], r["page"]))
+    for i, recipe in enumerate(recipes):
+        recipe["id"] = i
+        recipe["text"] = "\n".join(recipe.pop("parts"))
+        recipe["ingredient_lines"] = extract_ingredient_lines(recipe["text"])
+        recipe["steps"] = extract_steps(recipe["text"])
+        names = []
+        for line in recipe["ingredient_lines"]:
+            name = normalize_ingredient(line)
+            if name and name not in names:
+                names.append(name)
+        recipe["ingredients"] = names
+    return recipes
+
+
+class IngredientIndex:
+    """
+    Inverted index of ingredient word -> sorted recipe ids (int32 arrays).
+    Ranks recipes by how many of the user's ingredients they use, then by
+    how much of the recipe those ingredients cover.
+    """
+
+    def __init__(self, recipes, postings):
+        self.recipes = recipes
+        self.postings = {word: np.asarray(ids, dtype=np.int32) for word, ids in postings.items()}
+        self.ingredient_counts = np.array([max(len(r["ingredients"]), 1) for r in recipes], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.recipes)
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        postings = {}
+        for recipe in recipes:
+            for name in recipe["ingredients"]:
+                for word in name.split():
+                    ids = postings.setdefault(word, [])
+                    if not ids or ids[-1] != recipe["id"]:
+                        ids.append(recipe["id"])
+        return cls(recipes, postings)
+
+    def save(self, path=RECIPE_CATALOG_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "recipes": self.recipes,
+                "postings": {word: ids.tolist() for word, ids in self.postings.items()},
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=RECIPE_CATALOG_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["recipes"], data["postings"])
+
+    def _recipes_with(self, ingredient):
+        """
+        Recipe ids using every word of an ingredient ("chicken breast")
+        """
+        ids = None
+        for word in ingredient.split():
+            postings = self.postings.get(word)
+            if postings is None:
+                return np.empty(0, dtype=np.int32)
+            ids = postings if ids is None else np.intersect1d(ids, postings, assume_unique=True)
+        return ids if ids is not None else np.empty(0, dtype=np.int32)
+
+    def search(self, ingredients, k=3):
+        """
+        Top-k recipes for a list of normalized ingredient names.
+        Returns dicts with the recipe plus matched/coverage scores.
+        """
+        if not self.recipes or not ingredients:
+            return []
+        matched = [self._recipes_with(name) for name in ingredients]
+        hits = np.concatenate(matched) if matched else np.empty(0, dtype=np.int32)
+        if not len(hits):
+            return []
+
+        matched_counts = np.bincount(hits, minlength=len(self.recipes)).astype(np.float32)
+        coverage = np.minimum(matched_counts / self.ingredient_counts, 1.0)
+        # More of the user's ingredients first, then how complete the recipe is
+        candidates = np.flatnonzero(matched_counts)
+        order = np.lexsort((-coverage[candidates], -matched_counts[candidates]))[:k]
+
+        results = []
+        for i in candidates[order]:
+            recipe = self.recipes[i]
+            results.append({
+                "recipe": recipe,
+                "matched": [name for name, ids in zip(ingredients, matched) if i in ids],
+                "coverage": float(coverage[i]),
+            })
+        return results
+
+    def search_documents(self, query, k=3):
+        """
+        Parse a free-text ingredient list and return (matches, Documents)
+        holding the full text of the top recipes
+        """
+        matches = self.search(parse_ingredient_query(query), k=k)
+        docs = [
+            Document(
+                page_content=match["recipe"]["text"],
+                metadata={
+                    "source": match["recipe"]["source"],
+                    "page": match["recipe"]["page"],
+                    "recipe_title": match["recipe"]["title"],
+                }
+            )
+            for match in matches
+        ]
+        return matches, docs
+
+
+def is_complete(recipe):
+    """
+    A recipe with both ingredients and steps can be answered as-is
+    """
+    return bool(recipe["ingredient_lines"] and recipe["steps"])
+
+
+class RecipeCatalog:
+    """
+    Structured recipes keyed by normalized title, for answering a recipe
+    name lookup straight from the book without calling the LLM
+    """
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+        self.by_title = {}
+        for recipe in recipes:
+            key = normalize_title(recipe["title"])
+            # A complete recipe wins the title over a fragment of the same name
+            if key not in self.by_title or (is_complete(recipe) and not is_complete(self.by_title[key])):
+                self.by_title[key] = recipe
+
+    def __len__(self):
+        return len(self.recipes)
+
+    @classmethod
+    def load(cls, path=RECIPE_CATALOG_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["recipes"])
+
+    def lookup(self, name, cutoff=TITLE_MATCH_CUTOFF):
+        """
+        Exact or near-exact title match; returns (recipe, similarity) or (None, 0.0)
+        """
+        key = normalize_title(name)
+        if not key:
+            return None, 0.0
+        if key in self.by_title:
+            return self.by_title[key], 1.0
+        close = difflib.get_close_matches(key, self.by_title.keys(), n=1, cutoff=cutoff)
+        if not close:
+            return None, 0.0
+        return self.by_title[close[0]], difflib.SequenceMatcher(None, key, close[0]).ratio()
+
+
+def format_recipe(recipe):
+    """
+    Render a catalog recipe in the same sectioned layout the LLM is asked for
+    """
+    lines = [f"Recipe Name: {recipe['title']}", "", "Ingredients:"]
+    lines += [f"- {line}" for line in recipe["ingredient_lines"]]
+    lines += ["", "Instructions:"]
+    lines += [f"{i}. {step}" for i, step in enumerate(recipe["steps"], 1)]
+    lines += ["", "Important Notes:", f"From the recipe book, page {recipe['page'] + 1}."]
+    return "\n".join(lines)
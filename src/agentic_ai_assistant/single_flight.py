@@ -0,0 +1,270 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _StreamCall:
+    def __init__(self):
+        self.iterator = None
+        self.items = []
+        self.finished = False
+        self.error = None
+        self.changed = threading.Condition()
+        # Callers reading the stream without pulling from the iterator
+        self.followers = 0
+        # Whether some caller is pulling from the iterator
+        self.producing = True
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key across threads: the first
+    caller runs the work, callers arriving while it runs wait and share
+    its result (or exception). Nothing is kept once the call finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+
+    def do(self, key, fn):
+        """
+        Return (fn() result, shared) where shared is True for coalesced callers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stream(self, key, make_iterator):
+        """
+        Iterate make_iterator() once for all concurrent callers with the same
+        key. Late joiners replay the items produced so far, then follow live.
+        If the caller pulling from the iterator goes away (e.g. its client
+        disconnected), a follower takes over. Yields (item, shared).
+        """
+        with self._lock:
+            call = self._streams.get(key)
+            leader = call is None
+            if leader:
+                call = self._streams[key] = _StreamCall()
+            else:
+                with call.changed:
+                    call.followers += 1
+
+        if leader:
+            call.iterator = make_iterator()
+            yield from self._produce(key, call, False)
+        else:
+            yield from self._follow(key, call)
+
+    def _produce(self, key, call, shared):
+        try:
+            for item in call.iterator:
+                with call.changed:
+                    call.items.append(item)
+                    call.changed.notify_all()
+                yield item, shared
+        except GeneratorExit:
+            # Our consumer went away before the end: hand the iterator to a
+            # follower, or stop it if nobody else is reading
+            if not self._hand_off(key, call):
+                call.iterator.close()
+                self._finish(key, call)
+            raise
+        except BaseException as e:
+            call.error = e
+            self._finish(key, call)
+            raise
+        self._finish(key, call)
+
+    def _hand_off(self, key, call):
+        """
+        True if a follower will take over the iterator; otherwise the call
+        is unregistered so nobody else joins it
+        """
+        with self._lock, call.changed:
+            if call.followers:
+                call.producing = False
+                call.changed.notify_all()
+                return True
+            self._streams.pop(key, None)
+            return False
+
+    def _finish(self, key, call):
+        with self._lock:
+            if self._streams.get(key) is call:
+                del self._streams[key]
+        with call.changed:
+            call.finished = True
+            call.changed.notify_all()
+
+    def _follow(self, key, call):
+        position = 0
+        try:
+            while True:
+                with call.changed:
+                    while position == len(call.items) and not call.finished and call.producing:
+                        call.changed.wait()
+                    items = call.items[position:]
+                    finished = call.finished
+                    if not items and not finished and not call.producing:
+                        # Caught up with a stream nobody is pulling: take over
+                        call.producing = True
+                        call.followers -= 1
+                        break
+                position += len(items)
+                for item in items:
+                    yield item, True
+                if finished and position == len(call.items):
+                    if call.error is not None:
+                        raise call.error
+                    return
+        except GeneratorExit:
+            self._leave(key, call)
+            raise
+        yield from self._produce(key, call, True)
+
+    def _leave(self, key, call):
+        """
+        A follower's consumer went away; the last reader of a stream nobody
+        is pulling stops it
+        """
+        with self._lock, call.changed:
+            call.followers -= 1
+            orphaned = not call.producing and not call.finished and not call.followers
+            if orphaned:
+                self._streams.pop(key, None)
+        if orphaned:
+            call.iterator.close()
+            self._finish(key, call)
+
+
+class _AsyncCall:
+    def __init__(self):
+        self.task = None
+        # Callers awaiting the task; the last one to leave cancels it
+        self.subscribers = 0
+
+
+class _AsyncStreamCall(_AsyncCall):
+    def __init__(self):
+        super().__init__()
+        self.items = []
+        self.finished = False
+        self.changed = asyncio.Condition()
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight. The work runs in its own task, so a
+    caller that is cancelled (e.g. the client disconnected) does not cancel
+    it for the callers still waiting; once the last caller has gone, the
+    task is cancelled too.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._streams = {}
+
+    def _start(self, registry, key, call, coro):
+        """
+        Run coro as call's task, registered under key until it finishes
+        """
+        call.task = asyncio.ensure_future(coro)
+        registry[key] = call
+        call.task.add_done_callback(lambda _: self._unregister(registry, key, call))
+        return call
+
+    def _unregister(self, registry, key, call):
+        # A cancelled call may already have been replaced by a new one
+        if registry.get(key) is call:
+            del registry[key]
+
+    def _leave(self, registry, key, call):
+        call.subscribers -= 1
+        if not call.subscribers and not call.task.done():
+            # Nobody wants the result any more
+            self._unregister(registry, key, call)
+            call.task.cancel()
+
+    async def do(self, key, make_coroutine):
+        """
+        Return (await make_coroutine() result, shared)
+        """
+        call = self._tasks.get(key)
+        shared = call is not None
+        if not shared:
+            call = self._start(self._tasks, key, _AsyncCall(), make_coroutine())
+        call.subscribers += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            self._leave(self._tasks, key, call)
+
+    async def stream(self, key, make_async_iterator):
+        """
+        Async stream(): one producer task fills a shared buffer that every
+        concurrent caller with the same key reads. Yields (item, shared).
+        """
+        call = self._streams.get(key)
+        shared = call is not None
+        if not shared:
+            call = _AsyncStreamCall()
+
+            async def produce():
+                try:
+                    async for item in make_async_iterator():
+                        async with call.changed:
+                            call.items.append(item)
+                            call.changed.notify_all()
+                finally:
+                    async with call.changed:
+                        call.finished = True
+                        call.changed.notify_all()
+
+            self._start(self._streams, key, call, produce())
+        call.subscribers += 1
+
+        try:
+            position = 0
+            while True:
+                async with call.changed:
+                    while position == len(call.items) and not call.finished:
+                        await call.changed.wait()
+                    batch = call.items[position:]
+                    finished = call.finished
+                position += len(batch)
+                for item in batch:
+                    yield item, shared
+                if finished and position == len(call.items):
+                    # Re-raise the producer's exception, if any
+                    await asyncio.shield(call.task)
+                    return
+        finally:
+            self._leave(self._streams, key, call)
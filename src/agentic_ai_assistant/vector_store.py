@@ -1,73 +1,311 @@
 import os
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import hashlib
 from dotenv import load_dotenv
+# chromadb, sentence-transformers/torch, the PDF stack and the optional
+# vector backends are imported inside the functions that use them, so
+# importing this module stays cheap
+from embedding_cache import CachedEmbeddings
+from parallel_embeddings import ParallelEmbeddings, EMBEDDING_BATCH_SIZE
+from bm25_index import BM25Builder, BM25Index, BM25_INDEX_PATH
+from answer_cache import AnswerCache, clear_answer_cache
+from recipe_index import IngredientIndex, RecipeCatalog, RECIPE_CATALOG_PATH, group_recipes
 
 load_dotenv()
 
 # Configuration
 VECTOR_STORE_PATH = "vectorstore/recipe_db"
+# "chroma", "numpy" (exact brute-force index exported from Chroma),
+# or "int8"/"binary" (quantized codes with exact re-rank, see quantized_index.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+NORMALIZE_EMBEDDINGS = True
+# "torch" (sentence-transformers), "onnx" or "onnx-int8" (see onnx_embeddings.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+USE_EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() in ("1", "true", "yes")
+# Worker processes used to embed chunks during ingestion (default: all cores)
+INGEST_EMBEDDING_WORKERS = int(os.getenv("INGEST_EMBEDDING_WORKERS", "0")) or None
+INGEST_THREADS_PER_WORKER = int(os.getenv("INGEST_THREADS_PER_WORKER", "1"))
+# Unix socket of a shared embedding server (see embedding_server.py). When set,
+# the model and vector store are used through it instead of loaded in-process.
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "")
+# Chunks fetched from Chroma per page while building the search indexes
+SEARCH_INDEX_BATCH_SIZE = 1000
 
 
-def create_embeddings():
+def create_embeddings(use_cache=USE_EMBEDDING_CACHE, backend=EMBEDDING_BACKEND, server=EMBEDDING_SERVER_SOCKET):
     """
-    Create embedding model
+    Create embedding model, wrapped in the on-disk embedding cache
     """
-    print("🔧 Loading embedding model...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-    )
+    if server:
+        from embedding_server import RemoteEmbeddings
+        embeddings = RemoteEmbeddings(server)
+        print(f"🛰️  Using embedding server at {server} (pid {embeddings.client.info()['pid']})")
+        return embeddings
+    
+    print(f"🔧 Loading embedding model ({backend})...")
+    if backend in ("onnx", "onnx-int8"):
+        from onnx_embeddings import OnnxEmbeddings, ONNX_MODEL_DIR
+        embeddings = OnnxEmbeddings(
+            ONNX_MODEL_DIR,
+            quantized=backend == "onnx-int8",
+            normalize=NORMALIZE_EMBEDDINGS
+        )
+        # ONNX vectors differ slightly from torch ones, so cache them separately
+        cache_name = f"{EMBEDDING_MODEL}:{backend}"
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': NORMALIZE_EMBEDDINGS}
+        )
+        cache_name = EMBEDDING_MODEL
+    if use_cache:
+        embeddings = CachedEmbeddings(embeddings, cache_name, NORMALIZE_EMBEDDINGS)
     print("✅ Embedding model loaded!")
     return embeddings
 
 
-def create_vector_store(pdf_path, embeddings):
+def create_ingestion_embeddings(workers=INGEST_EMBEDDING_WORKERS,
+                                threads_per_worker=INGEST_THREADS_PER_WORKER,
+                                batch_size=EMBEDDING_BATCH_SIZE,
+                                use_cache=USE_EMBEDDING_CACHE):
+    """
+    Create a multi-process embedding model for ingestion.
+    Produces the same vectors as create_embeddings(); call close() when done.
+    """
+    embeddings = ParallelEmbeddings(
+        EMBEDDING_MODEL,
+        normalize=NORMALIZE_EMBEDDINGS,
+        workers=workers,
+        threads_per_worker=threads_per_worker,
+        batch_size=batch_size
+    )
+    if use_cache:
+        embeddings = CachedEmbeddings(embeddings, EMBEDDING_MODEL, NORMALIZE_EMBEDDINGS)
+    return embeddings
+
+
+def content_hash(text):
     """
-    Create vector store from PDF
+    Stable hash of chunk/page text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def add_page_hashes(pages):
+    """
+    Store a content hash on every page; chunks inherit it when split
+    """
+    for page in pages:
+        page.metadata["page_hash"] = content_hash(page.page_content)
+    return pages
+
+
+def assign_chunk_ids(chunks, seen=None):
+    """
+    Give each chunk a content-addressed id and store its hash in metadata.
+    The id depends on the book and the text only, so an unchanged chunk
+    keeps its id (and is never re-embedded) even when edits elsewhere move
+    it to another page. Pass the same `seen` dict when assigning ids batch
+    by batch.
+    """
+    ids = []
+    seen = {} if seen is None else seen
+    for chunk in chunks:
+        chunk_hash = content_hash(chunk.page_content)
+        chunk.metadata["content_hash"] = chunk_hash
+        key = content_hash(f"{chunk.metadata.get('source')}\x00{chunk_hash}")
+        # Identical text repeated in one book still needs distinct ids
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        ids.append(f"{key[:32]}-{occurrence}")
+    return ids
+
+
+def list_pdfs(path):
     """
-    print(f"\n📄 Loading PDF: {pdf_path}")
+    Return a single PDF path, or every PDF in a folder
+    """
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.lower().endswith(".pdf")
+        )
+    return [path]
+
+
+def _ids_and_metadatas(vectorstore):
+    """
+    Return (ids, metadatas) for every chunk in the collection
+    """
+    existing = vectorstore.get(include=["metadatas"])
+    return existing["ids"], existing["metadatas"]
+
+
+def delete_stale_books(vectorstore, path, pdf_paths):
+    """
+    Drop chunks stored under another spelling of a synced book's path
+    (stores built before sources were made absolute) and, when syncing a
+    folder, chunks of books removed from it.
+    Returns the number of chunks deleted.
+    """
+    folder = os.path.abspath(path) if os.path.isdir(path) else None
+    current = {os.path.abspath(pdf_path) for pdf_path in pdf_paths}
+    stale_ids = []
+    for chunk_id, metadata in zip(*_ids_and_metadatas(vectorstore)):
+        source = (metadata or {}).get("source")
+        if not source or source in current:
+            continue
+        absolute = os.path.abspath(source)
+        if absolute in current or os.path.dirname(absolute) == folder:
+            stale_ids.append(chunk_id)
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+    return len(stale_ids)
+
+
+def _chroma_mtime():
+    """
+    Last modification time of the Chroma store
+    """
+    sqlite_path = os.path.join(VECTOR_STORE_PATH, "chroma.sqlite3")
+    return os.path.getmtime(sqlite_path) if os.path.exists(sqlite_path) else 0.0
+
+
+def load_numpy_index(embeddings, quantization=None):
+    """
+    Load the NumPy index, re-exporting it from Chroma when it is missing
+    or older than the Chroma store (e.g. after re-ingesting a PDF).
+    With quantization ("int8"/"binary") only compressed codes stay resident.
+    """
+    from langchain_community.vectorstores import Chroma
+    from numpy_index import NumpyVectorIndex, NUMPY_INDEX_PATH, MANIFEST_FILE, export_chroma_to_numpy
+    from quantized_index import QuantizedVectorIndex
     
-    # Load PDF
-    loader = PyPDFLoader(pdf_path)
-    documents = loader.load()
-    print(f"✅ Loaded {len(documents)} pages")
+    manifest_path = os.path.join(NUMPY_INDEX_PATH, MANIFEST_FILE)
+    if not os.path.exists(manifest_path) or os.path.getmtime(manifest_path) < _chroma_mtime():
+        chroma = Chroma(
+            persist_directory=VECTOR_STORE_PATH,
+            embedding_function=embeddings
+        )
+        export_chroma_to_numpy(chroma, NUMPY_INDEX_PATH)
+    if quantization:
+        return QuantizedVectorIndex(NUMPY_INDEX_PATH, embedding_function=embeddings, mode=quantization)
+    return NumpyVectorIndex(NUMPY_INDEX_PATH, embedding_function=embeddings)
+
+
+def _iter_stored_chunks(collection, batch_size=SEARCH_INDEX_BATCH_SIZE):
+    """
+    Yield (text, metadata) for every chunk in the collection, a page at a time
+    """
+    offset = 0
+    while True:
+        data = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+        if not data["ids"]:
+            return
+        for text, metadata in zip(data["documents"], data["metadatas"]):
+            yield text, metadata or {}
+        offset += len(data["ids"])
+
+
+def build_search_indexes(vectorstore):
+    """
+    Build the BM25 lexical index and the recipe catalog (with its
+    ingredient index) over every chunk in the Chroma store
+    """
+    bm25_builder = BM25Builder()
+    recipe_texts, recipe_metadatas = [], []
+    for text, metadata in _iter_stored_chunks(vectorstore._collection):
+        bm25_builder.add(text, metadata)
+        # Only recipe-chunker chunks feed the catalog
+        if metadata.get("recipe_title"):
+            recipe_texts.append(text)
+            recipe_metadatas.append(metadata)
     
-    # Split into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-    )
-    chunks = text_splitter.split_documents(documents)
-    print(f"✅ Created {len(chunks)} chunks")
+    bm25_index = bm25_builder.build()
+    bm25_index.save(BM25_INDEX_PATH)
+    print(f"✅ BM25 index built over {len(bm25_index)} chunks: {BM25_INDEX_PATH}")
     
-    # Create vector store
-    print("\n🔨 Creating vector store...")
-    vectorstore = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=VECTOR_STORE_PATH
-    )
-    print(f"✅ Vector store created at: {VECTOR_STORE_PATH}")
+    ingredient_index = IngredientIndex.from_recipes(group_recipes(recipe_texts, recipe_metadatas))
+    # One file holds the recipe catalog and its ingredient index
+    ingredient_index.save(RECIPE_CATALOG_PATH)
+    print(f"✅ Recipe catalog built with {len(ingredient_index)} recipes: {RECIPE_CATALOG_PATH}")
     
-    return vectorstore
+    # Answers cached against the old store may cite removed or changed chunks
+    clear_answer_cache()
+    
+    return bm25_index, ingredient_index
 
 
-def load_existing_vector_store(embeddings):
+def _load_search_index(path, load, embeddings):
     """
-    Load existing vector store
+    Load a derived search index, rebuilding all of them when the Chroma
+    store is newer (e.g. after re-ingesting a PDF)
     """
-    print(f"\n📂 Loading existing vector store from: {VECTOR_STORE_PATH}")
+    from langchain_community.vectorstores import Chroma
     
-    vectorstore = Chroma(
+    if os.path.exists(path) and os.path.getmtime(path) >= _chroma_mtime():
+        return load(path)
+    chroma = Chroma(
         persist_directory=VECTOR_STORE_PATH,
         embedding_function=embeddings
     )
+    build_search_indexes(chroma)
+    return load(path)
+
+
+def load_bm25_index(embeddings):
+    """
+    Load the BM25 index for hybrid retrieval
+    """
+    return _load_search_index(BM25_INDEX_PATH, BM25Index.load, embeddings)
+
+
+def load_ingredient_index(embeddings):
+    """
+    Load the ingredient -> recipe inverted index
+    """
+    return _load_search_index(RECIPE_CATALOG_PATH, IngredientIndex.load, embeddings)
+
+
+def load_recipe_catalog(embeddings):
+    """
+    Load the structured recipe catalog for LLM-free name lookups
+    """
+    return _load_search_index(RECIPE_CATALOG_PATH, RecipeCatalog.load, embeddings)
+
+
+def load_answer_cache():
+    """
+    Open the RAG answer cache, dropping it if the Chroma store changed since it was filled
+    """
+    return AnswerCache(version=_chroma_mtime())
+
+
+def load_existing_vector_store(embeddings, backend=VECTOR_BACKEND, server=EMBEDDING_SERVER_SOCKET):
+    """
+    Load existing vector store
+    """
+    if server:
+        from embedding_server import RemoteVectorStore
+        print(f"\n📂 Using vector store of the embedding server at {server}")
+        return RemoteVectorStore(server, embedding_function=embeddings)
+    
+    from langchain_community.vectorstores import Chroma
+    
+    print(f"\n📂 Loading existing vector store from: {VECTOR_STORE_PATH} ({backend})")
+    
+    if backend == "numpy":
+        vectorstore = load_numpy_index(embeddings)
+    elif backend in ("int8", "binary"):
+        vectorstore = load_numpy_index(embeddings, quantization=backend)
+    else:
+        vectorstore = Chroma(
+            persist_directory=VECTOR_STORE_PATH,
+            embedding_function=embeddings
+        )
     print("✅ Vector store loaded!")
     return vectorstore
 
@@ -0,0 +1,199 @@
+"""
+Startup benchmark: cold-start cost of the Django service and the CLI
+
+Runs each scenario in fresh processes under `python -X importtime`, takes the
+median wall time over several runs and fails (exit code 1) when a scenario
+goes over its budget in startup_budget.json, or when it imports a module the
+budget forbids (e.g. chromadb or torch while Django is only being checked).
+Import time is summed per top-level package to show where time went.
+
+Scenarios:
+    check          python manage.py check
+    first_request  django.setup() plus the first GET /api/health/live/
+    first_search   django.setup() plus the first POST /api/search/, which
+                   loads the AI service and calls the stub Groq server
+                   (groq_stub.py); skipped until a vector store is built
+    cli            import of the CLI module (src/agentic_ai_assistant/main.py)
+
+Budgets are absolute seconds measured on one machine. On another, either
+write your own (--update, optionally to another --budget file) or scale
+them with --scale / STARTUP_BUDGET_SCALE (e.g. 1.5 on a slower CI runner).
+
+Usage:
+    poetry run python startup_benchmark.py --runs 5
+    poetry run python startup_benchmark.py --update    # rewrite the budgets
+    poetry run python startup_benchmark.py --scale 2 --only first_search
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+BUDGET_PATH = Path(os.getenv('STARTUP_BUDGET', BASE_DIR / 'startup_budget.json'))
+BUDGET_SCALE = float(os.getenv('STARTUP_BUDGET_SCALE', '1.0'))
+# first_search needs a built Chroma store
+VECTOR_STORE_DB = BASE_DIR / 'vectorstore' / 'recipe_db' / 'chroma.sqlite3'
+# New budgets are the measured medians times this
+BUDGET_HEADROOM = 1.5
+
+FIRST_REQUEST = """
+import os, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+import django
+django.setup()
+from django.test import Client
+start = time.perf_counter()
+response = Client().get('/api/health/live/')
+assert response.status_code == 200, response.status_code
+print(f"request_seconds={time.perf_counter() - start:.4f}")
+"""
+
+FIRST_SEARCH = """
+import os, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+import django
+django.setup()
+from django.test import Client
+start = time.perf_counter()
+response = Client().post(
+    '/api/search/', {'query': 'Chicken Biryani', 'type': 'recipe', 'generate': True},
+    content_type='application/json'
+)
+assert response.status_code == 200, (response.status_code, response.content[:500])
+print(f"request_seconds={time.perf_counter() - start:.4f}")
+"""
+
+CLI = """
+import sys
+sys.path.insert(0, 'src/agentic_ai_assistant')
+import main
+"""
+
+SCENARIOS = {
+    'check': [sys.executable, '-X', 'importtime', 'manage.py', 'check'],
+    'first_request': [sys.executable, '-X', 'importtime', '-c', FIRST_REQUEST],
+    'first_search': [sys.executable, '-X', 'importtime', '-c', FIRST_SEARCH],
+    'cli': [sys.executable, '-X', 'importtime', '-c', CLI],
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \| +(\S+)")
+
+
+def run_scenario(command, extra_env=None):
+    """
+    Run one cold start; returns (wall seconds, {module: self seconds}, stdout)
+    """
+    env = dict(os.environ, AI_SERVICE_WARMUP='false', PYTHONDONTWRITEBYTECODE='1', **(extra_env or {}))
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command[:4])} failed:\n{result.stderr[-2000:]}")
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imports[match.group(2)] = int(match.group(1)) / 1e6
+    return elapsed, imports, result.stdout
+
+
+def top_packages(imports, count):
+    """
+    Top-level packages with the most import time, e.g. [("langchain_core", 0.21), ...]
+    """
+    totals = {}
+    for name, seconds in imports.items():
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0.0) + seconds
+    return sorted(totals.items(), key=lambda item: -item[1])[:count]
+
+
+def forbidden_imports(imports, forbidden):
+    return sorted({
+        name for name in imports
+        for module in forbidden
+        if name == module or name.startswith(module + '.')
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='cold starts per scenario')
+    parser.add_argument('--top', type=int, default=8, help='slowest packages to list per scenario')
+    parser.add_argument('--only', help='comma-separated scenarios to run')
+    parser.add_argument('--update', action='store_true', help='write new budgets from this run')
+    parser.add_argument('--budget', type=Path, default=BUDGET_PATH, help='budget file to check or write')
+    parser.add_argument('--scale', type=float, default=BUDGET_SCALE, help='multiply every max_seconds by this')
+    args = parser.parse_args()
+
+    budget = json.loads(args.budget.read_text()) if args.budget.exists() else {}
+    names = args.only.split(',') if args.only else list(SCENARIOS)
+    failures = []
+    medians = {}
+
+    for name in names:
+        limits = dict(budget.get(name, {}))
+        if 'max_seconds' in limits:
+            limits['max_seconds'] *= args.scale
+        extra_env = None
+        if name == 'first_search':
+            if not VECTOR_STORE_DB.exists():
+                print(f"\n⏭️  {name}: skipped, no vector store (ingest a PDF with main.py first)")
+                continue
+            from groq_stub import start_stub
+            stub, url = start_stub(latency=0.05, token_delay=0.0)
+            # No cached answers, so the search always calls the (stub) LLM
+            extra_env = {'GROQ_API_BASE': url, 'GROQ_API_KEY': 'stub', 'ANSWER_CACHE': 'false'}
+        walls, requests, imports = [], [], {}
+        # One untimed run first so the OS file cache is warm for every measured run
+        run_scenario(SCENARIOS[name], extra_env)
+        for _ in range(args.runs):
+            elapsed, imports, stdout = run_scenario(SCENARIOS[name], extra_env)
+            walls.append(elapsed)
+            match = re.search(r"request_seconds=([\d.]+)", stdout)
+            if match:
+                requests.append(float(match.group(1)))
+        if extra_env is not None:
+            stub.shutdown()
+        medians[name] = statistics.median(walls)
+
+        line = f"\n⏱️  {name}: {medians[name]:.3f}s median of {args.runs}"
+        if 'max_seconds' in limits:
+            line += f" (budget {limits['max_seconds']:.3f}s)"
+        print(line)
+        if requests:
+            print(f"   first request {statistics.median(requests) * 1000:.1f}ms")
+        for package, seconds in top_packages(imports, args.top):
+            print(f"   {seconds:>7.3f}s  {package}")
+
+        if 'max_seconds' in limits and medians[name] > limits['max_seconds']:
+            failures.append(f"{name} took {medians[name]:.3f}s, budget {limits['max_seconds']:.3f}s")
+        loaded = forbidden_imports(imports, limits.get('forbidden_imports', []))
+        if loaded:
+            failures.append(f"{name} imported {', '.join(loaded[:5])}")
+
+    if args.update:
+        for name, median in medians.items():
+            budget.setdefault(name, {})['max_seconds'] = round(median * BUDGET_HEADROOM, 2)
+        args.budget.write_text(json.dumps(budget, indent=2) + "\n")
+        print(f"\n💾 Budgets written to {args.budget}")
+        return 0
+
+    if failures:
+        print("\n❌ Startup budget exceeded:")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+    print("\n✅ All scenarios within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
 // ==================== State Management ====================
 let currentSearchType = 'recipe';
+// Aborts the search still streaming when a new one starts
+let activeSearch = null;
 
 // ==================== DOM Elements ====================
 const recipeBtn = document.getElementById('recipeBtn');
@@ -58,12 +60,16 @@ async function handleSearch(e) {
         return;
     }
 
-    // Show loading state
+    if (activeSearch) activeSearch.abort();
+    const search = new AbortController();
+    activeSearch = search;
+
+    // Show loading state until the answer starts arriving
     setLoading(true);
     hideResults();
 
     try {
-        const response = await fetch('/api/search/', {
+        const response = await fetch('/api/search/stream/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -71,22 +77,84 @@ async function handleSearch(e) {
             body: JSON.stringify({
                 query: query,
                 type: currentSearchType
-            })
+            }),
+            signal: search.signal
         });
 
-        const data = await response.json();
-
-        if (data.success) {
-            displayResults(data);
-        } else {
+        if (!response.ok || !response.body) {
+            const data = await response.json();
             showError(data.error || 'An error occurred while searching');
+            return;
         }
+
+        await readEventStream(response, (event, data) => {
+            if (event === 'token') {
+                setLoading(false);
+                appendStreamText(query, data.text);
+            } else if (event === 'done') {
+                setLoading(false);
+                displayResults(data);
+            } else if (event === 'error') {
+                showError(data.error || 'An error occurred while searching');
+            }
+        });
     } catch (error) {
+        // A newer search replaced this one
+        if (error.name === 'AbortError') return;
         console.error('Search error:', error);
         showError('Failed to connect to the server. Please try again.');
     } finally {
-        setLoading(false);
+        if (activeSearch === search) {
+            activeSearch = null;
+            setLoading(false);
+        }
+    }
+}
+
+/**
+ * Read a Server-Sent Events response, calling onEvent(event, data) per event
+ */
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+            });
+            if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+    }
+}
+
+/**
+ * Show generated text as it arrives, before it is formatted into recipe cards
+ */
+function appendStreamText(query, text) {
+    let streamBox = document.getElementById('streamText');
+    if (!streamBox) {
+        resultsTitle.textContent = currentSearchType === 'recipe'
+            ? `Recipe: ${query}`
+            : `Recipes with: ${query}`;
+        resultsContent.innerHTML = '<div class="recipe-card"><div class="notes-content streaming-text" id="streamText"></div></div>';
+        resultsSection.style.display = 'block';
+        streamBox = document.getElementById('streamText');
     }
+    streamBox.textContent += text;
 }
 
 /**